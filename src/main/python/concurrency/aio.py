@@ -0,0 +1,129 @@
+"""
+Fetching of feeds on an asyncio event loop.
+
+A FetchTask run on the QThreadPool holds a thread for as long as its server takes to respond, so a
+refresh can only have as many requests in flight as there are threads, and a few slow servers hold
+up the rest. The engine here runs the requests of FetchTasks on an event loop in a thread of its
+own, with up to config.FETCH_CONCURRENCY in flight within the per-host limits of
+concurrency.scheduling. Responses are parsed in the loop's default executor, which hands them on
+to the parser processes, and results are emitted through each task's TaskSignaller as when the
+task runs on the thread pool.
+"""
+import asyncio
+import threading
+import urllib.parse
+from typing import Optional
+
+import aiohttp
+
+import config
+
+from . import scheduling, sessions
+from .tasks import FetchTask, TaskResult
+
+
+class FetchEngine:
+	"""
+	Runs FetchTasks on an event loop thread. Its start(task) stands in for QThreadPool.start, so a
+	Batch of FetchTasks can be started on either.
+	"""
+
+	concurrency: int
+	scheduler: scheduling.HostScheduler
+
+	def __init__(self, concurrency: Optional[int] = None, scheduler: Optional[scheduling.HostScheduler] = None):
+		self.concurrency = concurrency or config.FETCH_CONCURRENCY
+		self.scheduler = scheduler or scheduling.HostScheduler()
+		self._loop = asyncio.new_event_loop()
+		self._thread = threading.Thread(target=self._loop.run_forever, name="fetch-loop", daemon=True)
+		self._thread.start()
+		self._session: Optional[aiohttp.ClientSession] = None
+		self._slots: Optional[asyncio.Semaphore] = None
+
+	def _client(self) -> aiohttp.ClientSession:
+		# created on the loop thread, which both are bound to
+		if self._session is None:
+			self._slots = asyncio.Semaphore(self.concurrency)
+			self._session = aiohttp.ClientSession(
+				connector=aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=0),
+				timeout=aiohttp.ClientTimeout(sock_connect=config.HTTP_CONNECT_TIMEOUT,
+											  sock_read=config.HTTP_READ_TIMEOUT),
+				headers={"Accept-Encoding": sessions.ACCEPT_ENCODING})
+
+		return self._session
+
+	def start(self, task: FetchTask):
+		"""Schedule a task. Thread safe; the result is emitted through task.signals.finished."""
+
+		asyncio.run_coroutine_threadsafe(self._run(task), self._loop)
+
+	async def _run(self, task: FetchTask):
+		client = self._client()
+		try:
+			result = TaskResult(await self._fetch(client, task))
+		except BaseException as exc:
+			result = TaskResult(None, exc)
+
+		task.signals.finished.emit(result)
+
+	async def _fetch(self, client: aiohttp.ClientSession, task: FetchTask):
+		host = urllib.parse.urlsplit(task.url).netloc
+		attempt = 0
+		while True:
+			# waiting on a host does not hold up requests to the others
+			async with self.scheduler.slot(host), self._slots:
+				async with client.get(task.url, headers=task.request_headers()) as response:
+					if response.status in scheduling.THROTTLED:
+						delay = self.scheduler.defer(host, attempt, response.headers)
+						if attempt >= config.FETCH_RETRIES or delay > config.BACKOFF_MAX:
+							raise scheduling.HostPaused(host, delay)
+						attempt += 1
+						continue
+					if response.status != 304:
+						response.raise_for_status()
+					content = await response.read()
+					break
+
+		return await self._loop.run_in_executor(None, task.read_response, response.status, response.headers,
+												content, response.charset)
+
+	def close(self):
+		"""Close the connections and stop the loop. Tasks still in flight are abandoned."""
+
+		async def close_session():
+			if self._session is not None:
+				await self._session.close()
+
+		if self._loop.is_running():
+			asyncio.run_coroutine_threadsafe(close_session(), self._loop).result()
+			self._loop.call_soon_threadsafe(self._loop.stop)
+			self._thread.join()
+		self._loop.close()
+
+
+_engine: Optional[FetchEngine] = None
+_engine_lock = threading.Lock()
+
+
+def engine() -> FetchEngine:
+	"""The shared engine, started on first use."""
+
+	global _engine
+
+	with _engine_lock:
+		if _engine is None:
+			_engine = FetchEngine()
+
+		return _engine
+
+
+def shutdown():
+	"""Stop the shared engine, if it was started."""
+
+	global _engine
+
+	with _engine_lock:
+		current, _engine = _engine, None
+
+	if current is not None:
+		current.close()
@@ -0,0 +1,103 @@
+"""
+Parsing of fetched feeds in a pool of worker processes.
+
+Parsing is CPU bound and runs almost entirely in Python, so when it is done in the QThreadPool
+workers which fetch feeds, every concurrent fetch in a batch is serialized by the GIL. Handing the
+raw response bytes to a ProcessPoolExecutor lets a large refresh use every core. Channels come back
+in the compact pickled form of XMLEntityDef.__reduce_ex__.
+
+This module must stay free of Qt imports, as it is imported by the worker processes.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import logging
+import multiprocessing
+import pickle
+import threading
+from typing import Container, Optional
+
+import config
+from reader.api import rss
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_broken = False
+
+
+def _prepare(channel: rss.Channel) -> rss.Channel:
+	"""Compute what the UI would otherwise compute on first display, while still off the GUI thread."""
+
+	for item in channel.items:
+		item.plain_description
+
+	return channel
+
+
+def _parse(content: bytes, encoding: Optional[str], known: Optional[Container[tuple]]) -> rss.Channel:
+	return _prepare(rss.parse_feed(content, encoding=encoding, known=known))
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+	global _executor
+
+	if config.PARSE_PROCESSES <= 0 or _broken:
+		return None
+
+	with _executor_lock:
+		if _executor is None:
+			try:
+				_executor = ProcessPoolExecutor(max_workers=config.PARSE_PROCESSES,
+												mp_context=multiprocessing.get_context('spawn'))
+			except (OSError, NotImplementedError) as exc:
+				logging.warning("Could not start parser processes, parsing in-thread: %s" % str(exc))
+				return None
+
+		return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor):
+	"""Drop a broken pool. Parsing stays in-thread for the rest of the session rather than respawning it."""
+
+	global _executor, _broken
+
+	with _executor_lock:
+		if _executor is executor:
+			_executor = None
+			_broken = True
+
+	executor.shutdown(wait=False)
+
+
+def parse_feed(content: bytes, encoding: Optional[str] = None, known: Optional[Container[tuple]] = None) -> rss.Channel:
+	"""
+	Parse raw feed bytes in a worker process, as rss.parse_feed. Parsing falls back to the calling
+	thread when config.PARSE_PROCESSES is 0, or when the pool cannot be started or has broken.
+	"""
+
+	executor = _get_executor()
+	if executor is not None:
+		try:
+			return executor.submit(_parse, content, encoding, known).result()
+		except BrokenProcessPool:
+			logging.warning("Parser processes terminated unexpectedly, parsing in-thread")
+			_discard_executor(executor)
+		except RuntimeError:
+			# The pool was shut down while this feed was being fetched.
+			pass
+		except pickle.PicklingError as exc:
+			logging.warning("Could not transfer parsed feed, parsing in-thread: %s" % str(exc))
+
+	return _prepare(rss.parse_feed(content, encoding=encoding, known=known))
+
+
+def shutdown():
+	"""Stop the worker processes, if they were started."""
+
+	global _executor
+
+	with _executor_lock:
+		executor, _executor = _executor, None
+
+	if executor is not None:
+		executor.shutdown(wait=True)
@@ -0,0 +1,137 @@
+"""
+Scheduling of background refreshes.
+
+Each feed is refreshed on a cadence learned from when its items were published and when it was
+last seen to change, so that a feed publishing hourly is polled every half hour while one which
+has been quiet for months is polled daily. The interval is never shorter than the ttl a feed
+declares, and due times are pushed past its skip days and hours.
+
+This module must stay free of Qt imports, so that it can be tested with a fake clock; the app
+drives it from a QTimer.
+"""
+import datetime
+import heapq
+import itertools
+import statistics
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import config
+import models
+from reader.api import rss
+from reader.api.xml import LazyEntityList
+
+
+# Number of the latest publication times used to estimate a feed's cadence.
+HISTORY = 20
+
+
+def publication_times(channel: rss.Channel) -> List[float]:
+	"""Publication times of a channel's items, in seconds since the epoch, without decoding lazy items."""
+
+	items = channel.items or ()
+	if isinstance(items, LazyEntityList):
+		dates = (items.peek(i, 'pub_date') for i in range(len(items)))
+	else:
+		dates = (item.pub_date for item in items)
+
+	return [date.timestamp() for date in dates if date is not None]
+
+
+def in_skip(feed: models.FeedDefinition, moment: float) -> bool:
+	"""Whether a feed asks not to be fetched at a time. Skip rules are in GMT, as in RSS."""
+
+	date = datetime.datetime.fromtimestamp(moment, datetime.timezone.utc)
+	return date.weekday() in (feed.skip_days or ()) or date.hour in (feed.skip_hours or ())
+
+
+class RefreshScheduler:
+	"""
+	A priority queue of the times feeds are next due, keyed by feed url. Entries replaced by a
+	later schedule stay in the heap and are skipped when popped.
+	"""
+
+	def __init__(self, clock: Callable[[], float] = time.time):
+		self._clock = clock
+		self._heap: List[Tuple[float, int, str]] = []
+		self._due: Dict[str, float] = {}
+		self._intervals: Dict[str, float] = {}
+		self._changed: Dict[str, float] = {}
+		self._counter = itertools.count()
+
+	def interval(self, feed: models.FeedDefinition, published: Iterable[float]) -> float:
+		"""Seconds to wait before refreshing a feed again, given its items' publication times."""
+
+		now = self._clock()
+		latest = sorted(published)[-HISTORY:]
+		gaps = [later - earlier for earlier, later in zip(latest, latest[1:]) if later > earlier]
+		cadence = statistics.median(gaps) if gaps else config.DEFAULT_TTL * 2
+		interval = cadence / 2
+
+		# a feed quiet for longer than its cadence suggests has probably slowed down or stopped
+		last_change = max(latest[-1:] + [self._changed.get(feed.url, 0.0)])
+		if last_change:
+			interval = max(interval, (now - last_change) / 4)
+
+		interval = max(interval, feed.ttl or 0)
+		return min(max(interval, config.REFRESH_MIN_INTERVAL), config.REFRESH_MAX_INTERVAL)
+
+	def _push(self, url: str, due: float):
+		self._due[url] = due
+		heapq.heappush(self._heap, (due, next(self._counter), url))
+
+	def observe(self, feed: models.FeedDefinition, published: Iterable[float], changed: bool = True):
+		"""
+		Schedule the next refresh of a feed which was just fetched or loaded from the cache.
+
+		:param published: Publication times of its items. See publication_times.
+		:param changed: Whether the feed has changed since it was last observed.
+		"""
+
+		now = self._clock()
+		if changed:
+			self._changed[feed.url] = now
+
+		interval = self._intervals[feed.url] = self.interval(feed, published)
+		due = now + interval
+		# skip rules are in whole hours, so stepping hour by hour finds the end of a skip within a week
+		for _ in range(24 * 7):
+			if not in_skip(feed, due):
+				break
+			due = (due // 3600 + 1) * 3600
+
+		self._push(feed.url, due)
+
+	def due(self) -> List[str]:
+		"""
+		Pop the urls of the feeds due for a refresh. Each is scheduled again after its last interval,
+		in case its refresh fails; a successful one is observed and rescheduled as such.
+		"""
+
+		now = self._clock()
+		urls = []
+		while self._heap and self._heap[0][0] <= now:
+			due, _, url = heapq.heappop(self._heap)
+			if self._due.get(url) != due:
+				continue
+
+			urls.append(url)
+			self._push(url, now + self._intervals.get(url, config.REFRESH_MIN_INTERVAL))
+
+		return urls
+
+	def next_due(self) -> Optional[float]:
+		"""The time the next feed is due, if any feed is scheduled."""
+
+		while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+			heapq.heappop(self._heap)
+
+		return self._heap[0][0] if self._heap else None
+
+	def remove(self, url: str):
+		self._due.pop(url, None)
+		self._intervals.pop(url, None)
+		self._changed.pop(url, None)
+
+	def __contains__(self, url: str) -> bool:
+		return url in self._due
@@ -0,0 +1,196 @@
+"""
+Per-host limits on the requests of the asyncio fetch engine.
+
+Many subscriptions may live on a single host, and firing all of their requests at once invites
+429 and 503 responses, which slow a refresh down more than spacing the requests out would. Each
+host gets a cap on the requests in flight to it and a token bucket limiting the rate they start
+at. A throttled response pauses the host, for as long as its Retry-After header asks or else for
+an exponential backoff with jitter.
+"""
+import asyncio
+import datetime
+import email.utils
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Mapping, NamedTuple, Optional
+
+import config
+
+
+THROTTLED = (429, 503)
+
+
+class HostPaused(Exception):
+	"""
+	Raised for a request to a host which asked to be left alone for longer than config.BACKOFF_MAX,
+	or which was still throttling once config.FETCH_RETRIES were used up.
+	"""
+
+	host: str
+	delay: float
+	until: float
+	"""Time, in seconds since the epoch, the host may be tried again at"""
+
+	def __init__(self, host: str, delay: float):
+		super().__init__("%s paused for %.0f seconds" % (host, delay))
+		self.host = host
+		self.delay = delay
+		self.until = time.time() + delay
+
+
+class HostStats(NamedTuple):
+	queued: int
+	"""Requests waiting for a slot, a token or the end of a pause"""
+	active: int
+	requests: int
+	deferrals: int
+	"""Throttled responses, each of which paused the host"""
+	wait_total: float
+	"""Seconds spent waiting by all requests"""
+	wait_max: float
+
+
+class _Host:
+	__slots__ = ('slots', 'tokens', 'updated', 'paused_until', 'queued', 'active', 'requests', 'deferrals',
+				 'wait_total', 'wait_max')
+
+	def __init__(self, concurrency: int, burst: float, now: float):
+		self.slots = asyncio.Semaphore(concurrency)
+		self.tokens = burst
+		self.updated = now
+		self.paused_until = 0.0
+		self.queued = 0
+		self.active = 0
+		self.requests = 0
+		self.deferrals = 0
+		self.wait_total = 0.0
+		self.wait_max = 0.0
+
+
+def retry_after(value: Optional[str], now: float) -> Optional[float]:
+	"""Seconds to wait according to a Retry-After header, given as seconds or as an HTTP date."""
+
+	if not value:
+		return None
+
+	value = value.strip()
+	if value.isdigit():
+		return float(value)
+
+	try:
+		date = email.utils.parsedate_to_datetime(value)
+	except (TypeError, ValueError):
+		return None
+	if date.tzinfo is None:
+		date = date.replace(tzinfo=datetime.timezone.utc)
+
+	return max(date.timestamp() - now, 0.0)
+
+
+class HostScheduler:
+	"""
+	Grants slots to make requests to each host, within its limits. Bound to the event loop it is
+	first used on. The clock and sleep are injectable for tests.
+	"""
+
+	def __init__(self, concurrency: Optional[int] = None, rate: Optional[float] = None, burst: Optional[float] = None,
+				 clock: Callable[[], float] = time.monotonic,
+				 sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+				 jitter: Callable[[], float] = random.random):
+		"""
+		:param concurrency: Requests in flight to a host at once. Defaults to config.HOST_CONCURRENCY.
+		:param rate: Requests started per second to a host, once its burst is used up. Defaults to
+					 config.HOST_RATE.
+		:param burst: Requests which may start at once to an idle host. Defaults to config.HOST_BURST.
+		"""
+
+		self.concurrency = concurrency or config.HOST_CONCURRENCY
+		self.rate = rate or config.HOST_RATE
+		self.burst = burst or config.HOST_BURST
+		self._clock = clock
+		self._sleep = sleep
+		self._jitter = jitter
+		self._hosts: Dict[str, _Host] = {}
+
+	def _host(self, name: str) -> _Host:
+		host = self._hosts.get(name)
+		if host is None:
+			host = self._hosts[name] = _Host(self.concurrency, self.burst, self._clock())
+
+		return host
+
+	def _delay(self, name: str, host: _Host) -> float:
+		"""Seconds until the host may start a request, taking a token if it may start one now."""
+
+		now = self._clock()
+		if host.paused_until > now:
+			if host.paused_until - now > config.BACKOFF_MAX:
+				raise HostPaused(name, host.paused_until - now)
+			return host.paused_until - now
+
+		host.tokens = min(self.burst, host.tokens + (now - host.updated) * self.rate)
+		host.updated = now
+		if host.tokens >= 1:
+			host.tokens -= 1
+			return 0.0
+
+		return (1 - host.tokens) / self.rate
+
+	@asynccontextmanager
+	async def slot(self, name: str) -> AsyncIterator[None]:
+		"""
+		Wait until a request may be made to the host, and hold one of its slots meanwhile. Raises
+		HostPaused rather than waiting out a pause longer than config.BACKOFF_MAX.
+		"""
+
+		host = self._host(name)
+		host.queued += 1
+		start = self._clock()
+		try:
+			await host.slots.acquire()
+			try:
+				delay = self._delay(name, host)
+				while delay > 0:
+					await self._sleep(delay)
+					delay = self._delay(name, host)
+			except BaseException:
+				host.slots.release()
+				raise
+		finally:
+			host.queued -= 1
+
+		waited = self._clock() - start
+		host.wait_total += waited
+		host.wait_max = max(host.wait_max, waited)
+		host.requests += 1
+		host.active += 1
+		try:
+			yield
+		finally:
+			host.active -= 1
+			host.slots.release()
+
+	def backoff(self, attempt: int) -> float:
+		"""The pause after the given number of throttled attempts, with full jitter."""
+
+		return min(config.BACKOFF_MAX, config.BACKOFF_BASE * 2 ** attempt) * self._jitter()
+
+	def defer(self, name: str, attempt: int, headers: Mapping[str, str]) -> float:
+		"""
+		Pause a host which throttled a request, for as long as its Retry-After header asks or else
+		for a backoff growing with the attempt. Returns the length of the pause.
+		"""
+
+		host = self._host(name)
+		delay = retry_after(headers.get('Retry-After'), time.time())
+		if delay is None:
+			delay = self.backoff(attempt)
+
+		host.deferrals += 1
+		host.paused_until = max(host.paused_until, self._clock() + delay)
+		return delay
+
+	def stats(self) -> Dict[str, HostStats]:
+		return {name: HostStats(host.queued, host.active, host.requests, host.deferrals, host.wait_total,
+								host.wait_max) for name, host in self._hosts.items()}
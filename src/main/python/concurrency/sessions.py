@@ -0,0 +1,93 @@
+"""
+A process-wide HTTP session shared by every fetch.
+
+Fetching each feed with the module-level requests.get opens a new connection per request, so a
+refresh pays a TCP and TLS handshake for every feed even when most of them live on a few hosts.
+The shared session keeps a pool of connections per host, sized to the thread pool the fetches run
+in, so each worker can hold a kept-alive connection to the same host. Responses are requested
+compressed, and every request is bounded by connect and read timeouts from config.
+
+Sessions of requests are safe to share between threads for plain GET requests, which is all this
+module is used for.
+"""
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+
+
+def _accept_encoding() -> str:
+	encodings = ['gzip', 'deflate']
+	try:
+		import brotli  # noqa: F401
+	except ImportError:
+		try:
+			import brotlicffi  # noqa: F401
+		except ImportError:
+			return ', '.join(encodings)
+
+	# urllib3 only decodes Brotli when one of these modules is installed
+	encodings.append('br')
+	return ', '.join(encodings)
+
+
+ACCEPT_ENCODING = _accept_encoding()
+
+_session: Optional[requests.Session] = None
+_pool_size = config.HTTP_POOL_SIZE
+_lock = threading.Lock()
+
+
+def _create_session(pool_size: int) -> requests.Session:
+	session = requests.Session()
+	adapter = HTTPAdapter(pool_connections=config.HTTP_HOST_POOLS, pool_maxsize=pool_size)
+	session.mount('http://', adapter)
+	session.mount('https://', adapter)
+	session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+	return session
+
+
+def configure(pool_size: int):
+	"""
+	Size the connection pool of each host to the number of threads fetching concurrently. Takes
+	effect for the next session, so this should be called before the first fetch.
+	"""
+
+	global _pool_size
+
+	with _lock:
+		_pool_size = max(pool_size, 1)
+
+
+def session() -> requests.Session:
+	"""The shared session, created on first use."""
+
+	global _session
+
+	with _lock:
+		if _session is None:
+			_session = _create_session(_pool_size)
+
+		return _session
+
+
+def get(url: str, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+	"""GET a url through the shared session, within the configured timeouts."""
+
+	return session().get(url, headers=headers,
+						 timeout=(config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT))
+
+
+def close():
+	"""Close the pooled connections. A later request starts a new session."""
+
+	global _session
+
+	with _lock:
+		current, _session = _session, None
+
+	if current is not None:
+		current.close()
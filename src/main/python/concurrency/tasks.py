@@ -5,10 +5,12 @@ from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
 import functools
 import logging
 import requests
-from typing import Generic, List, Optional, TypeVar
+from typing import Container, Dict, Generic, List, Mapping, Optional, TypeVar, Union
 
 from reader.api import rss, xml
 
+from . import parsing, sessions
+
 
 T = TypeVar('T')
 
@@ -39,7 +41,9 @@ class Task(QRunnable, Generic[T]):
 	def execute(self) -> T:
 		raise NotImplementedError()
 	
-	def run(self):
+	def result(self) -> TaskResult[T]:
+		"""Execute the task, capturing its result or the error it raised."""
+
 		try:
 			logging.info(f"[START] {str(self)}")
 			result = TaskResult(self.execute())
@@ -47,28 +51,86 @@ class Task(QRunnable, Generic[T]):
 		except BaseException as exc:
 			logging.info(f"[FAIL] {str(self)}")
 			result = TaskResult(None, exc)
-		
-		self.signals.finished.emit(result)
 
+		return result
+	
+	def run(self):
+		self.signals.finished.emit(self.result())
+
+
+def response_charset(response: requests.Response) -> Optional[str]:
+	"""The charset parameter of a response's Content-Type header, if it declares one."""
+
+	content_type = response.headers.get('Content-Type', '')
+	for parameter in content_type.split(';')[1:]:
+		key, _, value = parameter.partition('=')
+		if key.strip().lower() == 'charset':
+			return value.strip().strip('"\'') or None
+
+	return None
+
+
+class NotModified:
+	"""The result of a conditional FetchTask whose feed has not changed since the validators it sent."""
+
+	url: str
+
+	def __init__(self, url: str):
+		self.url = url
 
-class FetchTask(Task[rss.Channel]):
+
+class FetchTask(Task[Union[rss.Channel, NotModified]]):
 	url: str
+	known: Optional[Container[tuple]]
+	"""Local keys of the items already held for this feed, which are delta parsed. See rss.parse_feed."""
+	etag: Optional[str]
+	last_modified: Optional[str]
+
+	def __init__(self, url, known: Optional[Container[tuple]] = None, etag: Optional[str] = None,
+				 last_modified: Optional[str] = None):
+		"""
+		Validators from an earlier response make the request conditional, so a feed which has not
+		changed results in NotModified rather than being downloaded and parsed again.
+		"""
 
-	def __init__(self, url):
 		super().__init__()
 		self.url = url
+		self.known = known
+		self.etag = etag
+		self.last_modified = last_modified
 
-	def execute(self) -> rss.Channel:
-		response = requests.get(self.url, headers={
+	def request_headers(self) -> Dict[str, str]:
+		headers = {
 			"Accept": "application/rss+xml"
-		})
-		response.raise_for_status()
+		}
+		if self.etag:
+			headers["If-None-Match"] = self.etag
+		if self.last_modified:
+			headers["If-Modified-Since"] = self.last_modified
+
+		return headers
+
+	def read_response(self, status: int, headers: Mapping[str, str], content: bytes,
+					  encoding: Optional[str]) -> Union[rss.Channel, NotModified]:
+		"""Turn a successful response into this task's result. Shared with the engine of concurrency.aio."""
 
-		content = response.text
-		channel = rss.parse_feed(content)
+		if status == 304:
+			return NotModified(self.url)
+
+		channel = parsing.parse_feed(content, encoding=encoding, known=self.known)
 		channel.ref = self.url
+		channel.etag = headers.get("ETag")
+		channel.last_modified = headers.get("Last-Modified")
 		return channel
-	
+
+	def execute(self) -> Union[rss.Channel, NotModified]:
+		response = sessions.get(self.url, headers=self.request_headers())
+		if response.status_code != 304:
+			response.raise_for_status()
+
+		return self.read_response(response.status_code, response.headers, response.content,
+								  response_charset(response))
+
 	def __str__(self):
 		return f"fetch {self.url}"
 
@@ -77,16 +139,27 @@ class Batch(QObject, Generic[T]):
 	_REGISTRY = []  # keep batches loaded in memory while running
 
 	complete = pyqtSignal(list)
+	received = pyqtSignal(int, TaskResult)
+	"""Emitted with the index of a task and its result as soon as it finishes"""
+	progress = pyqtSignal(int, int)
+	"""Emitted with the number of finished tasks and the total after each result"""
 	results: List[TaskResult]
 
 	_tasks: List[Task[T]]
+	_remaining: int
 
 	def __init__(self, tasks: List[Task[T]]):
 		super().__init__()
 		self._tasks = tasks
 		self.results = [None for _ in tasks]
+		self._remaining = len(tasks)
 	
 	def start(self, pool: QThreadPool):
+		"""
+		Start every task on the pool, which may be anything that runs a task with start(task), such
+		as the fetch engine of concurrency.aio.
+		"""
+
 		if not self._tasks:
 			self.complete.emit([])
 			return
@@ -98,6 +171,9 @@ class Batch(QObject, Generic[T]):
 	
 	def _complete(self, index: int, result: TaskResult):
 		self.results[index] = result
-		if all([item is not None for item in self.results]):
+		self._remaining -= 1
+		self.received.emit(index, result)
+		self.progress.emit(len(self.results) - self._remaining, len(self.results))
+		if not self._remaining:
 			self.complete.emit(self.results)
 			Batch._REGISTRY.remove(self)
@@ -23,9 +23,64 @@ DATETIME_FORMATS = [
 ]
 
 FEED_CACHE = os.path.join(USER_CACHE, 'feeds')
+FEED_DATABASE = os.path.join(USER_CACHE, 'feeds.sqlite3')
+
+# Estimated size, in bytes, of the channels kept in memory in front of the feed database.
+MEMORY_CACHE_BYTES = 64 * 1024 * 1024
 
 DEFAULT_TTL = 90 * 60  # 90 minutes
 
+# Bounds, in seconds, on the interval between background refreshes of a feed (see concurrency.refresh).
+REFRESH_MIN_INTERVAL = 5 * 60
+REFRESH_MAX_INTERVAL = 24 * 60 * 60
+# Seconds after which a background refresh or retention run which came due while the feed actions were
+# busy is retried.
+BUSY_RETRY = 30
+
+# Number of worker processes used to parse fetched feeds. 0 parses each feed in the thread that fetched it.
+PARSE_PROCESSES = max((os.cpu_count() or 1) - 1, 0)
+
+# Retention of read states (see persist.retention): entries marked longer ago than META_MAX_AGE
+# seconds are dropped, as are the oldest beyond META_PER_CHANNEL entries of a channel. Retention
+# runs every RETENTION_INTERVAL seconds, starting a minute after launch.
+META_MAX_AGE = 180 * 24 * 60 * 60
+META_PER_CHANNEL = 1000
+RETENTION_INTERVAL = 6 * 60 * 60
+
+# JSON backend used to persist data (see util.serialization): 'orjson', 'ujson' or 'json', or None
+# for the fastest installed.
+JSON_BACKEND = None
+
+# Number of characters of an item's description kept as its plain text summary.
+SUMMARY_LENGTH = 300
+
+# Seconds to wait for a connection to a feed's server, and then for each read of its response.
+HTTP_CONNECT_TIMEOUT = 10
+HTTP_READ_TIMEOUT = 30
+
+# Number of hosts whose connections are kept alive, and connections kept per host. The app sizes
+# the latter to its thread pool.
+HTTP_HOST_POOLS = 32
+HTTP_POOL_SIZE = os.cpu_count() or 1
+
+# Fetch feeds on an asyncio event loop (concurrency.aio) rather than a thread per feed, with up to
+# FETCH_CONCURRENCY requests in flight.
+ASYNC_FETCH = True
+FETCH_CONCURRENCY = 64
+
+# Limits on the requests of the asyncio engine to each host: requests in flight, requests started
+# per second, and requests which may start at once to an idle host.
+HOST_CONCURRENCY = 4
+HOST_RATE = 2.0
+HOST_BURST = 4
+
+# Retries of a request throttled with a 429 or 503 response, after a pause of the response's
+# Retry-After, or else of BACKOFF_BASE seconds doubling with each attempt, with jitter. Pauses
+# longer than BACKOFF_MAX seconds are not waited out.
+FETCH_RETRIES = 3
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
 
 def create_app_directories():
     if not os.path.isdir(USER_DATA):
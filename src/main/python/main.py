@@ -4,16 +4,20 @@ from fbs_runtime.application_context.PyQt5 import ApplicationContext
 from PyQt5.QtGui import QColor, QPalette
 
 import logging
+import multiprocessing
 import sys
 from typing import Dict
 
 import config
-from persist import app_data
+from concurrency import aio, parsing, sessions
+from persist import app_data, writer
+from persist.journal import ReadStateJournal
 import models
 
 
 class MainApplicationContext(ApplicationContext):
     loaded_feeds: Dict[str, models.FeedDefinition]
+    journal: ReadStateJournal
 
     def run(self):
         from ui.app import MainApplication
@@ -38,6 +42,7 @@ class MainApplicationContext(ApplicationContext):
         except json.decoder.JSONDecodeError:
             logging.error("App metadata is corrupted - resorting to using empty metadata")
             self.app_meta = models.AppMeta(items=[])
+        self.journal = app_data.open_journal(self.app_meta)
 
         palette = QPalette()
         for key, value in constants.resources["palette"].items():
@@ -52,11 +57,19 @@ class MainApplicationContext(ApplicationContext):
         return self.app.exec_()
     
     def cleanup(self):
-        if not app_data.save_app_meta(self.app_meta):
-            logging.error("Failed to save application metadata - item states will not be persisted")
+        # pending saves of the feed list are written rather than dropped, and read states were
+        # journaled as they changed, so only the queued changes are left to write. Data is flushed
+        # first, and each step runs even if one before it fails.
+        steps = (writer.shutdown, self.journal.close, aio.shutdown, parsing.shutdown, sessions.close)
+        for step in steps:
+            try:
+                step()
+            except Exception:
+                logging.exception("Error during shutdown in %s.%s" % (step.__module__, step.__qualname__))
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     app_ctxt = MainApplicationContext()
     exit_code = app_ctxt.run()
     app_ctxt.cleanup()
@@ -1,10 +1,10 @@
 from __future__ import annotations
-import json
 import time
-from util import dateutil
+from util import dateutil, serialization
 from typing import Any, Dict, Generator, IO, Iterable, List, Optional, Tuple, TypeVar, Union
 
 from reader.api import rss
+from reader.api.xml import LazyEntityList
 
 
 class Multiple:
@@ -48,6 +48,10 @@ class JSONModel(metaclass=JSONModelMeta):
     _required: List[str]
 
     def __init__(self, **kw):
+        # fields left out are None, rather than the type the class declares them with
+        for key in self.__json_fields__:
+            if key not in kw:
+                setattr(self, key, None)
         for key, value in kw.items():
             setattr(self, key, value)
 
@@ -70,17 +74,17 @@ class JSONModel(metaclass=JSONModelMeta):
 
     @classmethod
     def from_string(cls, string: str) -> JSONModel:
-        return cls.from_dict(json.loads(string))
+        return cls.from_dict(serialization.loads(string))
 
     @classmethod
-    def load(cls, source: IO[str]) -> JSONModel:
-        return cls.from_dict(json.load(source))
+    def load(cls, source: IO) -> JSONModel:
+        return cls.from_dict(serialization.load(source))
 
     def to_string(self) -> str:
-        return json.dumps(self.to_dict())
+        return serialization.dumps(self.to_dict()).decode('utf-8')
 
-    def save(self, dest: IO[str]):
-        json.dump(self.to_dict(), dest)
+    def save(self, dest: IO):
+        serialization.dump(self.to_dict(), dest)
 
     @staticmethod
     def to_multiple(items: Iterable[J]) -> List[Dict[str, Any]]:
@@ -99,14 +103,14 @@ class JSONModel(metaclass=JSONModelMeta):
         return cls(**values)
 
     @classmethod
-    def load_multiple(cls, source: IO[str]):
-        array = json.load(source)
+    def load_multiple(cls, source: IO):
+        array = serialization.load(source)
         assert isinstance(array, (list, tuple)), "File does not define an array"
         return list(cls.from_dict(source) for source in array)
 
     @staticmethod
-    def save_multiple(items: Iterable[J], dest: IO[str]):
-        return json.dump([item.to_dict() for item in items], dest)
+    def save_multiple(items: Iterable[J], dest: IO):
+        return serialization.dump([item.to_dict() for item in items], dest)
 
 
 J = TypeVar('J', bound=JSONModel)
@@ -134,9 +138,13 @@ class FeedDefinition(JSONModel):
     ttl: int = int  # TTL in seconds
     skip_days: List[int] = list
     skip_hours: List[int] = list
+    etag: str = str  # validators of the last response, sent to make refreshes conditional
+    last_modified: str = str
 
     def update(self, channel: rss.Channel):
         self.nickname = channel.title
+        self.etag = channel.etag
+        self.last_modified = channel.last_modified
         self.ttl = (channel.ttl or 0) * 60
         self.skip_days = [dateutil.WEEKDAYS[day] for day in (channel.skip_days or []) if day in dateutil.WEEKDAYS.keys()]
         self.skip_hours = [hour % 24 for hour in (channel.skip_hours or [])]
@@ -147,7 +155,8 @@ class FeedDefinition(JSONModel):
                               last_retrieved=int(time.time()), ttl=(channel.ttl or 0) * 60,
                               skip_days=[dateutil.WEEKDAYS[day] for day in (channel.skip_days or []) if day in
                                          dateutil.WEEKDAYS.keys()],
-                              skip_hours=[hour % 24 for hour in channel.skip_hours or []])
+                              skip_hours=[hour % 24 for hour in channel.skip_hours or []],
+                              etag=channel.etag, last_modified=channel.last_modified)
 
 
 class ItemMeta(JSONModel):
@@ -158,6 +167,7 @@ class ItemMeta(JSONModel):
     title: Optional[str] = str
 
     read: bool = bool
+    marked: int = int  # timestamp of the last change to read, a rounded result of time.time(). None in older entries.
 
 
 class AppMeta(JSONModel):
@@ -165,22 +175,85 @@ class AppMeta(JSONModel):
 
     items: List[ItemMeta] = Multiple(ItemMeta)
 
+    _by_guid: Dict[Tuple[str, str], int]
+    _by_title: Dict[Tuple[str, str], int]
+
+    def __setattr__(self, key, value):
+        super().__setattr__(key, value)
+        if key == 'items':
+            self._reindex()
+
+    def _reindex(self):
+        """
+        Index the positions of the entries by (channel, guid) and (channel, title). Items should only
+        be changed through add and remove_channels, or by assigning a new list, to keep it in sync.
+        """
+
+        self._by_guid = {}
+        self._by_title = {}
+        for idx, item in enumerate(self.items or ()):
+            self._index(idx, item)
+
+    def _index(self, idx: int, item: ItemMeta):
+        # the first of duplicate entries wins, as it did when they were searched in order
+        if item.guid:
+            self._by_guid.setdefault((item.channel, item.guid), idx)
+        if item.title:
+            self._by_title.setdefault((item.channel, item.title), idx)
+
     def find_item(self, channel: str, guid: Optional[str] = None, title: Optional[str] = None) -> int:
         """
         Find an ItemMeta by its identifying channel and guid (or title). If guid and title are provided,
         title will be ignored in favor of the more reliable guid.
         """
 
-        if not (guid or title):
+        if guid:
+            return self._by_guid.get((channel, guid), -1)
+        elif title:
+            return self._by_title.get((channel, title), -1)
+        else:
             return -1
 
-        if guid:
-            predicate = lambda x: x.channel == channel and x.guid == guid
+    def get(self, channel: str, guid: Optional[str] = None, title: Optional[str] = None) -> Optional[ItemMeta]:
+        """Find an ItemMeta as find_item does, returning the entry itself."""
+
+        idx = self.find_item(channel, guid, title)
+        return self.items[idx] if idx >= 0 else None
+
+    def add(self, item: ItemMeta):
+        self.items.append(item)
+        self._index(len(self.items) - 1, item)
+
+    def remove(self, entries: Iterable[ItemMeta]):
+        removed = {id(entry) for entry in entries}
+        self.items = [item for item in self.items if id(item) not in removed]
+
+    def remove_channels(self, channels: Iterable[str]):
+        channels = set(channels)
+        self.items = [item for item in self.items if item.channel not in channels]
+
+    def apply_to(self, items: Iterable[rss.Item]):
+        """
+        Set the read state of each item which has an entry, in a single pass. Items of a
+        LazyEntityList which are not decoded yet are left so, and given their read state as they are
+        decoded.
+        """
+
+        if isinstance(items, LazyEntityList):
+            items.on_decode = self._apply
+            items = [items.entry(i) for i in range(len(items)) if items.is_decoded(i)]
+
+        for item in items:
+            self._apply(item)
+
+    def _apply(self, item: rss.Item):
+        guid = item.guid
+        if guid and guid.value:
+            idx = self._by_guid.get((item.channel.link, guid.value))
+        elif item.title:
+            idx = self._by_title.get((item.channel.link, item.title))
         else:
-            predicate = lambda x: x.channel == channel and x.title == title
-        
-        for idx, item in enumerate(self.items):
-            if predicate(item):
-                return idx
-        
-        return -1
+            return
+
+        if idx is not None:
+            item.read = self.items[idx].read
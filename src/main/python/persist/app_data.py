@@ -1,5 +1,6 @@
 import config
 import models
+from .journal import ReadStateJournal
 from .tasks import JSONSaveTask
 
 import os
@@ -7,11 +8,12 @@ from typing import Tuple, Iterable, Union
 
 FEED_DEFINITIONS = os.path.join(config.USER_DATA, 'feeds.json')
 APPLICATION_META = os.path.join(config.USER_DATA, 'meta.json')
+APPLICATION_JOURNAL = os.path.join(config.USER_DATA, 'meta.journal')
 
 
 def get_feeds() -> Union[Tuple[models.FeedDefinition], Tuple[()]]:
     try:
-        with open(FEED_DEFINITIONS, 'r') as fp:
+        with open(FEED_DEFINITIONS, 'rb') as fp:
             return models.FeedDefinition.load_multiple(fp)
     except FileNotFoundError:
         return ()
@@ -19,20 +21,19 @@ def get_feeds() -> Union[Tuple[models.FeedDefinition], Tuple[()]]:
 
 def get_app_meta() -> Union[models.AppMeta, None]:
     try:
-        with open(APPLICATION_META, 'r') as fp:
+        with open(APPLICATION_META, 'rb') as fp:
             return models.AppMeta.load(fp)
     except FileNotFoundError:
         return None
     
 
-def save_app_meta(meta: models.AppMeta) -> bool:
-    try:
-        with open(APPLICATION_META, 'w') as fp:
-            models.AppMeta.save(meta, fp)
+def open_journal(meta: models.AppMeta) -> ReadStateJournal:
+    """Replay the read state journal over meta, and compact it in the background."""
 
-        return True
-    except IOError:
-        return False
+    journal = ReadStateJournal(meta, APPLICATION_JOURNAL, APPLICATION_META)
+    journal.replay()
+    journal.compact()
+    return journal
 
 
 def create_save_feeds_task(feeds: Iterable[models.FeedDefinition]) -> JSONSaveTask:
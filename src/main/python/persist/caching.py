@@ -1,18 +1,22 @@
 from abc import ABC, abstractmethod
 from collections import OrderedDict
-import json
+import heapq
+import marshal
 import os
 import pathlib
+import struct
+import sys
+import threading
 import time
 
 import typing
-import datetime
 from json import JSONEncoder
-from typing import IO, TypeVar, Generic, Optional, Tuple
+from typing import TypeVar, Generic, Optional, Tuple
 
-from config import FEED_CACHE
+from config import FEED_CACHE, MEMORY_CACHE_BYTES
 
 from reader.api import rss
+from util import serialization
 
 T = TypeVar('T')
 
@@ -53,161 +57,341 @@ class AbstractCache(ABC, Generic[T]):
         raise NotImplementedError()
 
 
-V = TypeVar('V', bytes, str)
+class Codec(ABC, Generic[T]):
+    """Converts the values of a FileCache to and from the contents of its entry files."""
 
+    extension: Optional[str] = None
+    """Extension of the entry files this codec writes"""
 
-class FileCache(AbstractCache[T], Generic[T, V]):
-    def __init__(self, location: pathlib.Path, extension: str = None, encoding=None):
-        self.location = location
-        self.extension = extension
-        self.encoding = encoding
+    invalid: Optional[T] = None
+    """The value given by load for data it cannot read"""
 
     @abstractmethod
-    def write(self, value: Tuple[T, Optional[int]], destination: IO[V]):
+    def dump(self, value: T, expires: Optional[int]) -> bytes:
         raise NotImplementedError()
 
     @abstractmethod
-    def read(self, source: IO[V]) -> Tuple[T, Optional[int]]:
+    def load(self, data: bytes) -> Tuple[T, Optional[int]]:
+        """
+        :return: The value and expiry time read from data. Data this codec cannot read, e.g. that of
+                 a damaged file, gives `invalid` and an expiry time of 0.
+        """
         raise NotImplementedError()
 
-    @property
-    def write_mode(self):
-        return 'wb' if self.encoding is None else 'w'
 
-    @property
-    def read_mode(self):
-        return 'rb' if self.encoding is None else 'r'
+class FileCache(AbstractCache[T]):
+    """
+    Keeps each entry in a file of its own, written by `codec`. Entries written by any of the
+    `legacy` codecs are read as well, and are rewritten with `codec` the first time they are read.
+    """
+
+    def __init__(self, location: pathlib.Path, codec: Codec[T], legacy: typing.Sequence[Codec[T]] = ()):
+        self.location = location
+        self.codec = codec
+        self.legacy = tuple(legacy)
 
     def set(self, key: str, value: T, ex: int = None) -> bool:
         try:
-            with open(os.path.join(self.location, self.with_extension(key)), mode=self.write_mode,
-                      encoding=self.encoding) as fp:
-                write_value = (value, int(time.time() + ex) if ex else None)
-                self.write(write_value, fp)
+            with open(self.entry_path(key), mode='wb') as fp:
+                fp.write(self.codec.dump(value, int(time.time() + ex) if ex else None))
 
             return True
         except IOError:
             return False
 
-    def get(self, key: str) -> Optional[T]:
+    def _load(self, key: str, codec: Codec[T]) -> Optional[Tuple[T, Optional[int]]]:
         try:
-            with open(os.path.join(self.location, self.with_extension(key)), mode=self.read_mode,
-                      encoding=self.encoding) as fp:
-                value, expires = self.read(fp)
-                if expires and time.time() > expires:
-                    try:
-                        self.delete(key)
-                    except IOError:
-                        # We can't really do anything about this, so just ignore
-                        pass
-                    return None
-                else:
-                    return value
+            with open(self.entry_path(key, codec), mode='rb') as fp:
+                return codec.load(fp.read())
         except FileNotFoundError:
             return None
 
+    def _migrate(self, key: str) -> Optional[Tuple[T, Optional[int]]]:
+        for codec in self.legacy:
+            entry = self._load(key, codec)
+            if entry is None:
+                continue
+
+            value, expires = entry
+            if value is codec.invalid:
+                return entry
+
+            try:
+                with open(self.entry_path(key), mode='wb') as fp:
+                    fp.write(self.codec.dump(value, expires))
+                os.remove(self.entry_path(key, codec))
+            except IOError:
+                # The legacy entry is read again next time.
+                pass
+
+            return entry
+
+        return None
+
+    def get(self, key: str) -> Optional[T]:
+        entry = self._load(key, self.codec)
+        if entry is None:
+            entry = self._migrate(key)
+            if entry is None:
+                return None
+
+        value, expires = entry
+        if expires and time.time() > expires:
+            try:
+                self.delete(key)
+            except IOError:
+                # We can't really do anything about this, so just ignore
+                pass
+            return None
+        else:
+            return value
+
     def has(self, key: str) -> bool:
-        return os.path.isfile(self.entry_path(key))
+        return any(os.path.isfile(self.entry_path(key, codec)) for codec in (self.codec,) + self.legacy)
 
     def delete(self, key: str) -> bool:
+        deleted = False
         try:
-            entry_path = self.entry_path(key)
-            if os.path.isfile(entry_path):
-                os.remove(self.entry_path(key))
-                return True
-            else:
-                return False
+            for codec in (self.codec,) + self.legacy:
+                entry_path = self.entry_path(key, codec)
+                if os.path.isfile(entry_path):
+                    os.remove(entry_path)
+                    deleted = True
         except OSError:
             raise IOError("Failed to delete cache entry")
 
-    def with_extension(self, key: str):
-        if self.extension is None:
-            return key
-        else:
-            return f'{key}.{self.extension}'
+        return deleted
 
-    def entry_path(self, key: str) -> pathlib.Path:
-        return pathlib.Path(os.path.join(self.location, self.with_extension(key)))
+    def entry_path(self, key: str, codec: Optional[Codec[T]] = None) -> pathlib.Path:
+        extension = (codec or self.codec).extension
+        return pathlib.Path(self.location, key if extension is None else f'{key}.{extension}')
 
 
 class JSONModelEncoder(JSONEncoder):
     def default(self, obj):
-        if isinstance(obj, datetime.date):
-            return obj.isoformat()
-        elif isinstance(obj, bool):
-            return 1 if bool else 0
-        else:
-            return super().default(obj)
+        return serialization.default(obj)
 
 
-class ChannelFileCache(FileCache[rss.Channel, str]):
-    def __init__(self, location=FEED_CACHE):
-        super().__init__(location, 'json', encoding='utf-8')
+class JSONChannelCodec(Codec[rss.Channel]):
+    """The original cache format: [channel.to_dict(), expires] as JSON."""
+
+    extension = 'json'
+    invalid = rss.Channel.Invalid
+
+    def dump(self, value: rss.Channel, expires: Optional[int]) -> bytes:
+        return serialization.dumps([value.to_dict(), expires])
+
+    def load(self, data: bytes) -> Tuple[rss.Channel, Optional[int]]:
+        try:
+            source_data, expires = serialization.loads(data)
+            return rss.Channel.from_dict(source_data), expires
+        except (ValueError, TypeError, KeyError):
+            return self.invalid, 0
+
+
+class BinaryChannelCodec(Codec[rss.Channel]):
+    """
+    Stores channel.to_dict() with marshal, which reads and writes about twice as fast as JSON and
+    gives smaller files. A header records the format version, the marshal version and the expiry
+    time, so that entries written by another version are read as invalid rather than misread.
+    """
+
+    extension = 'feed'
+    invalid = rss.Channel.Invalid
+
+    MAGIC = b'FDRC'
+    VERSION = 1
+    """Incremented when the layout of the header or of to_dict changes"""
+
+    _HEADER = struct.Struct('<4sHHq')
+    _NEVER = -1
 
-    def write(self, value: Tuple[rss.Channel, Optional[int]], destination: IO[str]):
-        json.dump([value[0].to_dict(), value[1]], destination, cls=JSONModelEncoder)
+    def dump(self, value: rss.Channel, expires: Optional[int]) -> bytes:
+        header = self._HEADER.pack(self.MAGIC, self.VERSION, marshal.version,
+                                   self._NEVER if expires is None else expires)
+        return header + marshal.dumps(value.to_dict())
 
-    def read(self, source: IO[str]) -> Tuple[rss.Channel, Optional[int]]:
+    def load(self, data: bytes) -> Tuple[rss.Channel, Optional[int]]:
         try:
-            source_data, expires = json.load(source)
-        except json.decoder.JSONDecodeError:
-            return rss.Channel.Invalid, 0
+            magic, version, marshal_version, expires = self._HEADER.unpack_from(data)
+            if (magic, version, marshal_version) != (self.MAGIC, self.VERSION, marshal.version):
+                return self.invalid, 0
 
-        return rss.Channel.from_dict(source_data), expires
+            channel = rss.Channel.from_dict(marshal.loads(memoryview(data)[self._HEADER.size:]))
+        except (struct.error, ValueError, EOFError, TypeError, KeyError):
+            return self.invalid, 0
+
+        return channel, None if expires == self._NEVER else expires
+
+
+class ChannelFileCache(FileCache[rss.Channel]):
+    def __init__(self, location=FEED_CACHE):
+        super().__init__(location, BinaryChannelCodec(), legacy=[JSONChannelCodec()])
+
+
+class CacheStats(typing.NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    entries: int
+    size: int
+    """Estimated size of all entries, in bytes"""
+
+
+class _MemoryEntry:
+    __slots__ = ('value', 'expires', 'size')
+
+    def __init__(self, value, expires: Optional[float], size: int):
+        self.value = value
+        self.expires = expires
+        self.size = size
 
 
 class LRUMemoryCache(AbstractCache[T]):
-    maxsize: int
-    cache: typing.OrderedDict[str, T]
+    """
+    Keeps entries in memory up to an estimated total size, evicting the least recently used ones
+    first. Expired entries are dropped lazily, through a heap of expiry times checked on each access.
+    All operations are thread safe.
+    """
 
-    def __init__(self, maxsize: int = 16):
-        self.maxsize = maxsize
+    maxbytes: int
+    cache: typing.OrderedDict[str, _MemoryEntry]
+
+    def __init__(self, maxbytes: int = MEMORY_CACHE_BYTES, sizeof: typing.Callable[[T], int] = sys.getsizeof,
+                 clock: typing.Callable[[], float] = time.time):
+        """
+        :param sizeof: Estimates the size of a value, in bytes.
+        :param clock: The current time, in seconds since the epoch.
+        """
+
+        self.maxbytes = maxbytes
         self.cache = OrderedDict()
+        self._sizeof = sizeof
+        self._clock = clock
+        self._expiry: typing.List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def _remove(self, key: str) -> _MemoryEntry:
+        entry = self.cache.pop(key)
+        self._size -= entry.size
+        return entry
+
+    def _expire(self, now: float):
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            expires, key = heapq.heappop(expiry)
+            entry = self.cache.get(key)
+            # the heap keeps the expiry times of replaced entries, which are skipped
+            if entry is not None and entry.expires == expires:
+                self._remove(key)
+                self._expirations += 1
 
     def set(self, key: str, value: T, ex: int = None) -> bool:
-        self.cache[key] = (value, ex)
-        self.cache.move_to_end(key, last=False)
-        while len(self.cache) > self.maxsize:
-            self.cache.popitem(last=True)
+        size = self._sizeof(value)
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            if key in self.cache:
+                self._remove(key)
+
+            if size > self.maxbytes:
+                return False
+
+            expires = now + ex if ex else None
+            self.cache[key] = _MemoryEntry(value, expires, size)
+            self._size += size
+            if expires is not None:
+                heapq.heappush(self._expiry, (expires, key))
+
+            while self._size > self.maxbytes:
+                _, entry = self.cache.popitem(last=False)
+                self._size -= entry.size
+                self._evictions += 1
 
         return True
 
     def get(self, key: str) -> Optional[T]:
-        if key in self.cache:
-            value, expires = self.cache[key]
-
-            if time.time() > expires:
-                self.delete(key)
+        with self._lock:
+            self._expire(self._clock())
+            entry = self.cache.get(key)
+            if entry is None:
+                self._misses += 1
                 return None
-            else:
-                self.cache.move_to_end(value, last=False)
-                return value
-        else:
-            return None
+
+            self.cache.move_to_end(key)
+            self._hits += 1
+            return entry.value
 
     def has(self, key: str) -> bool:
-        return key in self.cache
+        with self._lock:
+            self._expire(self._clock())
+            return key in self.cache
 
     def delete(self, key: str) -> bool:
-        exists = key in self.cache.keys()
-        self.cache.pop(key)
-        return exists
+        with self._lock:
+            if key not in self.cache:
+                return False
+
+            self._remove(key)
+            return True
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions, self._expirations, len(self.cache),
+                              self._size)
+
+
+def estimate_channel_size(channel: rss.Channel) -> int:
+    """
+    A rough estimate of the memory held by a channel. Items measure about 1.2 kB once parsed and
+    1.8 kB as undecoded dicts for the benchmark feeds, both dominated by their text.
+    """
+
+    return 2048 + 1536 * len(channel.items or ())
 
 
 class ChannelMultiCache(AbstractCache[rss.Channel]):
+    """
+    Keeps recently used channels in memory in front of a persistent cache. Entries found only in
+    the legacy cache, if one is given, are moved to the persistent cache when first read.
+    """
+
     memcache: LRUMemoryCache[rss.Channel]
-    filecache: ChannelFileCache
+    persistent: AbstractCache[rss.Channel]
+    legacy: Optional[AbstractCache[rss.Channel]]
+
+    def __init__(self, persistent: Optional[AbstractCache[rss.Channel]] = None,
+                 legacy: Optional[AbstractCache[rss.Channel]] = None):
+        self.memcache = LRUMemoryCache(sizeof=estimate_channel_size)
+        self.persistent = persistent if persistent is not None else ChannelFileCache()
+        self.legacy = legacy
+
+    def _migrate(self, key: str) -> Optional[rss.Channel]:
+        value = self.legacy.get(key)
+        if value is None or value is rss.Channel.Invalid:
+            return value
 
-    def __init__(self):
-        self.memcache = LRUMemoryCache()
-        self.filecache = ChannelFileCache()
+        if self.persistent.set(key, value):
+            self.legacy.delete(key)
+
+        return value
 
     def get(self, key: str) -> Optional[rss.Channel]:
         mem = self.memcache.get(key)
         if mem is not None:
             return mem
 
-        value = self.filecache.get(key)
+        value = self.persistent.get(key)
+        if value is None and self.legacy is not None:
+            value = self._migrate(key)
+
         if value is not None:
             self.memcache.set(key, value)
             return value
@@ -215,7 +399,7 @@ class ChannelMultiCache(AbstractCache[rss.Channel]):
             return None
 
     def set(self, key: str, value: rss.Channel, ex: int = None) -> bool:
-        success = self.filecache.set(key, value, ex=ex)
+        success = self.persistent.set(key, value, ex=ex)
         if not success:
             return False
 
@@ -223,9 +407,11 @@ class ChannelMultiCache(AbstractCache[rss.Channel]):
 
     def has(self, key: str) -> bool:
         # Check memcache for entry first as this is faster.
-        return self.memcache.has(key) or self.filecache.has(key)
+        return self.memcache.has(key) or self.persistent.has(key) or \
+            (self.legacy is not None and self.legacy.has(key))
 
     def delete(self, key: str) -> bool:
         memcache_status = self.memcache.delete(key)
-        filecache_status = self.filecache.delete(key)
-        return memcache_status or filecache_status
+        persistent_status = self.persistent.delete(key)
+        legacy_status = self.legacy.delete(key) if self.legacy is not None else False
+        return memcache_status or persistent_status or legacy_status
@@ -0,0 +1,164 @@
+import logging
+import os
+import queue
+import threading
+from typing import List, Optional, Tuple
+
+import models
+from util import serialization
+
+from .writer import atomic_write
+
+
+class _Compaction:
+    __slots__ = ('items', 'done')
+
+    def __init__(self, items: List[models.ItemMeta]):
+        self.items = items
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class ReadStateJournal:
+    """
+    An append-only log of read state changes, in front of the AppMeta snapshot in meta.json.
+
+    Each change is recorded as a line of JSON when it is made, and written by a background thread
+    which commits every change queued since its last write with a single flush and fsync. On
+    startup the journal is replayed over the snapshot. Compaction writes a new snapshot and empties
+    the journal; it happens after a number of changes, and whenever entries are removed, which the
+    journal does not record.
+    """
+
+    COMPACT_AFTER = 10000
+
+    meta: models.AppMeta
+    path: str
+    snapshot: str
+
+    def __init__(self, meta: models.AppMeta, path: str, snapshot: str, compact_after: int = COMPACT_AFTER):
+        """
+        :param path: The journal file.
+        :param snapshot: The file the snapshot of meta is kept in, as read by app_data.get_app_meta.
+                         Only the journal writes it.
+        """
+
+        self.meta = meta
+        self.path = path
+        self.snapshot = snapshot
+        self.compact_after = compact_after
+        self.commits = 0
+        self._since_compaction = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+    def replay(self) -> int:
+        """Apply the journal to meta. Returns the number of changes applied."""
+
+        try:
+            with open(self.path, 'rb') as fp:
+                lines = fp.readlines()
+        except FileNotFoundError:
+            return 0
+
+        applied = 0
+        for line in lines:
+            try:
+                channel, guid, title, read, *rest = serialization.loads(line)
+            except (ValueError, TypeError):
+                # the tail of a write interrupted by a crash
+                logging.warning("Skipping unreadable read state journal entry")
+                continue
+
+            # entries journaled before marked times were kept have four fields
+            marked = rest[0] if rest else None
+            meta = self.meta.get(channel, guid, title)
+            if meta:
+                meta.read = read
+                meta.marked = marked
+            else:
+                self.meta.add(models.ItemMeta(channel=channel, guid=guid, title=title, read=read, marked=marked))
+            applied += 1
+
+        self._since_compaction = applied
+        return applied
+
+    def start(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write, name="journal-writer", daemon=True)
+            self._writer.start()
+
+    def record(self, meta: models.ItemMeta):
+        """Queue a change to an entry of meta to be written. Compacts the journal every compact_after changes."""
+
+        self.start()
+        self._queue.put(serialization.dumps([meta.channel, meta.guid, meta.title, meta.read, meta.marked]) + b'\n')
+        self._since_compaction += 1
+        if self._since_compaction >= self.compact_after:
+            self.compact()
+
+    def compact(self) -> threading.Event:
+        """
+        Queue a new snapshot of meta to be written, after which the journal is emptied. Returns an
+        event set once that is done.
+        """
+
+        self.start()
+        self._since_compaction = 0
+        compaction = _Compaction(list(self.meta.items))
+        self._queue.put(compaction)
+        return compaction.done
+
+    def close(self):
+        """Write every queued change, and stop the writer."""
+
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            self._writer.join()
+            self._writer = None
+
+    def _next_batch(self) -> Tuple[List[bytes], Optional[object]]:
+        """Block for the next queued entry, then take every entry queued behind it, up to a control entry."""
+
+        lines = []
+        entry = self._queue.get()
+        while isinstance(entry, bytes):
+            lines.append(entry)
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                return lines, None
+
+        return lines, entry
+
+    def _write(self):
+        with open(self.path, 'ab') as fp:
+            while True:
+                lines, control = self._next_batch()
+                if lines:
+                    try:
+                        fp.writelines(lines)
+                        fp.flush()
+                        os.fsync(fp.fileno())
+                        self.commits += 1
+                    except OSError as exc:
+                        logging.error("Could not write read state journal: %s" % str(exc))
+
+                if control is _STOP:
+                    return
+                elif control is not None:
+                    if self._write_snapshot(control):
+                        fp.seek(0)
+                        fp.truncate()
+                    control.done.set()
+
+    def _write_snapshot(self, compaction: _Compaction) -> bool:
+        try:
+            with atomic_write(self.snapshot) as fp:
+                serialization.dump({'items': [item.to_dict() for item in compaction.items]}, fp)
+            return True
+        except OSError as exc:
+            logging.error("Could not write read state snapshot, keeping the journal: %s" % str(exc))
+            return False
@@ -0,0 +1,79 @@
+import collections
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import config
+import models
+from util import serialization
+from reader.api import rss
+from reader.api.xml import LazyEntityList
+
+
+class RetentionReport(NamedTuple):
+    meta_entries: int
+    meta_bytes: int
+    """Estimated size of the removed entries in meta.json"""
+    channels: int
+    cached_items: int
+    cache_bytes: int
+
+
+def _meta_key(meta: models.ItemMeta) -> Tuple[str, str]:
+    return ('guid', meta.guid) if meta.guid else ('title', meta.title)
+
+
+def live_keys(channel: rss.Channel) -> Set[Tuple[str, str]]:
+    """The keys under which metadata of a channel's items is found, without decoding lazy items."""
+
+    items = channel.items or ()
+    keys = set()
+    for i in range(len(items)):
+        if isinstance(items, LazyEntityList):
+            guid, title = items.peek(i, 'guid'), items.peek(i, 'title')
+        else:
+            guid, title = items[i].guid, items[i].title
+
+        if guid and guid.value:
+            keys.add(('guid', guid.value))
+        elif title:
+            keys.add(('title', title))
+
+    return keys
+
+
+def expired_meta(entries: Iterable[models.ItemMeta], now: float, subscribed: Set[str],
+                 live: Dict[str, Set[Tuple[str, str]]], max_age: Optional[int] = None,
+                 per_channel: Optional[int] = None) -> List[models.ItemMeta]:
+    """
+    Select the metadata entries to drop: those of channels not subscribed to, those whose items have
+    left a channel which is cached, those marked longer than max_age seconds ago, and the oldest
+    beyond per_channel entries of a channel. Entries without a marked time never expire by age, and
+    are the first dropped beyond the cap.
+
+    :param live: Keys of the items of each cached channel, by channel link. See live_keys.
+    """
+
+    max_age = config.META_MAX_AGE if max_age is None else max_age
+    per_channel = config.META_PER_CHANNEL if per_channel is None else per_channel
+
+    expired = []
+    kept: Dict[str, List[models.ItemMeta]] = collections.defaultdict(list)
+    for entry in entries:
+        keys = live.get(entry.channel)
+        if entry.channel not in subscribed or (keys is not None and _meta_key(entry) not in keys) or \
+                (entry.marked and now - entry.marked > max_age):
+            expired.append(entry)
+        else:
+            kept[entry.channel].append(entry)
+
+    for channel_entries in kept.values():
+        if len(channel_entries) > per_channel:
+            channel_entries.sort(key=lambda entry: entry.marked or 0, reverse=True)
+            expired.extend(channel_entries[per_channel:])
+
+    return expired
+
+
+def encoded_size(entries: Iterable[models.ItemMeta]) -> int:
+    """The size of entries as they are written to meta.json, in bytes."""
+
+    return sum(len(serialization.dumps(entry.to_dict())) + 2 for entry in entries)
@@ -0,0 +1,239 @@
+import json
+import marshal
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Container, Dict, Iterable, List, Optional, Tuple
+
+from config import FEED_DATABASE
+
+from reader.api import rss
+from reader.api.xml import LazyEntityList
+
+from .caching import AbstractCache
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    key TEXT PRIMARY KEY,
+    link TEXT,
+    expires INTEGER,
+    data BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS items (
+    channel TEXT NOT NULL,
+    identity TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    pub_date INTEGER,
+    data BLOB NOT NULL,
+    PRIMARY KEY (channel, identity)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS items_by_channel_date ON items (channel, pub_date);
+CREATE INDEX IF NOT EXISTS items_by_date ON items (pub_date);
+"""
+
+
+def _identity(record: Dict[str, Any], position: int) -> str:
+    """
+    The identity of a stored item within its channel: its local key (see rss.item_key), or its
+    position for an item which has none.
+    """
+
+    guid = record.get('guid')
+    key = rss.item_key(guid['value'] if guid else None, record.get('link'), record.get('title'),
+                       record.get('description'))
+    return json.dumps(key if key is not None else ('position', position))
+
+
+def _pub_date(record: Dict[str, Any]) -> Optional[int]:
+    value = record.get('pub_date')
+    if value is None or isinstance(value, int):
+        return value
+
+    # stored before dates were stored as epoch seconds
+    return int(rss.EPOCH.decode(value).timestamp())
+
+
+class ChannelStore(AbstractCache[rss.Channel]):
+    """
+    Keeps channels in an SQLite database, with a row per channel and a row per item. Storing a
+    channel again only writes the items which were decoded since it was loaded, as undecoded items
+    are unchanged, and removes the items it no longer has. Items of all channels can be read in
+    order of publication with timeline, without loading the channels they belong to.
+
+    Each thread uses a connection of its own, and the database is in WAL mode so that reads on the
+    GUI thread are not blocked by a write in progress on a worker thread.
+    """
+
+    def __init__(self, location: str = FEED_DATABASE):
+        self.location = location
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.location)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+
+        return connection
+
+    def close(self):
+        """Close the connection of the calling thread, if it has one."""
+
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def set(self, key: str, value: rss.Channel, ex: Optional[int] = None) -> bool:
+        record = value.to_dict()
+        entries = record.pop('items') or ()
+        items = value.items if isinstance(value.items, LazyEntityList) else None
+
+        changed = []
+        moved = []
+        for position, entry in enumerate(entries):
+            identity = _identity(entry, position)
+            if items is not None and not items.is_decoded(position):
+                moved.append((position, identity, entry))
+            else:
+                changed.append((key, identity, position, _pub_date(entry), marshal.dumps(entry)))
+
+        try:
+            with self.connection as connection:
+                connection.execute(
+                    'INSERT INTO channels (key, link, expires, data) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (key) DO UPDATE SET link = excluded.link, expires = excluded.expires, '
+                    'data = excluded.data',
+                    (key, value.link, int(time.time() + ex) if ex else None, marshal.dumps(record)))
+
+                stored = {identity for identity, in connection.execute(
+                    'SELECT identity FROM items WHERE channel = ?', (key,))}
+                current = {row[1] for row in changed} | {row[1] for row in moved}
+                connection.executemany('DELETE FROM items WHERE channel = ? AND identity = ?',
+                                       ((key, identity) for identity in stored - current))
+
+                # undecoded items only need moving, unless they came from a channel stored under another key
+                changed.extend((key, identity, position, _pub_date(entry), marshal.dumps(entry))
+                               for position, identity, entry in moved if identity not in stored)
+
+                connection.executemany(
+                    'INSERT INTO items (channel, identity, position, pub_date, data) VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (channel, identity) DO UPDATE SET position = excluded.position, '
+                    'pub_date = excluded.pub_date, data = excluded.data WHERE data IS NOT excluded.data',
+                    changed)
+                connection.executemany(
+                    'UPDATE items SET position = ? WHERE channel = ? AND identity = ? AND position IS NOT ?',
+                    ((position, key, identity, position) for position, identity, _ in moved if identity in stored))
+
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _channel(self, key: str, data: bytes, items: Iterable[Dict[str, Any]]) -> rss.Channel:
+        record = marshal.loads(data)
+        record['items'] = tuple(items)
+        return rss.Channel.from_dict(record)
+
+    def get(self, key: str) -> Optional[rss.Channel]:
+        connection = self.connection
+        row = connection.execute('SELECT expires, data FROM channels WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+
+        expires, data = row
+        if expires and time.time() > expires:
+            self.delete(key)
+            return None
+
+        items = connection.execute('SELECT data FROM items WHERE channel = ? ORDER BY position', (key,))
+        return self._channel(key, data, (marshal.loads(item) for item, in items))
+
+    def has(self, key: str) -> bool:
+        return self.connection.execute('SELECT 1 FROM channels WHERE key = ?', (key,)).fetchone() is not None
+
+    def delete(self, key: str) -> bool:
+        with self.connection as connection:
+            deleted = connection.execute('DELETE FROM channels WHERE key = ?', (key,)).rowcount
+            connection.execute('DELETE FROM items WHERE channel = ?', (key,))
+
+        return deleted > 0
+
+    def size(self) -> int:
+        """The size of the database file, in bytes, after checkpointing the WAL into it."""
+
+        self.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return os.path.getsize(self.location)
+
+    def compact(self, keep: Container[str]) -> Tuple[int, int, int]:
+        """
+        Delete the channels which are expired or not stored under a key in `keep`, with their items,
+        and vacuum the database. Returns the number of channels and items deleted, and the bytes
+        reclaimed.
+        """
+
+        connection = self.connection
+        before = self.size()
+        now = time.time()
+        doomed = [key for key, expires in connection.execute('SELECT key, expires FROM channels')
+                  if key not in keep or (expires and now > expires)]
+
+        items = 0
+        with connection:
+            for key in doomed:
+                items += connection.execute('DELETE FROM items WHERE channel = ?', (key,)).rowcount
+                connection.execute('DELETE FROM channels WHERE key = ?', (key,))
+        connection.execute('VACUUM')
+
+        return len(doomed), items, before - self.size()
+
+    def keys(self) -> List[str]:
+        return [key for key, in self.connection.execute('SELECT key FROM channels')]
+
+    def timeline(self, limit: int, before: Optional[int] = None,
+                 keys: Optional[Iterable[str]] = None) -> List[rss.Item]:
+        """
+        The latest items of all channels, or of the channels stored under `keys`, newest first.
+        Items without a publication date come last. Each item's channel holds only the items
+        returned with it.
+
+        :param before: Only return items published before this time, in seconds since the epoch,
+                       for paging through the timeline.
+        """
+
+        query = 'SELECT channel, data FROM items'
+        conditions = []
+        parameters: List[Any] = []
+        if before is not None:
+            conditions.append('pub_date < ?')
+            parameters.append(before)
+        if keys is not None:
+            keys = list(keys)
+            conditions.append('channel IN (%s)' % ', '.join('?' * len(keys)))
+            parameters.extend(keys)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY pub_date IS NULL, pub_date DESC LIMIT ?'
+        parameters.append(limit)
+
+        connection = self.connection
+        rows = connection.execute(query, parameters).fetchall()
+        grouped: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+        for index, (key, data) in enumerate(rows):
+            grouped.setdefault(key, []).append((index, marshal.loads(data)))
+
+        result: List[Optional[rss.Item]] = [None] * len(rows)
+        for key, entries in grouped.items():
+            data, = connection.execute('SELECT data FROM channels WHERE key = ?', (key,)).fetchone()
+            channel = self._channel(key, data, (record for _, record in entries))
+            for (index, _), item in zip(entries, channel.items):
+                result[index] = item
+
+        return result
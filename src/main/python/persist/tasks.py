@@ -1,29 +1,37 @@
 from concurrency import tasks
 
 from persist.caching import AbstractCache
+from persist.store import ChannelStore
+import models
 
-from . import lockfile
+from . import retention
+from .writer import atomic_write
+from util import serialization
 
-import json
-from typing import IO, TypeVar, Generic
+import time
+from typing import IO, List, Tuple, TypeVar, Generic
 
 
 T = TypeVar('T')
 
 
 class SaveTask(tasks.Task):
+    """
+    Replaces the file at path atomically. Run by persist.writer.SaveWriter, which coalesces saves
+    to the same path.
+    """
+
     def __init__(self, path):
         super().__init__()
         self.path = path
 
     def execute(self):
-        with open(self.path, 'w') as fp:
-            lockfile.lock(fp)
+        with atomic_write(self.path) as fp:
             self.save(fp)
 
     # Conflict between ABCMeta and QObject metaclass
     # disables use of Python's abstract base classes
-    def save(self, fp: IO[str]):
+    def save(self, fp: IO[bytes]):
         raise NotImplementedError()
     
     def __str__(self):
@@ -35,8 +43,8 @@ class JSONSaveTask(SaveTask):
         super().__init__(path)
         self.data = data
 
-    def save(self, fp: IO[str]):
-        json.dump(self.data, fp)
+    def save(self, fp: IO[bytes]):
+        serialization.dump(self.data, fp)
     
     def __str__(self):
         return "json " + super().__str__()
@@ -53,4 +61,33 @@ class CacheTask(tasks.Task, Generic[T]):
         self.cache.set(self.key, self.value)
 
     def __str__(self):
-        return f"saving cache entry {self.key}"
\ No newline at end of file
+        return f"saving cache entry {self.key}"
+
+
+class RetentionTask(tasks.Task):
+    """
+    Apply the retention policy of persist.retention to copies of the metadata entries and the feed
+    list, and compact the channel store. The expired entries are returned rather than removed, for
+    the caller to remove on the thread which owns the metadata.
+    """
+
+    def __init__(self, entries: List[models.ItemMeta], feeds: List[models.FeedDefinition], store: ChannelStore):
+        super().__init__()
+        self.entries = entries
+        self.feeds = feeds
+        self.store = store
+
+    def execute(self) -> Tuple[List[models.ItemMeta], retention.RetentionReport]:
+        live = {}
+        for feed in self.feeds:
+            channel = self.store.get(feed.cache_key) if feed.cache_key else None
+            if channel:
+                live[channel.link] = retention.live_keys(channel)
+
+        expired = retention.expired_meta(self.entries, time.time(), {feed.channel for feed in self.feeds}, live)
+        channels, items, reclaimed = self.store.compact({feed.cache_key for feed in self.feeds if feed.cache_key})
+        return expired, retention.RetentionReport(len(expired), retention.encoded_size(expired), channels, items,
+                                                  reclaimed)
+
+    def __str__(self):
+        return "retention"
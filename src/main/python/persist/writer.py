@@ -0,0 +1,140 @@
+"""
+Writing of saved files.
+
+Files are replaced atomically: the new contents are written to a temporary file beside the target,
+flushed to disk and renamed over it, so that a crash leaves either the old file or the new one and
+never a torn one. SaveTasks are run by a SaveWriter, which coalesces the saves pending for each
+path so that only the latest is written, however many were requested while a write was under way.
+"""
+import contextlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import IO, Dict, Iterator, List, Optional
+
+from concurrency.tasks import Task
+
+
+@contextlib.contextmanager
+def atomic_write(path: str) -> Iterator[IO[bytes]]:
+    """Open a temporary file to write the contents of path to, which replaces path on success."""
+
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(descriptor, 'wb') as fp:
+            yield fp
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(temporary)
+        raise
+
+    # the rename itself is only durable once the directory is flushed, which Windows cannot do
+    if hasattr(os, 'O_DIRECTORY'):
+        descriptor = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+
+class SaveWriter:
+    """
+    Runs SaveTasks, one at a time, on a thread of its own. Its start(task) stands in for
+    QThreadPool.start. A task started while another for the same path is pending supersedes it;
+    the superseded task is not run, and emits the result of the one which was.
+    """
+
+    writes: int
+    """Number of tasks run"""
+
+    def __init__(self):
+        self.writes = 0
+        self._pending: Dict[str, List[Task]] = OrderedDict()
+        self._condition = threading.Condition()
+        self._writing = False
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, task: Task):
+        """Schedule a save. Thread safe; the result is emitted through task.signals.finished."""
+
+        with self._condition:
+            if self._stopping:
+                raise RuntimeError("The writer is closed")
+
+            self._pending.setdefault(task.path, []).append(task)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="save-writer", daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+
+                _, waiting = self._pending.popitem(last=False)
+                self._writing = True
+
+            result = waiting[-1].result()
+            self.writes += 1
+            if len(waiting) > 1:
+                logging.info(f"[COALESCED] {len(waiting) - 1} superseded by {str(waiting[-1])}")
+            for task in waiting:
+                task.signals.finished.emit(result)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait for every pending save to be written. Returns False if timeout elapsed first."""
+
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+    def close(self):
+        """Write every pending save, and stop the writer thread."""
+
+        with self._condition:
+            self._stopping = True
+            thread, self._thread = self._thread, None
+            self._condition.notify_all()
+
+        if thread is not None:
+            thread.join()
+
+
+_writer: Optional[SaveWriter] = None
+_writer_lock = threading.Lock()
+
+
+def writer() -> SaveWriter:
+    """The shared writer, started on first use."""
+
+    global _writer
+
+    with _writer_lock:
+        if _writer is None:
+            _writer = SaveWriter()
+
+        return _writer
+
+
+def shutdown():
+    """Write the saves pending on the shared writer, if it was started, and stop it."""
+
+    global _writer
+
+    with _writer_lock:
+        current, _writer = _writer, None
+
+    if current is not None:
+        current.close()
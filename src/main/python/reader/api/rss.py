@@ -1,22 +1,35 @@
 from __future__ import annotations
 
-from datetime import datetime
-import functools
-from lxml.etree import XMLParser
-from lxml.html import fromstring as html_fromstring
+from datetime import datetime, timezone
+import io
+import itertools
+from lxml.etree import XMLParser, XMLSyntaxError, iterparse
 import typing
 
 from .xml import *
 
-from util import dateutil
+import config
+from util import dateutil, text
 
 
-class Category(XMLEntityDef):
+def _decode_date(value: typing.Union[int, str]) -> datetime:
+    if isinstance(value, str):
+        # stored before dates were stored as epoch seconds
+        return dateutil.parse(value)
+
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+EPOCH = WireFormat(lambda value: int(value.timestamp()), _decode_date)
+"""Stores dates as seconds since the UTC epoch"""
+
+
+class Category(XMLEntityDef, slots=True):
     domain: typing.Optional[str] = XMLAttribute('domain')
     value: str = XMLTextContent(XMLTextContent.primitive)
 
 
-class Cloud(XMLEntityDef):
+class Cloud(XMLEntityDef, slots=True):
     domain: typing.Optional[str] = XMLAttribute('domain')
     path: typing.Optional[str] = XMLAttribute('path')
     port: typing.Optional[str] = XMLAttribute('port')
@@ -24,7 +37,7 @@ class Cloud(XMLEntityDef):
     register_procedure: typing.Optional[str] = XMLAttribute('registerProcedure')
 
 
-class Image(XMLEntityDef):
+class Image(XMLEntityDef, slots=True):
     link: str = XMLPrimitive('link', str, rule=XMLEntityRule.SINGLE)
     title: str = XMLPrimitive('title', str, rule=XMLEntityRule.SINGLE)
     url: str = XMLPrimitive('url', str, rule=XMLEntityRule.SINGLE)
@@ -33,17 +46,17 @@ class Image(XMLEntityDef):
     width: typing.Optional[int] = XMLPrimitive('width', int, rule=XMLEntityRule.SINGLE_OPTIONAL)
 
 
-class Item(XMLEntityDef):
-    class Enclosure(XMLEntityDef):
+class Item(XMLEntityDef, slots=True):
+    class Enclosure(XMLEntityDef, slots=True):
         length: int = XMLAttribute('length', optional=False, processor=lambda x: int(x))
         type: str = XMLAttribute('type', optional=False)
         url: str = XMLAttribute('url', optional=False)
 
-    class GUID(XMLEntityDef):
+    class GUID(XMLEntityDef, slots=True):
         is_permalink: typing.Optional[str] = XMLAttribute('isPermaLink')
         value: str = XMLTextContent(XMLTextContent.primitive)
 
-    class Source(XMLEntityDef):
+    class Source(XMLEntityDef, slots=True):
         url: str = XMLAttribute('url', optional=False)
         value: str = XMLTextContent(XMLTextContent.primitive)
 
@@ -54,16 +67,24 @@ class Item(XMLEntityDef):
     enclosure: Enclosure = XMLEntity('enclosure', Enclosure, rule=XMLEntityRule.MULTIPLE_OPTIONAL)
     guid: GUID = XMLEntity('guid', GUID, rule=XMLEntityRule.SINGLE_OPTIONAL)
     link: str = XMLPrimitive('link', str, rule=XMLEntityRule.SINGLE_OPTIONAL)
-    pub_date: datetime = XMLPrimitive('pubDate', dateutil.parse, rule=XMLEntityRule.SINGLE_OPTIONAL)
+    pub_date: datetime = XMLPrimitive('pubDate', dateutil.parse, rule=XMLEntityRule.SINGLE_OPTIONAL, wire=EPOCH)
     source: Source = XMLEntity('source', Source, rule=XMLEntityRule.SINGLE_OPTIONAL)
     title: str = XMLPrimitive('title', str, rule=XMLEntityRule.SINGLE_OPTIONAL)
 
     # These are our custom attributes which we use to track item state.
     read: bool = False
 
-    @functools.cached_property
-    def plain_description(self):
-        return html_fromstring(self.description).text_content().strip()
+    summary: typing.Optional[str] = None
+    """The start of the description as plain text, computed once and stored with the item"""
+
+    INCLUDE = {'summary': 'summary'}
+
+    @property
+    def plain_description(self) -> str:
+        if self.summary is None:
+            self.summary = text.strip_html(self.description or '', config.SUMMARY_LENGTH)
+
+        return self.summary
 
     def __eq__(self, other: Item) -> bool:
         if self._parent and other._parent:
@@ -96,6 +117,29 @@ class Item(XMLEntityDef):
         
         return False
 
+    def __hash__(self) -> int:
+        key = self.identity_key
+        return id(self) if key is None else hash(key)
+
+    @property
+    def local_key(self) -> typing.Optional[tuple]:
+        """Identity of this item within its channel. See item_key."""
+
+        return item_key(self.guid.value if self.guid else None, self.link, self.title, self.description)
+
+    @property
+    def identity_key(self) -> typing.Optional[tuple]:
+        """
+        A hashable key which is equal for two items exactly when they compare equal, or None if this
+        item compares equal to nothing (having no guid, no link, and not both a title and description).
+        """
+
+        local = self.local_key
+        if local is None:
+            return None
+
+        return self._parent.link if self._parent else None, local
+
     def belongsTo(self, channel: Channel) -> bool:
         if self._parent:
             return self._parent == channel
@@ -107,17 +151,34 @@ class Item(XMLEntityDef):
         return self._parent
 
 
-class Channel(XMLEntityDef):
+def item_key(guid: typing.Optional[str], link: typing.Optional[str], title: typing.Optional[str],
+             description: typing.Optional[str]) -> typing.Optional[tuple]:
+    """
+    Identity of an item within its channel, following the precedence of Item.__eq__: the value of
+    its guid if it has one, then the link, then the title and description together.
+    """
+
+    if guid is not None:
+        return 'guid', guid
+    elif link:
+        return 'link', link
+    elif title and description:
+        return 'text', title, description
+    else:
+        return None
+
+
+class Channel(XMLEntityDef, slots=True):
     Empty: Channel
     Invalid: Channel
 
-    class SkipDays(XMLEntityDef):
+    class SkipDays(XMLEntityDef, slots=True):
         days: typing.List[str] = XMLPrimitive('day', str, rule=XMLEntityRule.MULTIPLE)
 
-    class SkipHours(XMLEntityDef):
+    class SkipHours(XMLEntityDef, slots=True):
         hours: typing.List[int] = XMLPrimitive('hour', int, rule=XMLEntityRule.MULTIPLE)
 
-    class TextInput(XMLEntityDef):
+    class TextInput(XMLEntityDef, slots=True):
         description: str = XMLPrimitive('description', str, rule=XMLEntityRule.SINGLE)
         link: str = XMLPrimitive('link', str, rule=XMLEntityRule.SINGLE)
         name: str = XMLPrimitive('name', str, rule=XMLEntityRule.SINGLE)
@@ -135,7 +196,7 @@ class Channel(XMLEntityDef):
     language: typing.Optional[str] = XMLPrimitive('language', str, rule=XMLEntityRule.SINGLE_OPTIONAL)
     last_build_date: typing.Optional[str] = XMLPrimitive('lastBuildDate', str, rule=XMLEntityRule.SINGLE_OPTIONAL)
     managing_editor: typing.Optional[str] = XMLPrimitive('managingEditor', str, rule=XMLEntityRule.SINGLE_OPTIONAL)
-    pub_date: datetime = XMLPrimitive('pubDate', dateutil.parse, rule=XMLEntityRule.SINGLE_OPTIONAL)
+    pub_date: datetime = XMLPrimitive('pubDate', dateutil.parse, rule=XMLEntityRule.SINGLE_OPTIONAL, wire=EPOCH)
     rating: str = XMLPrimitive('rating', str, rule=XMLEntityRule.SINGLE_OPTIONAL)
     skip_days: typing.Optional[typing.List[str]] = XMLEntity('skipDays', SkipDays, rule=XMLEntityRule.SINGLE_OPTIONAL)
     skip_hours: typing.Optional[typing.List[int]] = XMLEntity('skipHours', SkipHours, rule=XMLEntityRule.SINGLE_OPTIONAL)
@@ -143,11 +204,18 @@ class Channel(XMLEntityDef):
     ttl: typing.Optional[int] = XMLPrimitive('ttl', int, rule=XMLEntityRule.SINGLE_OPTIONAL)
     web_master: typing.Optional[str] = XMLPrimitive('webMaster', str, rule=XMLEntityRule.SINGLE_OPTIONAL)
 
-    items = XMLEntity('item', Item, rule=XMLEntityRule.MULTIPLE_OPTIONAL)
+    items = XMLEntity('item', Item, rule=XMLEntityRule.MULTIPLE_OPTIONAL, lazy=True)
 
     ref: typing.Optional[str] = None
     """URL referring to this feed"""
 
+    etag: typing.Optional[str] = None
+    last_modified: typing.Optional[str] = None
+    """HTTP validators the feed was served with, for conditional requests. See FetchTask."""
+
+    unchanged: typing.Optional[typing.List[typing.Tuple[int, tuple]]] = None
+    """Document positions and local keys of the items skipped by a delta parse, until merge_unchanged"""
+
     def __eq__(self, other: Channel) -> bool:
         if self.link and other.link:
             return self.link == other.link
@@ -192,21 +260,213 @@ class RSSError(Exception):
     pass
 
 
-def parse_feed(source: str, strict: bool = False) -> Channel:
+def _check_root(root) -> None:
+    assert root.tag == "rss", RSSError("Expected rss for root element, got '%s' instead" % root.tag)
+    assert root.get('version') == '2.0', RSSError("Expected 2.0 for RSS version, got '%s' instead"
+                                                  % str(root.get('version')))
+
+
+def _check_items(channel: Channel) -> None:
+    for item in channel.items:
+        if item.description is None and item.title is None:
+            raise RSSError("Item contains neither title nor description")
+
+
+def _text_value(node) -> str:
+    """The value XMLTextContent.primitive gives the text of an element."""
+
+    for segment in itertools.chain((node.text,), (child.tail for child in node)):
+        if segment and segment.strip():
+            return segment.strip()
+
+    return ''
+
+
+def element_key(node) -> typing.Optional[tuple]:
+    """The local key of an undecoded <item> element, read in a single pass over its children."""
+
+    children = {}
+    for child in node:
+        children.setdefault(child.tag, child)
+
+    guid = children.get('guid')
+    link, title, description = (str(children[tag].text) if tag in children else None
+                                for tag in ('link', 'title', 'description'))
+    return item_key(None if guid is None else _text_value(guid), link, title, description)
+
+
+def _peek_key(items: LazyEntityList, index: int) -> typing.Optional[tuple]:
+    guid = items.peek(index, 'guid')
+    return item_key(guid.value if guid else None, items.peek(index, 'link'), items.peek(index, 'title'),
+                    items.peek(index, 'description'))
+
+
+def known_keys(channel: Channel) -> typing.Dict[tuple, int]:
+    """
+    Map the local keys of a channel's items to their positions, for use as the `known` argument of
+    parse_feed. Items of a lazily loaded channel are not decoded.
+    """
+
+    items = channel.items or ()
+    if isinstance(items, LazyEntityList):
+        keys = (_peek_key(items, i) for i in range(len(items)))
+    else:
+        keys = (item.local_key for item in items)
+
+    return {key: index for index, key in enumerate(keys) if key is not None}
+
+
+def merge_unchanged(channel: Channel, previous: Channel) -> Channel:
+    """
+    Complete a channel produced by a delta parse with the items it skipped, taken from the version
+    of the channel whose keys were passed to parse_feed. Items keep their document order, and those
+    taken from a lazily loaded channel stay undecoded.
+
+    Items no longer in previous, which may have been replaced or pruned since the fetch started,
+    are left out; not being known, they are decoded when the feed is next fetched.
+    """
+
+    if not channel.unchanged:
+        channel.unchanged = None
+        return channel
+
+    positions = known_keys(previous)
+    skipped = dict(channel.unchanged)
+    fresh = iter(channel.items)
+    old = previous.items
+    lazy = isinstance(old, LazyEntityList)
+
+    entries = []
+    for position in range(len(channel.items) + len(skipped)):
+        key = skipped.get(position)
+        if key is None:
+            entries.append(next(fresh))
+        elif key in positions:
+            entries.append(old.entry(positions[key]) if lazy else old[positions[key]])
+
+    channel.items = LazyEntityList(Item, entries, parent=channel)
+    for index in range(len(entries)):
+        if channel.items.is_decoded(index):
+            channel.items[index]._parent = channel
+    channel.unchanged = None
+
+    return channel
+
+
+def _skip_known(node, position: int, known: typing.Container[tuple],
+                unchanged: typing.List[typing.Tuple[int, tuple]]) -> bool:
+    key = element_key(node)
+    if key is not None and key in known:
+        unchanged.append((position, key))
+        return True
+
+    return False
+
+
+def parse_feed(source: typing.Union[str, bytes, typing.IO[bytes]], strict: bool = False,
+               encoding: typing.Optional[str] = None, known: typing.Optional[typing.Container[tuple]] = None) -> Channel:
+    """
+    Parse an RSS 2.0 document. Text sources are cleaned of invalid characters and parsed into a
+    complete tree; bytes and binary file-like objects are handed to parse_feed_stream.
+
+    If `known` is given, the document is delta parsed: items whose local keys are in `known` are
+    not decoded, and are listed in Channel.unchanged instead. See known_keys and merge_unchanged.
+    """
+
+    if not isinstance(source, str):
+        return parse_feed_stream(source, strict, encoding, known)
+
     parser = XMLParser()
     parser.feed(clean_invalid_string(source))
     tree = parser.close()
 
-    assert tree.tag == "rss", RSSError("Expected rss for root element, got '%s' instead" % tree.tag)
-    assert tree.get('version') == '2.0', RSSError("Expected 2.0 for RSS version, got '%s' instead"
-                                                  % str(tree.get('version')))
+    _check_root(tree)
 
-    channel = tree.find('channel')
-    assert channel is not None, RSSError("RSS element has no channel!")
+    channel_node = tree.find('channel')
+    assert channel_node is not None, RSSError("RSS element has no channel!")
 
-    channel = Channel.from_xml(channel, strict)
-    for item in channel.items:
-        if item.description is None and item.title is None:
-            raise RSSError("Item contains neither title nor description")
+    with dateutil.feed_scope():
+        unchanged = []
+        if known is not None:
+            for position, node in enumerate(list(channel_node.iterchildren('item'))):
+                if _skip_known(node, position, known, unchanged):
+                    channel_node.remove(node)
+
+        channel = Channel.from_xml(channel_node, strict)
+
+    if known is not None:
+        channel.unchanged = unchanged
+
+    _check_items(channel)
+
+    return channel
+
+
+def parse_feed_stream(source: typing.Union[bytes, typing.IO[bytes]], strict: bool = False,
+                      encoding: typing.Optional[str] = None,
+                      known: typing.Optional[typing.Container[tuple]] = None) -> Channel:
+    """
+    Parse an RSS 2.0 document incrementally. Each <item> is built as soon as its closing tag is
+    read and is then discarded from the underlying tree, so memory use is bounded by the size of
+    a single item rather than by the size of the document.
+
+    The document's encoding is taken from `encoding` if given (e.g. the charset of an HTTP
+    response), and otherwise from its BOM or XML declaration. Documents are parsed as-is; only if
+    that fails is a bytes source cleaned of control characters and parsed again in recover mode.
+    """
+
+    with dateutil.feed_scope():
+        if isinstance(source, (bytes, bytearray)):
+            try:
+                channel = _iterparse_channel(io.BytesIO(source), strict, encoding, known)
+            except XMLSyntaxError:
+                channel = _iterparse_channel(io.BytesIO(clean_invalid_bytes(source)), strict, encoding, known,
+                                             recover=True)
+        else:
+            channel = _iterparse_channel(source, strict, encoding, known)
+
+    _check_items(channel)
+
+    return channel
+
+
+def _iterparse_channel(source: typing.IO[bytes], strict: bool, encoding: typing.Optional[str],
+                       known: typing.Optional[typing.Container[tuple]], recover: bool = False) -> Channel:
+    context = iterparse(source, events=('start', 'end'), tag=('rss', 'channel', 'item'), encoding=encoding,
+                        recover=recover)
+    root = None
+    channel_node = None
+    channel = None
+    items = []
+    unchanged = []
+
+    for event, node in context:
+        if root is None:
+            root = node.getroottree().getroot()
+            _check_root(root)
+
+        if event == 'start':
+            if channel_node is None and node.tag == 'channel' and node.getparent() is root:
+                channel_node = node
+        elif node.tag == 'item':
+            if channel_node is not None and node.getparent() is channel_node:
+                position = len(items) + len(unchanged)
+                if known is None or not _skip_known(node, position, known, unchanged):
+                    items.append(Item.from_xml(node, strict))
+                channel_node.remove(node)
+        elif node is channel_node:
+            channel = Channel.from_xml(channel_node, strict)
+            channel.items = items
+            if known is not None:
+                channel.unchanged = unchanged
+            for item in items:
+                item._parent = channel
+            channel_node.clear()
+
+    if root is None:
+        root = context.root
+        _check_root(root)
+
+    assert channel is not None, RSSError("RSS element has no channel!")
 
     return channel
@@ -1,11 +1,11 @@
 from __future__ import annotations
 
 import enum
-from functools import reduce
+import functools
 import collections.abc
 import re
 import sys
-from typing import Dict, Any, TypeVar, Type
+from typing import Callable, Dict, Any, Iterable, Iterator, NamedTuple, Optional, Tuple, TypeVar, Type
 import xml.etree.ElementTree as ETree
 
 
@@ -120,16 +120,29 @@ class XMLEntityRule(enum.Enum):
 		return self in [self.SINGLE_OPTIONAL, self.MULTIPLE_OPTIONAL]
 
 
+class WireFormat(NamedTuple):
+	"""How to_dict stores a primitive value: encode gives a plain JSON value which decode restores."""
+
+	encode: Callable[[Any], Any]
+	decode: Callable[[Any], Any]
+
+
 class XMLPrimitive:
 	__xmltype__ = True
 
-	def __init__(self, tag, processor, rule=XMLEntityRule.SINGLE):
+	def __init__(self, tag, processor, rule=XMLEntityRule.SINGLE, wire: Optional[WireFormat] = None):
+		"""
+		:param wire: The wire format of values whose processed form is not a plain JSON value. Other
+					 values are stored as they are.
+		"""
+
 		assert isinstance(tag, str), TypeError("tag must be a str")
 		assert isinstance(rule, XMLEntityRule), TypeError("rule must be an XMLEntityRule")
 
 		self.tag = tag
 		self.rule = rule
 		self.process = processor
+		self.wire = wire
 
 	def from_xml(self, node, _=None):
 		return self.process(node.text)
@@ -184,20 +197,289 @@ class XMLTextContent:
 			return self.processor(raw)
 
 
+def _compile_parser(entity_type):
+	"""
+	Build the from_xml implementation for an entity class. Field defaults, tag dispatch, rule checks
+	and parent assignment are all resolved here, once per class, so that parsing a node only does
+	the work that node actually requires.
+	"""
+
+	singles = []
+	multiples = []
+	dispatch = {}
+	required_singles = []
+	required_multiples = []
+	entity_singles = []
+	entity_multiples = []
+
+	for field, handler in entity_type.__xmltypes__.values():
+		multiple = handler.rule.is_multiple()
+		entity = isinstance(handler, XMLEntity)
+		if multiple:
+			multiples.append(field)
+			if handler.rule.is_required():
+				required_multiples.append(field)
+			if entity:
+				entity_multiples.append(field)
+		else:
+			singles.append(field)
+			if handler.rule.is_required():
+				required_singles.append(field)
+			if entity:
+				entity_singles.append(field)
+
+		convert = handler.type.__xmlparse__ if entity else handler.process
+		dispatch[handler.tag] = (field, multiple, entity, convert)
+
+	attributes = tuple(entity_type.__xmlattributes__.items())
+	text_field, text_handler = entity_type.__xmltext__ or (None, None)
+
+	def parse(node, strict=True):
+		data = dict.fromkeys(singles)
+		for field in multiples:
+			data[field] = []
+
+		for field, attribute in attributes:
+			data[field] = attribute.from_xml(node)
+
+		if text_handler is not None:
+			text = [node.text or '']
+
+		for child in node:
+			if text_handler is not None and child.tail is not None:
+				text.append(child.tail)
+
+			entry = dispatch.get(child.tag)
+			if entry is None:
+				if strict:
+					raise XMLEntityConstraintError("Unexpected tag '%s' in parent node '%s'" % (child.tag, node.tag))
+				else:
+					continue
+
+			field, multiple, entity, convert = entry
+			value = convert(child, strict) if entity else convert(child.text)
+			if multiple:
+				data[field].append(value)
+			elif data[field] is not None:
+				raise XMLEntityConstraintError("Field '%s' cannot have more than one value." % field)
+			else:
+				data[field] = value
+
+		if text_handler is not None:
+			data[text_field] = text_handler.from_text([item.strip() for item in text if item.strip() != ''])
+
+		for field in required_singles:
+			if data[field] is None:
+				raise XMLEntityConstraintError("%s cannot be None" % field)
+
+		for field in required_multiples:
+			if not data[field]:
+				raise XMLEntityConstraintError("%s must not be empty" % field)
+
+		result = entity_type(**data)
+		for field in entity_singles:
+			if data[field] is not None:
+				data[field]._parent = result
+
+		for field in entity_multiples:
+			for item in data[field]:
+				item._parent = result
+
+		return result
+
+	return parse
+
+
+def _compile_serializers(entity_type):
+	"""
+	Build the to_dict and from_dict implementations for an entity class, along with the decoder of
+	each field's stored form. Stored values were produced by to_dict, so they are restored without
+	being processed or validated again.
+	"""
+
+	encoders = {}
+	decoders = {}
+	required = []
+	entity_singles = []
+	entity_multiples = []
+	lazy_fields = []
+
+	for field, handler in entity_type.__xmltypes__.values():
+		multiple = handler.rule.is_multiple()
+		if handler.rule.is_required():
+			required.append(field)
+
+		if isinstance(handler, XMLEntity):
+			subtype = handler.type
+			if handler.lazy:
+				lazy_fields.append(field)
+				encoders[field] = lambda value: tuple(value.to_dicts()) if isinstance(value, LazyEntityList) \
+					else tuple(item.to_dict() for item in value)
+				decoders[field] = functools.partial(LazyEntityList, subtype)
+			elif multiple:
+				entity_multiples.append(field)
+				encoders[field] = lambda value: tuple(item.to_dict() for item in value)
+				decoders[field] = lambda value, subtype=subtype: [subtype.from_dict(item) for item in value]
+			else:
+				entity_singles.append(field)
+				encoders[field] = subtype.to_dict
+				decoders[field] = subtype.from_dict
+		elif handler.wire is not None:
+			encode, decode = handler.wire
+			if multiple:
+				encoders[field] = lambda value, encode=encode: [encode(item) for item in value]
+				decoders[field] = lambda value, decode=decode: [decode(item) for item in value]
+			else:
+				encoders[field] = encode
+				decoders[field] = decode
+		elif multiple:
+			decoders[field] = list
+
+	fields = [field for field, _ in entity_type.__xmltypes__.values()] + list(entity_type.__xmlattributes__)
+	if entity_type.__xmltext__ is not None:
+		fields.append(entity_type.__xmltext__[0])
+
+	stored = tuple(field for field in fields if field not in encoders)
+	loaded = tuple(field for field in fields if field not in decoders)
+	encoded = tuple(encoders.items())
+	decoded = tuple(decoders.items())
+	included = tuple(entity_type.INCLUDE.items())
+	missing = object()
+
+	def to_dict(entity):
+		output = {}
+		for field in stored:
+			output[field] = getattr(entity, field)
+
+		for field, encode in encoded:
+			value = getattr(entity, field)
+			output[field] = None if value is None else encode(value)
+
+		for source, destination in included:
+			output[destination] = getattr(entity, source, None)
+
+		return output
+
+	def from_dict(source):
+		for field in required:
+			if source.get(field) is None:
+				raise ValueError("source missing expected key '%s'" % field)
+
+		data = {}
+		for field in loaded:
+			data[field] = source.get(field)
+
+		for field, decode in decoded:
+			value = source.get(field)
+			data[field] = None if value is None else decode(value)
+
+		for destination, source_key in included:
+			value = source.get(source_key, missing)
+			if value is not missing:
+				data[destination] = value
+
+		result = entity_type(**data)
+		for field in entity_singles:
+			if data[field] is not None:
+				data[field]._parent = result
+
+		for field in entity_multiples:
+			for item in data[field] or ():
+				item._parent = result
+
+		for field in lazy_fields:
+			if data[field] is not None:
+				data[field].parent = result
+
+		return result
+
+	return to_dict, from_dict, decoders
+
+
+class _SlotCachedProperty:
+	"""Equivalent of functools.cached_property for slotted entities, backed by a dedicated slot."""
+
+	def __init__(self, func, slot):
+		self.func = func
+		self.slot = slot
+		self.__doc__ = func.__doc__
+
+	def __get__(self, instance, owner=None):
+		if instance is None:
+			return self
+
+		try:
+			return getattr(instance, self.slot)
+		except AttributeError:
+			value = self.func(instance)
+			setattr(instance, self.slot, value)
+			return value
+
+	def __set__(self, instance, value):
+		setattr(instance, self.slot, value)
+
+	def __delete__(self, instance):
+		delattr(instance, self.slot)
+
+
+def _slot_defaults(dct):
+	"""Find annotated, non-XML class attributes with plain default values, e.g. `read: bool = False`."""
+
+	defaults = {}
+	for key in dct.get('__annotations__', {}):
+		if key not in dct or key.startswith('__'):
+			continue
+
+		value = dct[key]
+		if getattr(value, '__xmltype__', False) or callable(value) or hasattr(value, '__get__'):
+			continue
+
+		defaults[key] = value
+
+	return defaults
+
+
+def _compile_init(defaults):
+	"""Generate an __init__ assigning every slot directly, with keyword defaults taken from `defaults`."""
+
+	parameters = ', '.join('%s=__defaults[%r]' % (key, key) for key in defaults)
+	assignments = ''.join('\n\tself.%s = %s' % (key, key) for key in defaults)
+	source = 'def __init__(self, *, %s, **kw):%s\n\tfor k, v in kw.items():\n\t\tsetattr(self, k, v)\n' % (
+		parameters, assignments)
+
+	namespace = {'__defaults': defaults}
+	exec(source, namespace)
+	return namespace['__init__']
+
+
 class XMLEntityMeta(type):
-	def __new__(mcs, name, bases, dct):
-		entity_type = super().__new__(mcs, name, bases, dct)
+	"""
+	Collects the XML field declarations of XMLEntityDef subclasses and compiles their parsers.
+
+	Passing slots=True in the class statement (class Item(XMLEntityDef, slots=True)) generates
+	__slots__ for every declared field, for `_parent`, and for annotated attributes with defaults,
+	so instances carry no per-object __dict__. A generated __init__ assigns every slot, using these
+	defaults for missing keywords, and any functools.cached_property is rebound to a slot of its own.
+	"""
 
+	def __new__(mcs, name, bases, dct, slots=False):
 		if dct.get('abstract', False):
+			entity_type = super().__new__(mcs, name, bases, dct)
 			del dct['abstract']
 			return entity_type
 
-		attributes = reduce(lambda a, b: a.update(b), [getattr(base, "__xmlattributes__", {}) for base in bases])
-		tag_types = reduce(lambda a, b: a.update(b), [getattr(base, "__xmltypes__", {}) for base in bases])
+		attributes = {}
+		tag_types = {}
+		for base in bases:
+			attributes.update(getattr(base, "__xmlattributes__", {}))
+			tag_types.update(getattr(base, "__xmltypes__", {}))
+
 		text_handler = getattr(bases[-1], "__xmltext__", None) if len(bases) else None
+		fields = []
 		for key, value in dct.items():
 			is_xml_type = getattr(value, '__xmltype__', False)
 			if is_xml_type:
+				fields.append(key)
 				if isinstance(value, XMLAttribute):
 					attributes[key] = value
 				elif isinstance(value, XMLTextContent):
@@ -208,14 +490,69 @@ class XMLEntityMeta(type):
 				else:
 					tag_types[value.tag] = (key, value)
 
+		defaults = {}
+		cached = []
+		for base in bases:
+			defaults.update(getattr(base, "__xmldefaults__", {}))
+			cached.extend(getattr(base, "__xmlcached__", ()))
+		state = None
+
+		if slots:
+			dct = dict(dct)
+			inherited = set(defaults)
+			extra = _slot_defaults(dct)
+			for key in fields:
+				del dct[key]
+				defaults[key] = None
+			for key, value in extra.items():
+				del dct[key]
+				defaults[key] = value
+			for key in dct.get('INCLUDE', {}):
+				defaults.setdefault(key, None)
+			if '_parent' not in inherited:
+				defaults['_parent'] = None
+
+			new_cached = []
+			for key, value in list(dct.items()):
+				if isinstance(value, functools.cached_property):
+					slot = '_cached_' + key
+					dct[key] = _SlotCachedProperty(value.func, slot)
+					new_cached.append(slot)
+
+			cached.extend(new_cached)
+			state = tuple(key for key in defaults if key != '_parent') + tuple(cached)
+			dct['__slots__'] = tuple(key for key in defaults if key not in inherited) + tuple(new_cached)
+			if '__init__' not in dct:
+				dct['__init__'] = _compile_init(defaults)
+
+		entity_type = super().__new__(mcs, name, bases, dct)
+
 		entity_type.__xmlattributes__ = attributes
 		entity_type.__xmltypes__ = tag_types
 		entity_type.__xmltext__ = text_handler
+		entity_type.__xmlfields__ = {**{field: handler for field, handler in tag_types.values()}, **attributes}
+		if text_handler is not None:
+			entity_type.__xmlfields__[text_handler[0]] = text_handler[1]
+		entity_type.__xmldefaults__ = defaults
+		entity_type.__xmlcached__ = tuple(cached)
+		entity_type.__xmlstate__ = state
+		entity_type.__xmlparse__ = staticmethod(_compile_parser(entity_type))
+		to_dict, from_dict, decoders = _compile_serializers(entity_type)
+		entity_type.__xmlencode__ = staticmethod(to_dict)
+		entity_type.__xmldecode__ = staticmethod(from_dict)
+		entity_type.__xmldecoders__ = decoders
 
 		return entity_type
 
+	def __init__(cls, name, bases, dct, slots=False):
+		super().__init__(name, bases, dct)
+
 
 class XMLEntityDef(metaclass=XMLEntityMeta):
+	__slots__ = ()
+	__xmldefaults__: Dict[str, Any] = {}
+	__xmlstate__: Optional[Tuple[str, ...]] = None
+
 	abstract = True
 
 	_parent: XMLEntity | None = None
@@ -226,6 +563,19 @@ class XMLEntityDef(metaclass=XMLEntityMeta):
 		for k, v in kw.items():
 			setattr(self, k, v)
 
+	def __reduce_ex__(self, protocol):
+		"""
+		Slotted entities pickle as their class and a tuple of slot values in a fixed order, leaving out
+		parent links, which are restored on unpickling. This keeps the pickled form of a channel compact
+		and free of reference cycles.
+		"""
+
+		state = self.__xmlstate__
+		if state is None:
+			return super().__reduce_ex__(protocol)
+
+		return _restore_entity, (type(self), tuple(getattr(self, key, _UNSET) for key in state))
+
 	@classmethod
 	def from_string(cls, string, strict=True):
 		tree = ETree.fromstring(string)
@@ -233,6 +583,16 @@ class XMLEntityDef(metaclass=XMLEntityMeta):
 
 	@classmethod
 	def from_xml(cls, node, strict=True):
+		return cls.__xmlparse__(node, strict)
+
+	@classmethod
+	def interpret_xml(cls, node, strict=True):
+		"""
+		Generic, table-driven equivalent of from_xml. The compiled parser built by XMLEntityMeta
+		is used in practice; this is kept as the reference implementation it is checked and
+		benchmarked against.
+		"""
+
 		data = {entity_key: entity_value.rule.get_default() for entity_key, entity_value in
 										cls.__xmltypes__.values()}
 
@@ -254,7 +614,10 @@ class XMLEntityDef(metaclass=XMLEntityMeta):
 				else:
 					continue
 
-			processed = processor.from_xml(child, strict)
+			if isinstance(processor, XMLEntity):
+				processed = processor.type.interpret_xml(child, strict)
+			else:
+				processed = processor.from_xml(child, strict)
 			processor.rule.set_value(data, field, processed)
 
 		# Third, handle text content, if applicable.
@@ -281,112 +644,200 @@ class XMLEntityDef(metaclass=XMLEntityMeta):
 		return result
 
 	def to_dict(self) -> Dict[str, Any]:
-		output = {}
-		for field, processor in self.__xmltypes__.values():
-			raw = getattr(self, field)
-			if isinstance(processor, XMLEntity):
-				if raw is None:
-					assign = None
-				else:
-					if processor.rule.is_multiple():
-						assign = tuple(item.to_dict() for item in raw)
-					else:
-						assign = raw.to_dict()
-			else:
-				assign = raw
-			output[field] = assign
+		"""
+		The fields of this entity as plain values, with nested entities as dicts, multiple values as
+		sequences and primitives with a wire format encoded by it.
+		"""
 
-		for field in self.__xmlattributes__.keys():
-			output[field] = getattr(self, field)
+		return self.__xmlencode__(self)
 
-		if self.__xmltext__ is not None:
-			field = self.__xmltext__[0]
-			output[field] = getattr(self, field)
-
-		for source, destination in self.INCLUDE.items():
-			output[destination] = getattr(self, source, None)
+	@classmethod
+	def from_dict(cls, source: Dict[str, Any]) -> X:
+		"""Restore an entity from the output of to_dict. Lazy fields are decoded on first access."""
 
-		return output
+		return cls.__xmldecode__(source)
 
 	@classmethod
-	def from_dict(cls, source: Dict[str, Any]) -> X:
-		data = {}
-		for key, processor in cls.__xmltypes__.values():
-			try:
-				value = source[key]
-				processor.rule.validate(value)
-				if isinstance(processor, XMLEntity):
-					subtype = processor.type
-					if value is None:
-						data[key] = None
-					else:
-						if processor.rule.is_multiple():
-							data[key] = list(subtype.from_dict(item) for item in value)
-						else:
-							data[key] = subtype.from_dict(value)
-				else:
-					try:
-						data[key] = processor.process(value or '')
-					except ValueError:
-						data[key] = None
-			except KeyError:
-				if processor.rule.is_required():
-					raise ValueError("source missing expected key '%s'" % key)
-				else:
-					data[key] = None
+	def peek(cls, source, field: str) -> Any:
+		"""
+		Decode a single field of a raw entity, either a dict produced by to_dict or an XML element,
+		without decoding the rest of it.
+		"""
+
+		processor = cls.__xmlfields__[field]
+		if isinstance(source, dict):
+			value = source.get(field)
+			decode = cls.__xmldecoders__.get(field)
+			return value if value is None or decode is None else decode(value)
+		elif isinstance(processor, XMLAttribute):
+			return processor.from_xml(source)
+		elif isinstance(processor, XMLTextContent):
+			return getattr(cls.from_xml(source, strict=False), field)
+		elif processor.rule.is_multiple():
+			return [processor.from_xml(child, False) for child in source.iterchildren(processor.tag)]
+		else:
+			child = source.find(processor.tag)
+			return None if child is None else processor.from_xml(child, False)
 
-		for key in cls.__xmlattributes__.keys():
-			try:
-				data[key] = source[key]
-			except KeyError:
-				raise ValueError("source missing expected key '%s'" % key)
 
-		if cls.__xmltext__ is not None:
-			key = cls.__xmltext__[0]
-			try:
-				data[key] = source[key]
-			except KeyError:
-				raise ValueError("source missing expected key '%s'" % key)
+X = TypeVar('X', bound=XMLEntityDef)
 
-		for destination_key, source_key in cls.INCLUDE.items():
-			data[destination_key] = source.get(source_key)
+_UNSET = object()
 
-		result = cls(**data)
-		for pair in cls.__xmltypes__.values():
-			field, processor = pair
-			try:
-				processor.rule.validate(data[field])
-			except XMLEntityConstraintError as xmlerr:
-				raise XMLEntityConstraintError(str(xmlerr) % field)
-			
-			if processor.rule.is_single() and isinstance(data[field], XMLEntityDef):
-				data[field]._parent = result
-			elif processor.rule.is_multiple() and any([isinstance(item, XMLEntityDef) for item in data[field]]):
-				for item in data[field]:
-					item._parent = result
-		
-		return result
 
+def _restore_entity(entity_type, state):
+	entity = entity_type.__new__(entity_type)
+	entity._parent = None
+	for key, value in zip(entity_type.__xmlstate__, state):
+		if value is not _UNSET:
+			setattr(entity, key, value)
 
-X = TypeVar('X', bound=XMLEntityDef)
+	for field, handler in entity_type.__xmlfields__.items():
+		if isinstance(handler, XMLEntity):
+			value = getattr(entity, field)
+			if isinstance(value, LazyEntityList):
+				value.parent = entity
+			elif isinstance(value, XMLEntityDef):
+				value._parent = entity
+			elif value is not None:
+				for item in value:
+					item._parent = entity
+
+	return entity
 
 
 class XMLEntity:
 	__xmltype__ = True
 
-	def __init__(self, tag: str, subtype: Type[XMLEntityDef], rule: XMLEntityRule = XMLEntityRule.SINGLE):
+	def __init__(self, tag: str, subtype: Type[XMLEntityDef], rule: XMLEntityRule = XMLEntityRule.SINGLE,
+				 lazy: bool = False):
+		"""
+		:param lazy: For multiple entities only: decode entities loaded by from_dict on first access,
+					 through a LazyEntityList, rather than all at once.
+		"""
+
 		assert isinstance(tag, str), TypeError("tag should be a str")
 		assert issubclass(subtype, XMLEntityDef), TypeError("subtype must be a subclass of XMLEntityDef")
 		assert isinstance(rule, XMLEntityRule), TypeError("rule must be an instance of XMLEntityRule")
+		assert not lazy or rule.is_multiple(), ValueError("only multiple entities can be lazy")
 
 		self.tag = tag
 		self.type = subtype
 		self.rule = rule
+		self.lazy = lazy
 
 	def from_xml(self, node, strict=True):
 		return self.type.from_xml(node, strict=strict)
 
 
+class LazyEntityList(collections.abc.MutableSequence):
+	"""
+	A list of entities held in their raw form, either dicts produced by to_dict or XML elements,
+	each of which is decoded into an entity the first time it is accessed. Individual fields can be
+	read from undecoded entries with peek. Entries which are already entities are held as they are.
+	"""
+
+	__slots__ = ('type', 'parent', 'on_decode', '_raw', '_entities')
+
+	on_decode: Optional[Callable[[XMLEntityDef], None]]
+	"""Called with each entry as it is decoded, to complete it with state not held in its raw form"""
+
+	def __init__(self, entity_type: Type[XMLEntityDef], raw: Iterable[Any] = (), parent: XMLEntityDef = None):
+		self.type = entity_type
+		self.parent = parent
+		self.on_decode = None
+		self._raw = list(raw)
+		self._entities = [None] * len(self._raw)
+		for index, entry in enumerate(self._raw):
+			if isinstance(entry, XMLEntityDef):
+				self._entities[index] = entry
+				self._raw[index] = None
+
+	def _decode(self, index: int) -> XMLEntityDef:
+		raw = self._raw[index]
+		if isinstance(raw, dict):
+			entity = self.type.from_dict(raw)
+		else:
+			entity = self.type.from_xml(raw, strict=False)
+
+		entity._parent = self.parent
+		self._entities[index] = entity
+		self._raw[index] = None
+		if self.on_decode is not None:
+			self.on_decode(entity)
+		return entity
+
+	def __len__(self) -> int:
+		return len(self._entities)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return [self[i] for i in range(*index.indices(len(self)))]
+
+		entity = self._entities[index]
+		return self._decode(index) if entity is None else entity
+
+	def __iter__(self):
+		for index, entity in enumerate(self._entities):
+			yield self._decode(index) if entity is None else entity
+
+	def __setitem__(self, index, value):
+		if isinstance(index, slice):
+			value = list(value)
+			self._raw[index] = [None] * len(value)
+		else:
+			self._raw[index] = None
+
+		self._entities[index] = value
+
+	def __delitem__(self, index):
+		del self._raw[index]
+		del self._entities[index]
+
+	def insert(self, index: int, value: XMLEntityDef):
+		self._raw.insert(index, None)
+		self._entities.insert(index, value)
+
+	def __reduce__(self):
+		return _restore_lazy_list, (self.type, self._raw, self._entities)
+
+	def is_decoded(self, index: int) -> bool:
+		return self._entities[index] is not None
+
+	def entry(self, index: int) -> Any:
+		"""The entity at the given index if it has been decoded, and its raw form otherwise."""
+
+		entity = self._entities[index]
+		return self._raw[index] if entity is None else entity
+
+	def peek(self, index: int, field: str) -> Any:
+		"""Read one field of an entry, decoding only that field if the entry itself is not yet decoded."""
+
+		entity = self._entities[index]
+		if entity is None:
+			return self.type.peek(self._raw[index], field)
+		else:
+			return getattr(entity, field)
+
+	def to_dicts(self) -> Iterator[Dict[str, Any]]:
+		"""Serialize every entry, passing undecoded dicts through untouched."""
+
+		for raw, entity in zip(self._raw, self._entities):
+			if entity is not None:
+				yield entity.to_dict()
+			elif isinstance(raw, dict):
+				yield raw
+			else:
+				yield self.type.from_xml(raw, strict=False).to_dict()
+
+
+def _restore_lazy_list(entity_type, raw, entities):
+	result = LazyEntityList(entity_type)
+	result._raw = raw
+	result._entities = entities
+	return result
+
+
 # SOURCE: https://stackoverflow.com/questions/1707890/fast-way-to-filter-illegal-xml-unicode-chars-in-python
 # These are the characters that make XML invalid. By filtering these out, we can make otherwise valid XML
 # entirely valid.
@@ -414,3 +865,16 @@ def clean_invalid_string(raw: str):
 	"""
 
 	return _illegal_chars_regexp.sub("", raw)
+
+
+# C0 control characters other than tab, line feed and carriage return. These are single bytes in
+# UTF-8 and in every other ASCII compatible encoding, so they can be removed without decoding.
+_illegal_bytes_regexp = re.compile(b'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def clean_invalid_bytes(raw: bytes):
+	"""
+	Filters invalid control characters out of an encoded document
+	in an ASCII compatible encoding, without decoding it.
+	"""
+
+	return _illegal_bytes_regexp.sub(b"", raw)
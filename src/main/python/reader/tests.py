@@ -62,6 +62,7 @@ class XMLAPITests(unittest.TestCase):
 	last
 </root>
 """)
+		cls.tree = test_tree
 		cls.structure = XMLTestEntity.from_xml(test_tree)
 
 	def test_single_primitive(self):
@@ -106,6 +107,12 @@ class XMLAPITests(unittest.TestCase):
 		self.assertEqual(text[0], "first")
 		self.assertEqual(text[1], "last")
 
+	def test_compiled_matches_interpreted(self):
+		interpreted = XMLTestEntity.interpret_xml(self.tree)
+		self.assertEqual(self.structure.to_dict(), interpreted.to_dict())
+		self.assertIs(self.structure.compound._parent, self.structure)
+		self.assertIs(self.structure.entries[1]._parent, self.structure)
+
 	def test_attribute_fail(self):
 		with self.assertRaises(xmlapi.XMLEntityAttributeError):
 			ShortXMLTestEntity.from_string("""
@@ -0,0 +1,46 @@
+"""
+Measure how long it takes to load a large cached channel, and how much memory it holds once loaded.
+
+Run from src/main/python with: python -m tests.benchmarks.bench_cache
+"""
+import gc
+import json
+import time
+import tracemalloc
+
+from persist.caching import JSONModelEncoder
+from reader.api import rss
+from tests.benchmarks.feeds import generate_feed
+
+ITEMS = 10000
+
+
+def _measure(name, load):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    channel = load()
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{name:>24}: {elapsed * 1000:8.1f} ms, {size / 1024:8.0f} KiB")
+    return channel
+
+
+def main():
+    serialized = json.dumps(rss.parse_feed(generate_feed(ITEMS)).to_dict(), cls=JSONModelEncoder)
+
+    def lazy():
+        return rss.Channel.from_dict(json.loads(serialized))
+
+    def eager():
+        channel = rss.Channel.from_dict(json.loads(serialized))
+        list(channel.items)
+        return channel
+
+    _measure('json + from_dict, lazy', lazy)
+    _measure('json + from_dict, eager', eager)
+
+
+if __name__ == '__main__':
+    main()
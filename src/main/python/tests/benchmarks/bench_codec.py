@@ -0,0 +1,53 @@
+"""
+Compare the JSON and binary channel cache formats: file size, and the time taken to write and then
+read back a cache of 50 feeds of 200 items each, as at startup, and a single 10k item feed.
+
+Run from src/main/python with: python -m tests.benchmarks.bench_codec
+"""
+import pathlib
+import tempfile
+import time
+
+from persist import caching
+from reader.api import rss
+from tests.benchmarks.feeds import generate_feed
+
+REPEAT = 5
+
+
+def _bench(name: str, codec: caching.Codec, channels):
+    with tempfile.TemporaryDirectory() as location:
+        cache = caching.FileCache(pathlib.Path(location), codec)
+        writes = []
+        reads = []
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            for index, channel in enumerate(channels):
+                cache.set(str(index), channel)
+            writes.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for index in range(len(channels)):
+                cache.get(str(index))
+            reads.append(time.perf_counter() - start)
+
+        size = sum(path.stat().st_size for path in pathlib.Path(location).iterdir())
+
+    print(f"{name:>24}: write {min(writes) * 1000:7.1f} ms, read {min(reads) * 1000:7.1f} ms, "
+          f"{size / 1024:8.0f} KiB")
+
+
+def main():
+    for label, channels in (('50 x 200 items', [rss.parse_feed(generate_feed(200)) for _ in range(50)]),
+                            ('1 x 10000 items', [rss.parse_feed(generate_feed(10000))])):
+        for channel in channels:
+            for item in channel.items:
+                item.plain_description
+
+        print(label)
+        _bench('json', caching.JSONChannelCodec(), channels)
+        _bench('binary', caching.BinaryChannelCodec(), channels)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Micro-benchmarks for util.dateutil over a corpus of pubDate values seen in real feeds.
+
+Run from src/main/python with: python -m tests.benchmarks.bench_dateutil
+"""
+import datetime
+import timeit
+
+import config
+from util import dateutil
+
+CORPUS = [
+    'Tue, 10 Jun 2003 04:00:00 GMT',
+    'Mon, 06 Sep 2021 16:45:00 +0000',
+    'Fri, 21 Apr 2023 09:12:33 -0400',
+    'Wed, 02 Oct 2002 13:00:00 EST',
+    'Wed, 02 Oct 2002 15:00:00 +0200',
+    'Thu, 13 Jul 2023 08:00:00 PDT',
+    'Sat, 1 Jul 2023 12:00 GMT',
+    '27 Jun 2023 18:30:00 +0100',
+    'Sun, 05 Mar 23 10:20:30 GMT',
+    'Tue, 14 Feb 2023 07:05:09 Z',
+    '2023-06-27T18:30:00+01:00',
+    '2023-06-27T18:30:00',
+]
+
+NUMBER = 20000
+
+
+def legacy_parse(datetime_str: str) -> datetime.datetime:
+    for dateformat in config.DATETIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(datetime_str, dateformat)
+        except ValueError:
+            try:
+                return datetime.datetime.fromisoformat(datetime_str)
+            except ValueError:
+                pass
+
+    raise ValueError("Could not parse datetime string '%s'" % datetime_str)
+
+
+def _run(name, func, values):
+    def run():
+        for value in values:
+            try:
+                func(value)
+            except ValueError:
+                pass
+
+    seconds = min(timeit.repeat(run, number=NUMBER // len(values), repeat=3))
+    print(f"{name:>28}: {seconds / (NUMBER // len(values) * len(values)) * 1e6:6.2f} us/date")
+
+
+def main():
+    rfc822 = CORPUS[:10]
+    uniform = ['Tue, %02d Jun 2003 04:%02d:00 GMT' % (1 + i % 28, i % 60) for i in range(100)]
+    parser = dateutil.DateParser()
+
+    for label, values in (('mixed corpus', CORPUS), ('rfc 822 corpus', rfc822), ('single feed', uniform)):
+        print(label)
+        _run('legacy strptime loop', legacy_parse, values)
+        _run('DateParser.parse', parser.parse, values)
+        _run('DateParser.epoch', parser.epoch, values)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+Compare a full parse of a refreshed 1000 item feed with a delta parse against the previous version,
+where two items are new.
+
+Run from src/main/python with: python -m tests.benchmarks.bench_delta
+"""
+import timeit
+
+from reader.api import rss
+from tests.benchmarks.feeds import generate_feed
+
+ITEMS = 1000
+NEW = 2
+REPEAT = 5
+
+
+def main():
+    previous = rss.parse_feed(generate_feed(ITEMS))
+    head, _, tail = generate_feed(ITEMS).partition(b'<item>')
+    entries = b''.join(b'<item><title>New %d</title><guid>new-%d</guid></item>' % (i, i) for i in range(NEW))
+    refreshed = head + entries + b'<item>' + tail
+
+    def full():
+        rss.parse_feed(refreshed)
+
+    def delta():
+        rss.merge_unchanged(rss.parse_feed(refreshed, known=rss.known_keys(previous)), previous)
+
+    for name, func in (('full', full), ('delta', delta)):
+        best = min(timeit.repeat(func, number=1, repeat=REPEAT))
+        print(f"{name:>12}: {best * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Refresh 1000 feeds from a local server which takes a fixed delay to respond to each request, with a
+Batch of FetchTasks started on the QThreadPool and on the asyncio engine of concurrency.aio. Feeds
+are parsed in-thread, so the comparison is of fetching alone.
+
+Run from src/main/python with: python -m tests.benchmarks.bench_fetch
+"""
+import asyncio
+import threading
+import time
+
+from aiohttp import web
+from PyQt5.QtCore import QCoreApplication, QThreadPool
+
+import config
+from concurrency import aio, scheduling, tasks
+from tests.benchmarks.feeds import generate_feed
+
+FEEDS = 1000
+DELAY = 0.2
+ITEMS = 20
+
+
+def serve(ready: threading.Event, address: list):
+    feed = generate_feed(ITEMS)
+
+    async def handle(request):
+        await asyncio.sleep(DELAY)
+        return web.Response(body=feed, content_type='application/rss+xml', charset='utf-8')
+
+    async def start():
+        app = web.Application()
+        app.router.add_get('/{feed}', handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0, backlog=FEEDS)
+        await site.start()
+        address.append(runner.addresses[0][1])
+        ready.set()
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(start())
+    loop.run_forever()
+
+
+def refresh(app: QCoreApplication, pool, port: int) -> float:
+    batch = tasks.Batch([tasks.FetchTask(f'http://127.0.0.1:{port}/{i}') for i in range(FEEDS)])
+    failed = []
+    batch.complete.connect(lambda results: failed.extend(result for result in results if result.error))
+    batch.complete.connect(lambda _: app.quit())
+
+    start = time.perf_counter()
+    batch.start(pool)
+    app.exec_()
+    elapsed = time.perf_counter() - start
+    if failed:
+        print(f"{len(failed)} fetches failed, e.g. {failed[0].error!r}")
+    return elapsed
+
+
+def main():
+    config.PARSE_PROCESSES = 0
+    ready = threading.Event()
+    address = []
+    threading.Thread(target=serve, args=(ready, address), daemon=True).start()
+    ready.wait()
+
+    app = QCoreApplication([])
+    pool = QThreadPool.globalInstance()
+    # the feeds all live on one host here, which would otherwise be limited as such
+    engine = aio.FetchEngine(scheduler=scheduling.HostScheduler(concurrency=FEEDS, rate=FEEDS, burst=FEEDS))
+    for name, runner in ((f'threads ({pool.maxThreadCount()})', pool),
+                         (f'asyncio ({engine.concurrency})', engine)):
+        print(f"{name:>14}: {refresh(app, runner, address[0]):6.2f} s")
+
+    engine.close()
+
+
+if __name__ == '__main__':
+    main()
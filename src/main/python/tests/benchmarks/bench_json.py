@@ -0,0 +1,114 @@
+"""
+Time writing and reading back the JSON persisted by the app with each installed backend of
+util.serialization, at ten times a typical size: feeds.json with 500 feeds, meta.json with 100k
+entries, and the JSON channel cache with 10 feeds of 2000 items.
+
+Run from src/main/python with: python -m tests.benchmarks.bench_json
+"""
+import pathlib
+import tempfile
+import time
+
+import models
+from persist import caching
+from reader.api import rss
+from tests.benchmarks.feeds import generate_feed
+from util import serialization
+
+REPEAT = 5
+FEEDS = 500
+ENTRIES = 100_000
+CHANNELS = 10
+ITEMS = 2000
+
+
+def _bench(name: str, save, load):
+    saves = []
+    loads = []
+    with tempfile.TemporaryDirectory() as location:
+        path = pathlib.Path(location) / 'data.json'
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            save(path)
+            saves.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            load(path)
+            loads.append(time.perf_counter() - start)
+
+        size = sum(entry.stat().st_size for entry in pathlib.Path(location).iterdir())
+
+    print(f"{name:>10}: save {min(saves) * 1000:8.1f} ms, load {min(loads) * 1000:8.1f} ms, {size / 1024:8.0f} KiB")
+
+
+def _model_file(model, value):
+    def save(path):
+        with open(path, 'wb') as fp:
+            model.save(value, fp)
+
+    def load(path):
+        with open(path, 'rb') as fp:
+            model.load(fp)
+
+    return save, load
+
+
+def _feeds_file(feeds):
+    def save(path):
+        with open(path, 'wb') as fp:
+            models.JSONModel.save_multiple(feeds, fp)
+
+    def load(path):
+        with open(path, 'rb') as fp:
+            models.FeedDefinition.load_multiple(fp)
+
+    return save, load
+
+
+def _cache_files(channels):
+    codec = caching.JSONChannelCodec()
+
+    def save(path):
+        for index, channel in enumerate(channels):
+            path.with_suffix(f'.{index}').write_bytes(codec.dump(channel, None))
+
+    def load(path):
+        for index in range(len(channels)):
+            codec.load(path.with_suffix(f'.{index}').read_bytes())
+
+    return save, load
+
+
+def main():
+    feeds = [models.FeedDefinition(url=f'https://example.com/{n}/feed.xml', channel=f'https://example.com/{n}',
+                                   nickname=f'Feed {n}', last_retrieved=1615000000,
+                                   cache_key=f'{n:032x}', ttl=60, skip_days=[5, 6], skip_hours=[0, 1, 2],
+                                   etag=f'"{n:016x}"', last_modified='Mon, 01 Mar 2021 00:00:00 GMT')
+             for n in range(FEEDS)]
+    meta = models.AppMeta(items=[models.ItemMeta(channel=f'https://example.com/{n % FEEDS}',
+                                                 guid=f'urn:example:item:{n}', title=None, read=n % 3 == 0,
+                                                 marked=1615000000 + n) for n in range(ENTRIES)])
+    channels = [rss.parse_feed(generate_feed(ITEMS)) for _ in range(CHANNELS)]
+    for channel in channels:
+        for item in channel.items:
+            item.plain_description
+
+    previous = serialization.backend
+    for label, (save, load) in (('feeds.json', _feeds_file(feeds)),
+                                ('meta.json', _model_file(models.AppMeta, meta)),
+                                ('cache', _cache_files(channels))):
+        print(label)
+        for name in ('json', 'ujson', 'orjson'):
+            try:
+                serialization.select(name)
+            except ImportError:
+                print(f"{name:>10}: not installed")
+                continue
+
+            _bench(name, save, load)
+
+    serialization.backend = previous
+
+
+if __name__ == '__main__':
+    main()
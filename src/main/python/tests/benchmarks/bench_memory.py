@@ -0,0 +1,31 @@
+"""
+Measure the resident size of parsed channels, per item.
+
+Run from src/main/python with: python -m tests.benchmarks.bench_memory
+"""
+import gc
+import tracemalloc
+
+from reader.api import rss
+from tests.benchmarks.feeds import generate_feed
+
+ITEMS = 10000
+
+
+def main():
+    source = generate_feed(ITEMS)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    channel = rss.parse_feed(source)
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    total = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    print(f"{len(channel.items)} items: {total / 1024:.0f} KiB total, {total / ITEMS:.0f} bytes/item")
+
+
+if __name__ == '__main__':
+    main()
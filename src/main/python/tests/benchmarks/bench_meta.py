@@ -0,0 +1,58 @@
+"""
+Apply read states from 100k metadata entries to the items of a batch of channels, with the indexed
+AppMeta.apply_to and with the linear search AppMeta.find_item used to do. The linear search is
+timed on a sample of the items, and scaled up.
+
+Run from src/main/python with: python -m tests.benchmarks.bench_meta
+"""
+import time
+
+import models
+from reader.api import rss
+from tests.benchmarks.feeds import generate_feed
+
+ENTRIES = 100_000
+CHANNELS = 50
+ITEMS = 200
+SAMPLE = 100
+
+
+def linear_find(meta: models.AppMeta, channel: str, guid: str) -> int:
+    for idx, item in enumerate(meta.items):
+        if item.channel == channel and item.guid == guid:
+            return idx
+
+    return -1
+
+
+def main():
+    channels = []
+    for n in range(CHANNELS):
+        channel = rss.parse_feed(generate_feed(ITEMS))
+        channel.link = f'https://example.com/{n}'
+        channels.append(channel)
+    items = [item for channel in channels for item in channel.items]
+
+    entries = [models.ItemMeta(channel=f'https://example.com/{n % (CHANNELS * 4)}', guid=f'urn:example:item:{n}',
+                               title=None, read=True) for n in range(ENTRIES)]
+
+    start = time.perf_counter()
+    meta = models.AppMeta(items=entries)
+    index = time.perf_counter() - start
+
+    start = time.perf_counter()
+    meta.apply_to(items)
+    indexed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for item in items[:SAMPLE]:
+        linear_find(meta, item.channel.link, item.guid.value)
+    linear = (time.perf_counter() - start) * len(items) / SAMPLE
+
+    print(f"{'index build':>12}: {index * 1000:10.1f} ms")
+    print(f"{'apply_to':>12}: {indexed * 1000:10.1f} ms for {len(items)} items")
+    print(f"{'linear':>12}: {linear * 1000:10.1f} ms (estimated)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+def generate_feed(items: int) -> bytes:
+    """Build an RSS 2.0 document with the given number of fully populated items."""
+
+    entries = ''.join(f"""
+    <item>
+        <title>Item {i}</title>
+        <link>https://example.com/items/{i}</link>
+        <description>&lt;p&gt;Description of &lt;b&gt;item {i}&lt;/b&gt; &amp;amp; friends&lt;/p&gt;</description>
+        <author>author{i % 7}@example.com (Author {i % 7})</author>
+        <category domain="https://example.com/categories">Category {i % 5}</category>
+        <enclosure url="https://example.com/media/{i}.mp3" length="{1000 + i}" type="audio/mpeg" />
+        <guid isPermaLink="false">urn:example:item:{i}</guid>
+        <pubDate>Tue, {1 + i % 28:02d} Jun 2003 {i % 24:02d}:{i % 60:02d}:00 GMT</pubDate>
+    </item>""" for i in range(items))
+
+    return f"""<?xml version="1.0" encoding="UTF-8" ?>
+<rss version="2.0">
+<channel>
+    <title>Benchmark Feed</title>
+    <link>https://example.com</link>
+    <description>A generated feed used for benchmarks</description>
+    <language>en-us</language>
+    <ttl>60</ttl>{entries}
+</channel>
+</rss>""".encode('utf-8')
@@ -0,0 +1,162 @@
+import json
+import threading
+import time
+
+import pytest
+
+from persist import caching
+from reader.api import rss
+from tests.benchmarks.feeds import generate_feed
+
+
+def _encoded(channel: rss.Channel):
+    return json.loads(json.dumps(channel.to_dict(), cls=caching.JSONModelEncoder))
+
+
+@pytest.fixture
+def channel() -> rss.Channel:
+    return rss.parse_feed(generate_feed(20))
+
+
+@pytest.fixture
+def cache(tmp_path) -> caching.ChannelFileCache:
+    return caching.ChannelFileCache(location=tmp_path)
+
+
+def test_binary_round_trip(cache: caching.ChannelFileCache, channel: rss.Channel):
+    assert cache.set('key', channel, ex=60)
+    assert cache.entry_path('key').read_bytes().startswith(caching.BinaryChannelCodec.MAGIC)
+
+    loaded = cache.get('key')
+    assert loaded.to_dict() == channel.to_dict()
+    assert loaded.items[3].channel is loaded
+
+
+@pytest.mark.parametrize('codec', [caching.BinaryChannelCodec(), caching.JSONChannelCodec()])
+def test_codec_expiry(codec: caching.Codec, channel: rss.Channel):
+    assert codec.load(codec.dump(channel, None))[1] is None
+    assert codec.load(codec.dump(channel, 1700000000))[1] == 1700000000
+
+
+@pytest.mark.parametrize('data', [
+    b'',
+    b'FDRC',
+    b'not a cache entry at all',
+    caching.BinaryChannelCodec._HEADER.pack(b'FDRC', caching.BinaryChannelCodec.VERSION + 1, 0, -1) + b'\x00',
+])
+def test_binary_unreadable(data: bytes):
+    assert caching.BinaryChannelCodec().load(data) == (rss.Channel.Invalid, 0)
+
+
+def test_json_entries_migrate(cache: caching.ChannelFileCache, channel: rss.Channel):
+    legacy = cache.entry_path('key', caching.JSONChannelCodec())
+    expires = int(time.time()) + 60
+    legacy.write_text(json.dumps([channel.to_dict(), expires], cls=caching.JSONModelEncoder), encoding='utf-8')
+    assert cache.has('key')
+
+    assert _encoded(cache.get('key')) == _encoded(channel)
+    assert not legacy.exists()
+    assert caching.BinaryChannelCodec().load(cache.entry_path('key').read_bytes())[1] == expires
+    assert _encoded(cache.get('key')) == _encoded(channel)
+
+
+def test_unreadable_json_not_migrated(cache: caching.ChannelFileCache):
+    legacy = cache.entry_path('key', caching.JSONChannelCodec())
+    legacy.write_text('{', encoding='utf-8')
+
+    assert cache.get('key') is rss.Channel.Invalid
+    assert legacy.exists()
+    assert not cache.entry_path('key').exists()
+
+
+def test_expired_entry_deleted(cache: caching.ChannelFileCache, channel: rss.Channel):
+    cache.set('key', channel, ex=60)
+    path = cache.entry_path('key')
+    path.write_bytes(caching.BinaryChannelCodec().dump(channel, int(time.time()) - 1))
+
+    assert cache.get('key') is None
+    assert not cache.has('key')
+    assert not cache.delete('key')
+
+
+def test_json_encoder_keeps_bools():
+    assert json.loads(json.dumps({'read': False, 'seen': True}, cls=caching.JSONModelEncoder)) == \
+        {'read': False, 'seen': True}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_memory_cache_expiry():
+    clock = FakeClock()
+    memory = caching.LRUMemoryCache(clock=clock)
+    assert memory.set('forever', 1)
+    assert memory.set('brief', 2, ex=10)
+
+    clock.now += 9
+    assert memory.get('brief') == 2
+    clock.now += 1
+    assert not memory.has('brief')
+    assert memory.get('brief') is None
+    assert memory.get('forever') == 1
+
+    # replacing an entry drops the expiry of the value it replaced
+    memory.set('key', 3, ex=5)
+    memory.set('key', 4)
+    clock.now += 5
+    assert memory.get('key') == 4
+    assert memory.stats.expirations == 1
+
+
+def test_memory_cache_evicts_least_recently_used():
+    memory = caching.LRUMemoryCache(maxbytes=30, sizeof=lambda value: 10)
+    for key in 'abc':
+        memory.set(key, key)
+
+    assert memory.get('a') == 'a'
+    memory.set('d', 'd')
+    assert [memory.has(key) for key in 'abcd'] == [True, False, True, True]
+
+    assert not caching.LRUMemoryCache(maxbytes=5, sizeof=len).set('key', 'too long')
+    assert memory.stats.size == 30
+
+
+def test_memory_cache_delete_and_stats():
+    memory = caching.LRUMemoryCache(maxbytes=20, sizeof=lambda value: 10)
+    assert not memory.delete('missing')
+    memory.set('a', 1)
+    assert memory.delete('a')
+    assert memory.get('a') is None
+
+    memory.set('a', 1)
+    memory.set('b', 2)
+    memory.set('c', 3)
+    memory.get('c')
+    assert memory.stats == caching.CacheStats(hits=1, misses=1, evictions=1, expirations=0, entries=2, size=20)
+
+
+def test_memory_cache_threads():
+    memory = caching.LRUMemoryCache(maxbytes=1000, sizeof=lambda value: 10)
+
+    def work(offset: int):
+        for i in range(2000):
+            key = str((offset + i) % 150)
+            memory.set(key, i)
+            memory.get(key)
+            if i % 7 == 0:
+                memory.delete(key)
+
+    threads = [threading.Thread(target=work, args=(n * 37,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = memory.stats
+    assert stats.size == stats.entries * 10 <= 1000
+    assert stats.hits + stats.misses == 8 * 2000
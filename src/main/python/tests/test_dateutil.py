@@ -0,0 +1,81 @@
+import datetime
+
+import pytest
+
+from util import dateutil
+
+
+UTC = datetime.timezone.utc
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('Tue, 10 Jun 2003 04:00:00 GMT', datetime.datetime(2003, 6, 10, 4, 0, 0, tzinfo=UTC)),
+    ('Tue, 10 Jun 2003 04:00:00 +0000', datetime.datetime(2003, 6, 10, 4, 0, 0, tzinfo=UTC)),
+    ('10 Jun 2003 04:00:00 GMT', datetime.datetime(2003, 6, 10, 4, 0, 0, tzinfo=UTC)),
+    ('Tue,10 Jun 2003 04:00 GMT', datetime.datetime(2003, 6, 10, 4, 0, 0, tzinfo=UTC)),
+    ('Tue, 10 Jun 03 04:00:00 GMT', datetime.datetime(2003, 6, 10, 4, 0, 0, tzinfo=UTC)),
+    ('Thu, 01 Jan 70 00:00:00 GMT', datetime.datetime(1970, 1, 1, tzinfo=UTC)),
+    ('Wednesday, 11 June 2003 09:30:15 EST',
+     datetime.datetime(2003, 6, 11, 14, 30, 15, tzinfo=UTC)),
+    ('Sat, 07 Sep 2002 00:00:01 -0700', datetime.datetime(2002, 9, 7, 7, 0, 1, tzinfo=UTC)),
+    ('Sat, 07 Sep 2002 00:00:01 +05:30', datetime.datetime(2002, 9, 6, 18, 30, 1, tzinfo=UTC)),
+    ('Sat, 07 Sep 2002 00:00:01', datetime.datetime(2002, 9, 7, 0, 0, 1, tzinfo=UTC)),
+    ('2002-09-07T00:00:01+00:00', datetime.datetime(2002, 9, 7, 0, 0, 1, tzinfo=UTC)),
+    ('2002-09-07T00:00:01', datetime.datetime(2002, 9, 7, 0, 0, 1, tzinfo=UTC)),
+    ('Sat, 07 Sep 2002 23:59:60 GMT', datetime.datetime(2002, 9, 7, 23, 59, 59, tzinfo=UTC)),
+])
+def test_parse(value: str, expected: datetime.datetime):
+    result = dateutil.parse(value)
+    assert result == expected
+    assert result.tzinfo is not None
+    assert dateutil.epoch(value) == int(expected.timestamp())
+
+
+@pytest.mark.parametrize('value', ['', 'yesterday', 'Tue, 32 Jun 2003 04:00:00 GMT', 'Tue, 10 Jun 2003 04:00:00 XYZ',
+                                   'Tue, 10 Jun 2003 24:00:00 GMT', 'Tue, 10 Jun 2003 04:60:00 GMT',
+                                   'Tue, 10 Jun 2003 04:00:61 GMT'])
+def test_parse_invalid(value: str):
+    with pytest.raises(ValueError):
+        dateutil.parse(value)
+    with pytest.raises(ValueError):
+        dateutil.epoch(value)
+
+
+def test_parser_remembers_format():
+    calls = []
+
+    def counted(strategy):
+        def wrapper(value):
+            calls.append(strategy)
+            return strategy(value)
+        return wrapper
+
+    parser = dateutil.DateParser()
+    parser.strategies = [counted(strategy) for strategy in parser.strategies]
+    iso, rfc = parser.strategies[-1], parser.strategies[0]
+
+    parser.parse('2002-09-07T00:00:01+00:00')
+    calls.clear()
+    parser.parse('2002-09-08T00:00:01+00:00')
+    assert len(calls) == 1
+
+    calls.clear()
+    parser.parse('Sat, 07 Sep 2002 00:00:01 GMT')
+    assert len(calls) == 2
+    assert parser.parse('Sun, 08 Sep 2002 00:00:01 GMT') == datetime.datetime(2002, 9, 8, 0, 0, 1, tzinfo=UTC)
+    assert parser._last is rfc and iso is not rfc
+
+
+def test_feed_scope():
+    with dateutil.feed_scope() as parser:
+        dateutil.parse('2002-09-07T00:00:01+00:00')
+        assert parser._last is parser.strategies[-1]
+
+    with dateutil.feed_scope() as parser:
+        assert parser._last is None
+
+
+def test_epoch_invalid_day():
+    with pytest.raises(ValueError):
+        dateutil.epoch('Sun, 29 Feb 2003 04:00:00 GMT')
+    assert dateutil.epoch('Sun, 29 Feb 2004 04:00:00 GMT') == 1078027200
@@ -0,0 +1,235 @@
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Set
+
+import pytest
+import requests
+from PyQt5.QtCore import QCoreApplication, QThreadPool, QTimer
+
+import config
+import models
+from concurrency import aio, scheduling, sessions, tasks
+from reader.api import rss
+from tests.benchmarks.feeds import generate_feed
+
+
+ETAG = '"v1"'
+LAST_MODIFIED = 'Tue, 10 Jun 2003 04:00:00 GMT'
+
+
+class FeedServer(ThreadingHTTPServer):
+    feed = generate_feed(10)
+    requests: List[dict]
+    clients: Set[int]
+    """Client ports of the connections requests arrived on"""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FeedHandler)
+        self.requests = []
+        self.clients = set()
+
+    @property
+    def url(self) -> str:
+        return 'http://127.0.0.1:%d/feed' % self.server_address[1]
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    server: FeedServer
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        self.server.clients.add(self.client_address[1])
+        if self.path == '/slow':
+            time.sleep(1)
+        elif self.path == '/throttled' and len(self.server.requests) <= 2:
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        elif self.path == '/busy':
+            self.send_response(503)
+            self.send_header('Retry-After', '3600')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        elif self.path not in ('/feed', '/throttled'):
+            self.send_error(404)
+            return
+        if self.headers.get('If-None-Match') == ETAG or self.headers.get('If-Modified-Since') == LAST_MODIFIED:
+            self.send_response(304)
+            self.send_header('ETag', ETAG)
+            self.end_headers()
+            return
+
+        body = self.server.feed
+        self.send_response(200)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Type', 'application/rss+xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', ETAG)
+        self.send_header('Last-Modified', LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(config, 'PARSE_PROCESSES', 0)
+    server = FeedServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    sessions.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_validators_stored(server: FeedServer):
+    channel = tasks.FetchTask(server.url).execute()
+    assert 'If-None-Match' not in server.requests[0]
+    assert (channel.etag, channel.last_modified) == (ETAG, LAST_MODIFIED)
+
+    definition = models.FeedDefinition.from_channel(channel)
+    restored = models.FeedDefinition.from_string(definition.to_string())
+    assert (restored.etag, restored.last_modified) == (ETAG, LAST_MODIFIED)
+
+    channel.etag = None
+    definition.update(channel)
+    assert definition.etag is None
+
+
+@pytest.mark.parametrize('validators', [
+    {'etag': ETAG},
+    {'last_modified': LAST_MODIFIED},
+    {'etag': ETAG, 'last_modified': LAST_MODIFIED},
+])
+def test_not_modified(server: FeedServer, validators: dict):
+    result = tasks.FetchTask(server.url, **validators).execute()
+    assert isinstance(result, tasks.NotModified)
+    assert result.url == server.url
+
+    headers = server.requests[0]
+    assert headers.get('If-None-Match') == validators.get('etag')
+    assert headers.get('If-Modified-Since') == validators.get('last_modified')
+
+
+def test_changed_feed_parsed(server: FeedServer):
+    result = tasks.FetchTask(server.url, etag='"v0"').execute()
+    assert isinstance(result, rss.Channel)
+    assert len(result.items) == 10
+    assert result.etag == ETAG
+
+
+def test_connections_reused(server: FeedServer):
+    for _ in range(5):
+        assert len(tasks.FetchTask(server.url).execute().items) == 10
+
+    assert len(server.clients) == 1
+    assert 'gzip' in server.requests[0]['Accept-Encoding']
+
+
+def test_read_timeout(server: FeedServer, monkeypatch):
+    monkeypatch.setattr(config, 'HTTP_READ_TIMEOUT', 0.1)
+    with pytest.raises(requests.Timeout):
+        tasks.FetchTask(server.url.replace('/feed', '/slow')).execute()
+
+
+@pytest.fixture
+def engine():
+    engine = aio.FetchEngine(concurrency=4, scheduler=scheduling.HostScheduler(rate=100, burst=100))
+    yield engine
+    engine.close()
+
+
+def _run_batch(batch: tasks.Batch, pool) -> List[tasks.TaskResult]:
+    app = QCoreApplication.instance() or QCoreApplication([])
+    results = []
+    batch.complete.connect(results.extend)
+    batch.complete.connect(lambda _: app.quit())
+    QTimer.singleShot(10000, app.quit)
+    batch.start(pool)
+    if not results:
+        app.exec_()
+    return results
+
+
+def test_async_engine(server: FeedServer, engine: aio.FetchEngine):
+    fetches = [tasks.FetchTask(server.url) for _ in range(10)] + [
+        tasks.FetchTask(server.url, etag=ETAG),
+        tasks.FetchTask(server.url.replace('/feed', '/missing/'))]
+    results = _run_batch(tasks.Batch(fetches), engine)
+
+    assert len(results) == 12
+    assert all(len(result.data.items) == 10 and result.data.etag == ETAG for result in results[:10])
+    assert results[0].data.items[0].channel is results[0].data
+    assert isinstance(results[10].data, tasks.NotModified)
+    assert results[11].error is not None
+    assert len(server.clients) <= 4
+
+
+def test_async_engine_retries_throttled(server: FeedServer, engine: aio.FetchEngine):
+    url = server.url.replace('/feed', '/throttled')
+    result, = _run_batch(tasks.Batch([tasks.FetchTask(url)]), engine)
+
+    assert len(result.data.items) == 10
+    assert len(server.requests) == 3
+    assert engine.scheduler.stats()[url.split('/')[2]].deferrals == 2
+
+
+def test_async_engine_host_paused(server: FeedServer, engine: aio.FetchEngine):
+    before = time.time()
+    result, = _run_batch(tasks.Batch([tasks.FetchTask(server.url.replace('/feed', '/busy'))]), engine)
+
+    assert isinstance(result.error, scheduling.HostPaused)
+    assert result.error.delay == 3600
+    assert before + 3600 <= result.error.until <= time.time() + 3600
+    assert len(server.requests) == 1
+
+    # the pause holds back the next request to the host
+    result, = _run_batch(tasks.Batch([tasks.FetchTask(server.url)]), engine)
+    assert isinstance(result.error, scheduling.HostPaused)
+    assert len(server.requests) == 1
+
+
+def test_async_engine_retries_used_up(server: FeedServer, engine: aio.FetchEngine, monkeypatch):
+    monkeypatch.setattr(config, 'FETCH_RETRIES', 1)
+    result, = _run_batch(tasks.Batch([tasks.FetchTask(server.url.replace('/feed', '/throttled'))]), engine)
+
+    assert isinstance(result.error, scheduling.HostPaused)
+    assert len(server.requests) == 2
+
+
+class SleepTask(tasks.Task[int]):
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    def execute(self) -> int:
+        time.sleep(self.delay)
+        return int(self.delay * 100)
+
+
+def test_batch_delivers_progressively():
+    batch = tasks.Batch([SleepTask(0.3), SleepTask(0.0), SleepTask(0.1)])
+    received = []
+    progress = []
+    batch.received.connect(lambda index, result: received.append((index, result.data)))
+    batch.progress.connect(lambda done, total: progress.append((done, total)))
+
+    pool = QThreadPool()
+    pool.setMaxThreadCount(3)
+    results = _run_batch(batch, pool)
+
+    assert [result.data for result in results] == [30, 0, 10]
+    assert received == [(1, 0), (2, 10), (0, 30)]
+    assert progress == [(1, 3), (2, 3), (3, 3)]
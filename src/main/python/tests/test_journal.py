@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+
+import pytest
+
+import models
+from persist import journal as journal_module
+from persist.journal import ReadStateJournal
+
+
+def _meta(channel: str, guid: str, read=True) -> models.ItemMeta:
+    return models.ItemMeta(channel=channel, guid=guid, title=None, read=read)
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / 'meta.journal'), str(tmp_path / 'meta.json')
+
+
+def _open(paths, meta=None, **kw) -> ReadStateJournal:
+    return ReadStateJournal(meta or models.AppMeta(items=[]), *paths, **kw)
+
+
+def test_changes_replayed(paths):
+    journal = _open(paths)
+    for n in range(5):
+        entry = _meta('a', 'g%d' % n)
+        journal.meta.add(entry)
+        journal.record(entry)
+    entry.read = False
+    journal.record(entry)
+    journal.close()
+
+    replayed = _open(paths)
+    assert replayed.replay() == 6
+    assert [item.read for item in replayed.meta.items] == [True] * 4 + [False]
+
+
+def test_marked_times_replayed(paths):
+    with open(paths[0], 'w', encoding='utf-8') as fp:
+        fp.write(json.dumps(['a', 'old', None, True]) + '\n')
+
+    journal = _open(paths)
+    journal.replay()
+    entry = models.ItemMeta(channel='a', guid='new', title=None, read=True, marked=1700000000)
+    journal.meta.add(entry)
+    journal.record(entry)
+    journal.close()
+
+    replayed = _open(paths)
+    assert replayed.replay() == 2
+    assert [item.marked for item in replayed.meta.items] == [None, 1700000000]
+
+
+def test_torn_tail_skipped(paths):
+    with open(paths[0], 'w', encoding='utf-8') as fp:
+        fp.write(json.dumps(['a', 'g', None, True]) + '\n["a", "h", nu')
+
+    journal = _open(paths)
+    assert journal.replay() == 1
+    assert journal.meta.get('a', 'g').read
+
+
+def test_group_commit(paths, monkeypatch):
+    journal = _open(paths)
+    release = threading.Event()
+    fsync = os.fsync
+
+    def slow_fsync(fd):
+        release.wait()
+        fsync(fd)
+
+    monkeypatch.setattr(journal_module.os, 'fsync', slow_fsync)
+    for n in range(100):
+        journal.record(_meta('a', 'g%d' % n))
+    release.set()
+    journal.close()
+
+    assert journal.commits < 100
+    with open(paths[0], encoding='utf-8') as fp:
+        assert len(fp.readlines()) == 100
+
+
+def test_compaction(paths):
+    meta = models.AppMeta(items=[_meta('a', 'old')])
+    journal = _open(paths, meta, compact_after=3)
+    for n in range(4):
+        entry = _meta('b', 'g%d' % n)
+        meta.add(entry)
+        journal.record(entry)
+    journal.close()
+
+    # compacted after the third change, leaving the fourth in the journal
+    with open(paths[1]) as fp:
+        snapshot = models.AppMeta.load(fp)
+    assert [item.guid for item in snapshot.items] == ['old', 'g0', 'g1', 'g2']
+    with open(paths[0], encoding='utf-8') as fp:
+        assert len(fp.readlines()) == 1
+    assert sorted(os.listdir(os.path.dirname(paths[0]))) == ['meta.journal', 'meta.json']
+
+    replayed = _open(paths, snapshot)
+    assert replayed.replay() == 1
+    assert [item.guid for item in replayed.meta.items] == ['old', 'g0', 'g1', 'g2', 'g3']
+
+
+def test_compaction_keeps_removals(paths):
+    meta = models.AppMeta(items=[_meta('a', 'g'), _meta('b', 'g')])
+    journal = _open(paths, meta)
+    journal.record(meta.items[0])
+    meta.remove_channels(['a'])
+    assert journal.compact().wait(5)
+    journal.close()
+
+    with open(paths[1]) as fp:
+        assert [item.channel for item in models.AppMeta.load(fp).items] == ['b']
+    assert os.path.getsize(paths[0]) == 0
@@ -1,6 +1,8 @@
 import pytest
 
 import models
+from reader.api import rss
+from tests.benchmarks.feeds import generate_feed
 
 
 class _TestSubModel(models.JSONModel):
@@ -70,3 +72,43 @@ def test_model_to_dict():
 def test_model_required():
     with pytest.raises(ValueError):
         _TestSubModel.from_dict({'number': None, 'string': None})
+
+
+def _meta(channel, guid=None, title=None, read=True):
+    return models.ItemMeta(channel=channel, guid=guid, title=title, read=read)
+
+
+def test_app_meta_index():
+    meta = models.AppMeta.from_dict({'items': [
+        {'channel': 'a', 'guid': 'g1', 'title': None, 'read': True},
+        {'channel': 'a', 'guid': None, 'title': 'Title', 'read': False},
+        {'channel': 'b', 'guid': 'g1', 'title': None, 'read': True},
+    ]})
+    assert meta.find_item('a', guid='g1', title='Title') == 0
+    assert meta.find_item('a', title='Title') == 1
+    assert meta.find_item('b', guid='g1') == 2
+    assert meta.find_item('b', title='Title') == -1
+    assert meta.find_item('a') == -1
+
+    meta.add(_meta('c', guid='g2'))
+    assert meta.get('c', guid='g2') is meta.items[3]
+
+    meta.remove_channels(['a'])
+    assert meta.find_item('a', guid='g1') == -1
+    assert meta.find_item('b', guid='g1') == 0
+    assert meta.find_item('c', guid='g2') == 1
+
+    restored = models.AppMeta.from_string(meta.to_string())
+    assert restored.find_item('c', guid='g2') == 1
+
+
+def test_app_meta_apply_to():
+    channel = rss.parse_feed(generate_feed(4))
+    meta = models.AppMeta(items=[
+        _meta(channel.link, guid='urn:example:item:1'),
+        _meta(channel.link, guid='urn:example:item:2', read=False),
+        _meta('elsewhere', guid='urn:example:item:3'),
+    ])
+    channel.items[2].read = True
+    meta.apply_to(channel.items)
+    assert [item.read for item in channel.items] == [False, True, False, False]
@@ -0,0 +1,58 @@
+import pickle
+
+import pytest
+
+import config
+from concurrency import parsing
+from reader.api import rss, xml
+from tests.benchmarks.feeds import generate_feed
+
+
+@pytest.fixture(scope='module')
+def feed() -> bytes:
+    return generate_feed(50)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(config, 'PARSE_PROCESSES', 2)
+    yield
+    parsing.shutdown()
+
+
+def test_channel_pickle_round_trip(feed: bytes):
+    channel = rss.parse_feed(feed)
+    channel.ref = 'https://example.com/feed'
+    channel.items[0].read = True
+
+    restored = pickle.loads(pickle.dumps(channel, pickle.HIGHEST_PROTOCOL))
+    assert restored.to_dict() == channel.to_dict()
+    assert restored.ref == channel.ref
+    assert restored.items[0].read is True
+    assert all(item.channel is restored for item in restored.items)
+    assert restored.items[0].guid._parent is restored.items[0]
+
+
+def test_parse_in_pool(pool, feed: bytes):
+    channel = parsing.parse_feed(feed)
+    assert all(item.channel is channel for item in channel.items)
+    assert channel.items[0].summary == 'Description of item 0 & friends'
+
+    parsed = rss.parse_feed(feed)
+    assert channel.to_dict() != parsed.to_dict()
+    for item in parsed.items:
+        item.plain_description
+    assert channel.to_dict() == parsed.to_dict()
+
+
+def test_pool_errors_propagate(pool):
+    with pytest.raises(xml.XMLEntityConstraintError):
+        parsing.parse_feed(b'<rss version="2.0"><channel></channel></rss>')
+
+
+def test_parse_in_thread(monkeypatch, feed: bytes):
+    monkeypatch.setattr(config, 'PARSE_PROCESSES', 0)
+    monkeypatch.setattr(parsing, '_parse', None)
+    assert parsing._get_executor() is None
+    channel = parsing.parse_feed(feed)
+    assert all(item.summary is not None for item in channel.items)
@@ -0,0 +1,116 @@
+import datetime
+
+import pytest
+
+import config
+import models
+from concurrency import refresh
+from reader.api import rss
+from tests.benchmarks.feeds import generate_feed
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# A Monday, at midnight GMT
+START = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc).timestamp()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = START
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def scheduler(clock: FakeClock) -> refresh.RefreshScheduler:
+    return refresh.RefreshScheduler(clock=clock)
+
+
+def _feed(url: str, **kw) -> models.FeedDefinition:
+    return models.FeedDefinition(url=url, ttl=kw.get('ttl'), skip_days=kw.get('skip_days'),
+                                 skip_hours=kw.get('skip_hours'))
+
+
+def _history(end: float, every: float, count: int = 10):
+    return [end - every * i for i in range(count)]
+
+
+def test_cadence_learned(scheduler: refresh.RefreshScheduler, clock: FakeClock):
+    assert scheduler.interval(_feed('hourly'), _history(clock.now, HOUR)) == HOUR / 2
+    assert scheduler.interval(_feed('daily'), _history(clock.now, DAY)) == DAY / 2
+    assert scheduler.interval(_feed('new'), []) == config.DEFAULT_TTL
+
+    # bounded either way
+    assert scheduler.interval(_feed('busy'), _history(clock.now, 60)) == config.REFRESH_MIN_INTERVAL
+    assert scheduler.interval(_feed('weekly'), _history(clock.now, 7 * DAY)) == config.REFRESH_MAX_INTERVAL
+
+
+def test_dormant_feeds_back_off(scheduler: refresh.RefreshScheduler, clock: FakeClock):
+    feed = _feed('feed')
+    history = _history(clock.now - 20 * HOUR, HOUR)
+    assert scheduler.interval(feed, history) == 5 * HOUR
+
+    # a change seen more recently than the latest publication counts as activity
+    scheduler.observe(feed, history, changed=True)
+    assert scheduler.interval(feed, history) == HOUR / 2
+
+
+def test_ttl_respected(scheduler: refresh.RefreshScheduler, clock: FakeClock):
+    assert scheduler.interval(_feed('feed', ttl=3 * HOUR), _history(clock.now, HOUR)) == 3 * HOUR
+
+
+def test_skip_rules(scheduler: refresh.RefreshScheduler, clock: FakeClock):
+    scheduler.observe(_feed('hours', skip_hours=[0, 1, 2]), _history(clock.now, HOUR))
+    scheduler.observe(_feed('days', skip_days=[0]), _history(clock.now, HOUR))
+    assert scheduler._due['hours'] == START + 3 * HOUR
+    assert scheduler._due['days'] == START + DAY
+
+
+def test_due_in_order(scheduler: refresh.RefreshScheduler, clock: FakeClock):
+    scheduler.observe(_feed('fast'), _history(clock.now, HOUR))
+    scheduler.observe(_feed('slow'), _history(clock.now, 4 * HOUR))
+    scheduler.observe(_feed('gone'), _history(clock.now, HOUR))
+    scheduler.remove('gone')
+    assert scheduler.next_due() == START + HOUR / 2
+    assert scheduler.due() == []
+
+    clock.now += HOUR / 2
+    assert scheduler.due() == ['fast']
+    # rescheduled after its last interval in case the refresh fails
+    assert scheduler.next_due() == clock.now + HOUR / 2
+
+    clock.now += 2 * HOUR
+    assert scheduler.due() == ['fast', 'slow']
+    assert 'gone' not in scheduler
+
+    # observing a refreshed feed replaces its pending schedule
+    scheduler.observe(_feed('fast'), _history(clock.now, 2 * HOUR))
+    clock.now += HOUR / 2
+    assert scheduler.due() == []
+
+
+def test_publication_times_of_lazy_channel():
+    channel = rss.parse_feed(generate_feed(5))
+    restored = rss.Channel.from_dict(channel.to_dict())
+    times = refresh.publication_times(restored)
+    assert times == [item.pub_date.timestamp() for item in channel.items]
+    assert not any(restored.items.is_decoded(i) for i in range(5))
+
+
+def test_failed_feed_retried(scheduler: refresh.RefreshScheduler, clock: FakeClock):
+    # as the app observes a feed whose first fetch failed
+    scheduler.observe(_feed('offline'), (), changed=False)
+    assert 'offline' in scheduler
+    assert scheduler.next_due() == START + config.DEFAULT_TTL
+
+    clock.now += config.DEFAULT_TTL
+    assert scheduler.due() == ['offline']
+    # failing again, it is due again after the same interval
+    assert scheduler.next_due() == clock.now + config.DEFAULT_TTL
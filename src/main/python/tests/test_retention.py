@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+import models
+from persist import retention
+from persist.store import ChannelStore
+from persist.tasks import RetentionTask
+from reader.api import rss
+from tests.benchmarks.feeds import generate_feed
+
+DAY = 24 * 60 * 60
+NOW = 1_700_000_000
+
+
+def _meta(channel: str, guid=None, title=None, marked=NOW) -> models.ItemMeta:
+    return models.ItemMeta(channel=channel, guid=guid, title=title, read=True, marked=marked)
+
+
+@pytest.fixture
+def channel() -> rss.Channel:
+    return rss.parse_feed(generate_feed(5))
+
+
+def test_live_keys(channel: rss.Channel):
+    expected = {('guid', 'urn:example:item:%d' % i) for i in range(5)}
+    assert retention.live_keys(channel) == expected
+
+    restored = rss.Channel.from_dict(channel.to_dict())
+    assert retention.live_keys(restored) == expected
+    assert not restored.items.is_decoded(0)
+
+
+def test_expired_meta():
+    live = {'a': {('guid', 'g1'), ('guid', 'g2'), ('title', 'T')}}
+    entries = [
+        _meta('a', guid='g1'),
+        _meta('a', guid='gone'),
+        _meta('a', title='T', marked=None),
+        _meta('a', guid='g2', marked=NOW - 31 * DAY),
+        _meta('b', guid='uncached'),
+        _meta('unsubscribed', guid='g1'),
+    ]
+    expired = retention.expired_meta(entries, NOW, {'a', 'b'}, live, max_age=30 * DAY, per_channel=10)
+    assert expired == [entries[1], entries[3], entries[5]]
+
+
+def test_per_channel_cap():
+    entries = [_meta('a', guid=str(n), marked=NOW - n) for n in range(5)] + [_meta('a', guid='old', marked=None)]
+    expired = retention.expired_meta(entries, NOW, {'a'}, {}, max_age=DAY, per_channel=3)
+    assert [entry.guid for entry in expired] == ['3', '4', 'old']
+
+
+def test_retention_task(tmp_path, channel: rss.Channel):
+    store = ChannelStore(str(tmp_path / 'feeds.sqlite3'))
+    store.set('kept', channel)
+    store.set('orphan', channel)
+    feed = models.FeedDefinition(url='https://example.com/feed', channel=channel.link, cache_key='kept')
+    entries = [_meta(channel.link, guid='urn:example:item:1', marked=int(time.time())),
+               _meta(channel.link, guid='urn:example:item:99', marked=int(time.time()))]
+
+    expired, report = RetentionTask(entries, [feed], store).execute()
+    store.close()
+
+    assert expired == [entries[1]]
+    assert report.meta_entries == 1
+    assert report.meta_bytes == retention.encoded_size(expired)
+    assert (report.channels, report.cached_items) == (1, 5)
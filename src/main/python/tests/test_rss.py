@@ -0,0 +1,262 @@
+import io
+import json
+import os
+
+import pytest
+
+from persist.caching import JSONModelEncoder
+from reader.api import rss
+from reader.api.xml import LazyEntityList
+
+
+FEEDS = os.path.join(os.path.dirname(__file__), 'tools', 'feeds')
+
+
+def _feed(items: int) -> str:
+    entries = ''.join(f"""
+    <item>
+        <title>Item {i}</title>
+        <link>https://example.com/items/{i}</link>
+        <description>&lt;p&gt;Description of item {i}&lt;/p&gt;</description>
+        <category domain="https://example.com">News</category>
+        <enclosure url="https://example.com/{i}.mp3" length="{i}" type="audio/mpeg" />
+        <guid isPermaLink="false">item-{i}</guid>
+        <pubDate>Tue, 10 Jun 2003 04:00:00 GMT</pubDate>
+    </item>""" for i in range(items))
+
+    return f"""<?xml version="1.0" encoding="UTF-8" ?>
+<rss version="2.0">
+<channel>
+    <title>Generated</title>
+    <link>https://example.com</link>
+    <description>A generated feed</description>
+    <ttl>60</ttl>
+    <skipHours><hour>1</hour><hour>2</hour></skipHours>{entries}
+    <language>en-us</language>
+</channel>
+</rss>"""
+
+
+@pytest.fixture
+def guid_feed() -> bytes:
+    with open(os.path.join(FEEDS, 'test-guid.rss'), 'rb') as fp:
+        return fp.read()
+
+
+def _assert_same(streamed: rss.Channel, parsed: rss.Channel):
+    assert streamed.to_dict() == parsed.to_dict()
+    assert len(streamed.items) == len(parsed.items)
+    for item in streamed.items:
+        assert item.channel is streamed
+
+
+def test_stream_matches_tree(guid_feed: bytes):
+    _assert_same(rss.parse_feed(guid_feed), rss.parse_feed(guid_feed.decode('utf-8')))
+
+
+def test_stream_file_object():
+    source = _feed(50)
+    _assert_same(rss.parse_feed(io.BytesIO(source.encode('utf-8'))), rss.parse_feed(source))
+
+
+def test_stream_item_order():
+    channel = rss.parse_feed(_feed(20).encode('utf-8'))
+    assert [item.guid.value for item in channel.items] == [f'item-{i}' for i in range(20)]
+    assert channel.language == 'en-us'
+    assert channel.skip_hours.hours == [1, 2]
+
+
+def test_stream_requires_rss_root():
+    with pytest.raises(AssertionError):
+        rss.parse_feed(b'<feed><channel><title>t</title></channel></feed>')
+
+
+def test_stream_requires_channel():
+    with pytest.raises(AssertionError):
+        rss.parse_feed(b'<rss version="2.0"></rss>')
+
+
+def test_stream_item_requires_title_or_description():
+    with pytest.raises(rss.RSSError):
+        rss.parse_feed(b'<rss version="2.0"><channel><title>t</title><link>l</link>'
+                       b'<description>d</description><item><link>x</link></item></channel></rss>')
+
+
+def test_entities_are_slotted(guid_feed: bytes):
+    channel = rss.parse_feed(guid_feed)
+    item = channel.items[0]
+
+    for entity in (channel, item, item.guid):
+        assert not hasattr(entity, '__dict__')
+
+    assert item.read is False
+    assert item._parent is channel
+    assert channel.ref is None
+
+    item.read = True
+    channel.ref = 'https://example.com/feed'
+    assert item.read is True
+    assert channel.ref == 'https://example.com/feed'
+
+
+def test_plain_description_cached(guid_feed: bytes):
+    item = rss.parse_feed(guid_feed).items[0]
+    assert item.plain_description == 'Item 1'
+    assert item.plain_description is item.plain_description
+
+
+def test_slotted_defaults():
+    channel = rss.Channel(title='title')
+    assert channel.title == 'title'
+    assert channel.link is None
+    assert channel._parent is None
+    assert rss.Item().read is False
+
+
+def test_bytes_with_control_characters():
+    source = _feed(3).replace('Item 1<', 'Item\x0b 1<')
+    channel = rss.parse_feed(source.encode('utf-8'))
+    assert [item.title for item in channel.items] == ['Item 0', 'Item 1', 'Item 2']
+    assert channel.to_dict() == rss.parse_feed(source).to_dict()
+
+
+def test_bytes_encoding_from_declaration():
+    source = _feed(1).replace('UTF-8', 'ISO-8859-1').replace('Generated', 'Généré')
+    assert rss.parse_feed(source.encode('iso-8859-1')).title == 'Généré'
+
+
+def test_bytes_encoding_override():
+    source = _feed(1).replace('<?xml version="1.0" encoding="UTF-8" ?>', '').replace('Generated', 'Café')
+    assert rss.parse_feed(source.encode('iso-8859-1'), encoding='iso-8859-1').title == 'Café'
+
+
+@pytest.fixture
+def cached_channel() -> dict:
+    return json.loads(json.dumps(rss.parse_feed(_feed(10).encode('utf-8')).to_dict(), cls=JSONModelEncoder))
+
+
+def test_from_dict_is_lazy(cached_channel: dict):
+    channel = rss.Channel.from_dict(cached_channel)
+    assert isinstance(channel.items, LazyEntityList)
+    assert len(channel.items) == 10
+    assert not any(channel.items.is_decoded(i) for i in range(10))
+
+    assert channel.items.peek(3, 'guid').value == 'item-3'
+    assert channel.items.peek(3, 'link') == 'https://example.com/items/3'
+    assert channel.items.peek(3, 'pub_date').year == 2003
+    assert not channel.items.is_decoded(3)
+
+    item = channel.items[3]
+    assert channel.items.is_decoded(3)
+    assert item.title == 'Item 3'
+    assert item.channel is channel
+    assert channel.items[3] is item
+    assert [item.title for item in channel.items] == [f'Item {i}' for i in range(10)]
+
+
+def test_lazy_to_dict(cached_channel: dict):
+    channel = rss.Channel.from_dict(cached_channel)
+    channel.items[0].title = 'Changed'
+    output = json.loads(json.dumps(channel.to_dict(), cls=JSONModelEncoder))
+    assert output['items'][0]['title'] == 'Changed'
+    assert output['items'][1:] == cached_channel['items'][1:]
+
+
+def _refreshed(new: int, items: int) -> str:
+    source = _feed(items)
+    head, _, tail = source.partition('<item>')
+    entries = ''.join(f"""<item>
+        <title>New {i}</title>
+        <guid>new-{i}</guid>
+    </item>
+    """ for i in range(new))
+    return head + entries + '<item>' + tail
+
+
+@pytest.mark.parametrize('as_bytes', [True, False])
+def test_delta_parse_skips_known(as_bytes: bool):
+    previous = rss.parse_feed(_feed(10).encode('utf-8'))
+    source = _refreshed(2, 10)
+    channel = rss.parse_feed(source.encode('utf-8') if as_bytes else source, known=rss.known_keys(previous))
+
+    assert [item.title for item in channel.items] == ['New 0', 'New 1']
+    assert channel.unchanged == [(i + 2, ('guid', f'item-{i}')) for i in range(10)]
+    assert rss.parse_feed(source).unchanged is None
+
+
+def test_merge_unchanged_matches_full_parse(cached_channel: dict):
+    previous = rss.Channel.from_dict(cached_channel)
+    source = _refreshed(2, 10).encode('utf-8')
+    channel = rss.merge_unchanged(rss.parse_feed(source, known=rss.known_keys(previous)), previous)
+
+    assert channel.unchanged is None
+    encode = lambda value: json.loads(json.dumps(value.to_dict(), cls=JSONModelEncoder))
+    assert encode(channel) == encode(rss.parse_feed(source))
+    assert not any(previous.items.is_decoded(i) for i in range(10))
+    assert [channel.items.is_decoded(i) for i in range(12)] == [True] * 2 + [False] * 10
+    assert channel.items[5].channel is channel
+
+
+def test_delta_parse_decodes_changed_items():
+    previous = rss.parse_feed(_feed(3).encode('utf-8'))
+    source = _feed(4).replace('<guid isPermaLink="false">item-1</guid>', '<guid>item-1b</guid>')
+    channel = rss.parse_feed(source.encode('utf-8'), known=rss.known_keys(previous))
+
+    assert [item.guid.value for item in channel.items] == ['item-1b', 'item-3']
+    channel = rss.merge_unchanged(channel, previous)
+    assert [item.guid.value for item in channel.items] == ['item-0', 'item-1b', 'item-2', 'item-3']
+    assert channel.items[0] is previous.items[0]
+
+
+def test_plain_description_without_description():
+    item = rss.parse_feed(b'<rss version="2.0"><channel><title>t</title><link>l</link><description>d</description>'
+                          b'<item><title>Only a title</title></item></channel></rss>').items[0]
+    assert item.plain_description == ''
+
+
+def test_summary_is_stored(cached_channel: dict):
+    assert cached_channel['items'][0]['summary'] is None
+    channel = rss.Channel.from_dict(cached_channel)
+    assert channel.items[0].plain_description == 'Description of item 0'
+
+    stored = json.loads(json.dumps(channel.to_dict(), cls=JSONModelEncoder))
+    assert stored['items'][0]['summary'] == 'Description of item 0'
+    assert rss.Channel.from_dict(stored).items[0].summary == 'Description of item 0'
+
+
+def test_dates_stored_as_epoch(cached_channel: dict):
+    assert cached_channel['items'][0]['pub_date'] == 1055217600
+
+    item = rss.Channel.from_dict(cached_channel).items[0]
+    assert item.pub_date == rss.parse_feed(_feed(1).encode('utf-8')).items[0].pub_date
+    assert item.pub_date.utcoffset().total_seconds() == 0
+
+
+def test_legacy_dates_load(cached_channel: dict):
+    cached_channel['items'][0]['pub_date'] = '2003-06-10T04:00:00+00:00'
+    cached_channel['items'][1]['pub_date'] = None
+    channel = rss.Channel.from_dict(cached_channel)
+
+    assert channel.items[0].pub_date.timestamp() == 1055217600
+    assert channel.items[1].pub_date is None
+    assert channel.to_dict()['items'][0]['pub_date'] == 1055217600
+
+
+def test_from_dict_requires_fields(cached_channel: dict):
+    del cached_channel['title']
+    with pytest.raises(ValueError):
+        rss.Channel.from_dict(cached_channel)
+
+
+def test_merge_unchanged_previous_pruned(cached_channel: dict):
+    previous = rss.Channel.from_dict(cached_channel)
+    source = _refreshed(2, 10).encode('utf-8')
+    channel = rss.parse_feed(source, known=rss.known_keys(previous))
+
+    # the cached channel is replaced by one with fewer items while the fetch is under way
+    del previous.items[3]
+    del previous.items[0]
+    channel = rss.merge_unchanged(channel, previous)
+
+    assert [item.guid.value for item in channel.items] == \
+        ['new-0', 'new-1'] + [f'item-{i}' for i in range(10) if i not in (0, 3)]
@@ -0,0 +1,115 @@
+import asyncio
+import email.utils
+
+import pytest
+
+import config
+from concurrency import scheduling
+
+
+class FakeClock:
+    """A clock which only moves when sleeping."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float):
+        self.now += delay
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+def _scheduler(clock: FakeClock, **kw) -> scheduling.HostScheduler:
+    return scheduling.HostScheduler(clock=clock, sleep=clock.sleep, jitter=lambda: 0.5, **kw)
+
+
+def test_concurrency_capped_per_host(clock: FakeClock):
+    scheduler = _scheduler(clock, concurrency=2, rate=100, burst=100)
+    active = {'a': 0, 'b': 0}
+    peak = {'a': 0, 'b': 0}
+
+    async def request(host: str):
+        async with scheduler.slot(host):
+            active[host] += 1
+            peak[host] = max(peak[host], active[host])
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            active[host] -= 1
+
+    async def main():
+        await asyncio.gather(*(request(host) for host in 'ab' * 6))
+
+    asyncio.run(main())
+    assert peak == {'a': 2, 'b': 2}
+    assert scheduler.stats()['a'].requests == 6
+    assert scheduler.stats()['a'].active == 0
+
+
+def test_rate_limited_after_burst(clock: FakeClock):
+    scheduler = _scheduler(clock, concurrency=10, rate=2, burst=3)
+    started = []
+
+    async def main():
+        for _ in range(7):
+            async with scheduler.slot('host'):
+                started.append(clock.now)
+
+    asyncio.run(main())
+    assert started == [0, 0, 0, 0.5, 1, 1.5, 2]
+    stats = scheduler.stats()['host']
+    assert (stats.queued, stats.requests) == (0, 7)
+    assert (stats.wait_total, stats.wait_max) == (2, 0.5)
+
+
+def test_deferred_host_paused(clock: FakeClock):
+    scheduler = _scheduler(clock, rate=100, burst=100)
+
+    async def main():
+        async with scheduler.slot('host'):
+            assert scheduler.defer('host', 0, {'Retry-After': '5'}) == 5
+        async with scheduler.slot('other'):
+            assert clock.now == 0
+        async with scheduler.slot('host'):
+            assert clock.now == pytest.approx(5)
+
+    asyncio.run(main())
+    assert scheduler.stats()['host'].deferrals == 1
+
+
+def test_long_pause_not_waited(clock: FakeClock):
+    scheduler = _scheduler(clock)
+
+    async def main():
+        scheduler.defer('host', 0, {'Retry-After': str(int(config.BACKOFF_MAX) + 1)})
+        async with scheduler.slot('host'):
+            pass
+
+    with pytest.raises(scheduling.HostPaused):
+        asyncio.run(main())
+    assert scheduler.stats()['host'].queued == 0
+
+
+def test_backoff_with_jitter(monkeypatch, clock: FakeClock):
+    monkeypatch.setattr(config, 'BACKOFF_BASE', 1.0)
+    monkeypatch.setattr(config, 'BACKOFF_MAX', 10.0)
+    scheduler = _scheduler(clock)
+    assert [scheduler.backoff(attempt) for attempt in range(5)] == [0.5, 1, 2, 4, 5]
+    assert scheduler.defer('host', 2, {}) == 2
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, None),
+    ('120', 120),
+    (email.utils.formatdate(1030, usegmt=True), 30),
+    (email.utils.formatdate(900, usegmt=True), 0),
+    ('soon', None),
+])
+def test_retry_after(value, expected):
+    assert scheduling.retry_after(value, 1000) == expected
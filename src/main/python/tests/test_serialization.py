@@ -0,0 +1,109 @@
+import datetime
+import io
+import json
+
+import pytest
+
+import models
+from persist.caching import JSONModelEncoder
+from util import serialization
+
+
+def _installed():
+    previous = serialization.backend
+    names = []
+    for name in ('orjson', 'ujson', 'json'):
+        try:
+            serialization.select(name)
+            names.append(name)
+        except ImportError:
+            pass
+
+    serialization.backend = previous
+    return names
+
+
+BACKENDS = _installed()
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    previous = serialization.backend
+    yield serialization.select(request.param)
+    serialization.backend = previous
+
+
+VALUES = [
+    {'read': True, 'seen': False, 'title': None, 'count': 3, 'ratio': 0.1},
+    {'title': 'Café — naïve \U0001f600', 'link': 'https://example.com/a/b?c=d&e=</f>'},
+    {'published': datetime.datetime(2021, 3, 4, 5, 6, 7, 890, tzinfo=datetime.timezone.utc),
+     'local': datetime.datetime(2021, 3, 4, 5, 6, 7, tzinfo=datetime.timezone(datetime.timedelta(hours=-5))),
+     'naive': datetime.datetime(2021, 3, 4, 5, 6, 7), 'day': datetime.date(2021, 3, 4)},
+    [['urn:a', 'g', None, True, 1615000000], (1, 2), []],
+    {'big': 2 ** 70, 'negative': -2 ** 65},
+]
+
+
+@pytest.mark.parametrize('value', VALUES)
+def test_encodes_as_json(backend, value):
+    encoded = serialization.dumps(value)
+    assert isinstance(encoded, bytes)
+    assert json.loads(encoded) == json.loads(json.dumps(value, cls=JSONModelEncoder))
+    assert serialization.loads(encoded) == json.loads(json.dumps(value, cls=JSONModelEncoder))
+
+
+def test_bool_not_int(backend):
+    decoded = serialization.loads(serialization.dumps([True, False, 1, 0]))
+    assert [type(value) for value in decoded] == [bool, bool, int, int]
+
+
+def test_decodes_str_and_bytes(backend):
+    text = json.dumps({'title': 'éè', 'escaped': '\\u00e9'})
+    assert serialization.loads(text) == serialization.loads(text.encode('utf-8')) == json.loads(text)
+
+
+@pytest.mark.parametrize('data', ['', '{"items": [', '[1, 2,]', 'nul', b'\xff\xfe'])
+def test_decode_errors(backend, data):
+    with pytest.raises(ValueError):
+        serialization.loads(data)
+
+
+def test_decode_error_type(backend):
+    with pytest.raises(json.JSONDecodeError):
+        serialization.loads('{"items": [')
+
+
+def test_unserializable(backend):
+    with pytest.raises(TypeError):
+        serialization.dumps({'value': object()})
+
+
+def test_text_and_binary_files(backend):
+    value = {'title': 'é', 'read': True}
+    text = io.StringIO()
+    binary = io.BytesIO()
+    serialization.dump(value, text)
+    serialization.dump(value, binary)
+
+    assert text.getvalue().encode('utf-8') == binary.getvalue()
+    assert serialization.load(io.StringIO(text.getvalue())) == value
+    assert serialization.load(io.BytesIO(binary.getvalue())) == value
+
+
+def test_models_round_trip(backend):
+    meta = models.AppMeta(items=[models.ItemMeta(channel='https://example.com', guid='urn:a', title=None,
+                                                 read=True, marked=1615000000),
+                                 models.ItemMeta(channel='https://example.com', guid=None, title='été',
+                                                 read=False, marked=None)])
+    fp = io.BytesIO()
+    meta.save(fp)
+    fp.seek(0)
+
+    loaded = models.AppMeta.load(fp)
+    assert [item.to_dict() for item in loaded.items] == [item.to_dict() for item in meta.items]
+    assert models.AppMeta.from_string(meta.to_string()).to_dict() == meta.to_dict()
+
+
+def test_select_unknown():
+    with pytest.raises(KeyError):
+        serialization.select('marshal')
@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+
+import pytest
+
+from persist import caching
+from persist.store import ChannelStore
+from reader.api import rss
+from tests.benchmarks.feeds import generate_feed
+
+
+def _encoded(channel: rss.Channel):
+    return json.loads(json.dumps(channel.to_dict(), cls=caching.JSONModelEncoder))
+
+
+@pytest.fixture
+def store(tmp_path) -> ChannelStore:
+    store = ChannelStore(str(tmp_path / 'feeds.sqlite3'))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def channel() -> rss.Channel:
+    return rss.parse_feed(generate_feed(30))
+
+
+def test_round_trip(store: ChannelStore, channel: rss.Channel):
+    assert not store.has('key')
+    assert store.set('key', channel)
+    assert store.has('key')
+    assert store.connection.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+
+    loaded = store.get('key')
+    assert _encoded(loaded) == _encoded(channel)
+    assert loaded.items[0].channel is loaded
+    assert store.get('missing') is None
+
+
+def test_only_decoded_items_written(store: ChannelStore, channel: rss.Channel):
+    store.set('key', channel)
+    loaded = store.get('key')
+    loaded.items[4].title = 'Changed'
+
+    before = store.connection.total_changes
+    assert store.set('key', loaded)
+    # the channel row, and the one decoded item
+    assert store.connection.total_changes - before == 2
+    assert store.get('key').items[4].title == 'Changed'
+
+
+def test_merged_channel_stored_under_new_key(store: ChannelStore):
+    store.set('old', rss.parse_feed(generate_feed(20)))
+    previous = store.get('old')
+    head, _, tail = generate_feed(20).partition(b'<item>')
+    refreshed = head + b'<item><title>New 0</title><guid>new-0</guid></item>' + \
+        b'<item><title>New 1</title><guid>new-1</guid></item><item>' + tail
+
+    merged = rss.merge_unchanged(rss.parse_feed(refreshed, known=rss.known_keys(previous)), previous)
+    assert store.set('new', merged)
+
+    loaded = store.get('new')
+    assert len(loaded.items) == 22
+    assert _encoded(loaded) == _encoded(rss.parse_feed(refreshed))
+
+
+def test_refresh_upserts_and_removes(store: ChannelStore, channel: rss.Channel):
+    store.set('key', channel)
+    previous = store.get('key')
+    head, _, tail = generate_feed(29).partition(b'<item>')
+    refreshed = head + b'<item><title>New</title><guid>new</guid></item><item>' + tail
+
+    merged = rss.merge_unchanged(rss.parse_feed(refreshed, known=rss.known_keys(previous)), previous)
+    store.set('key', merged)
+
+    loaded = store.get('key')
+    assert _encoded(loaded) == _encoded(rss.parse_feed(refreshed))
+    assert store.connection.execute('SELECT COUNT(*) FROM items').fetchone() == (30,)
+
+
+def test_timeline(store: ChannelStore):
+    first = rss.parse_feed(generate_feed(30))
+    second = rss.parse_feed(generate_feed(30).replace(b'https://example.com<', b'https://example.org<'))
+    store.set('first', first)
+    store.set('second', second)
+
+    timeline = store.timeline(10)
+    dates = [item.pub_date for item in timeline]
+    assert len(timeline) == 10
+    assert dates == sorted(dates, reverse=True)
+    assert {item.channel.link for item in timeline} == {'https://example.com', 'https://example.org'}
+
+    older = store.timeline(100, before=int(dates[-1].timestamp()))
+    assert all(item.pub_date < dates[-1] for item in older)
+    assert len(timeline) + len(older) <= 60
+
+    only_first = store.timeline(100, keys=['first'])
+    assert len(only_first) == 30
+    assert all(item.channel.link == 'https://example.com' for item in only_first)
+
+
+def test_expiry_and_delete(store: ChannelStore, channel: rss.Channel):
+    store.set('key', channel, ex=60)
+    store.connection.execute("UPDATE channels SET expires = ?", (int(time.time()) - 1,))
+    assert store.get('key') is None
+    assert not store.has('key')
+
+    store.set('key', channel)
+    assert store.delete('key')
+    assert not store.delete('key')
+    assert store.connection.execute('SELECT COUNT(*) FROM items').fetchone() == (0,)
+
+
+def test_connection_per_thread(store: ChannelStore, channel: rss.Channel):
+    connections = []
+
+    def write():
+        connections.append(store.connection)
+        store.set('key', channel)
+        store.close()
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    thread.join()
+
+    assert connections[0] is not store.connection
+    assert len(store.get('key').items) == 30
+
+
+def test_legacy_entries_migrate(tmp_path, store: ChannelStore, channel: rss.Channel):
+    legacy = caching.ChannelFileCache(location=tmp_path)
+    legacy.set('key', channel)
+    cache = caching.ChannelMultiCache(store, legacy=legacy)
+
+    assert cache.has('key')
+    assert _encoded(cache.get('key')) == _encoded(channel)
+    assert store.has('key')
+    assert not legacy.has('key')
+
+
+def test_compact(store: ChannelStore, channel: rss.Channel):
+    for key in ('kept', 'unsubscribed', 'expired'):
+        store.set(key, channel, ex=-1 if key == 'expired' else None)
+
+    channels, items, reclaimed = store.compact({'kept', 'expired'})
+    assert (channels, items) == (2, 60)
+    assert reclaimed > 0
+    assert store.keys() == ['kept']
+    assert len(store.get('kept').items) == 30
@@ -0,0 +1,41 @@
+import pytest
+
+from lxml.html import fromstring
+
+from util import text
+
+
+@pytest.mark.parametrize('markup,expected', [
+    ('plain text', 'plain text'),
+    ('<p>Description of <b>item</b> &amp; friends</p>', 'Description of item & friends'),
+    ('<p>one</p><p>two</p>', 'one two'),
+    ('line<br/>break', 'line break'),
+    ('he<b>ll</b>o', 'hello'),
+    ('  spaced \n\t out  ', 'spaced out'),
+    ('&lt;escaped&gt; &#8212; &#x2014; &nbsp;done', '<escaped> — — done'),
+    ('<script>var x = "<p>";</script>visible<style>p { }</style>', 'visible'),
+    ('<!-- a <b>comment</b> -->text<![CDATA[ignored]]>', 'text'),
+    ('a < b and c > d', 'a < b and c > d'),
+    ('<img src="x.png" alt="picture">caption', 'caption'),
+    ('unterminated <a href="', 'unterminated'),
+    ('', ''),
+])
+def test_strip_html(markup: str, expected: str):
+    assert text.strip_html(markup) == expected
+
+
+def test_strip_html_matches_lxml():
+    markup = '<p>Some <i>emphasised</i> text,\n a <a href="#">link</a> &amp; an &eacute;ntity.</p>'
+    assert text.strip_html(markup) == ' '.join(fromstring(markup).text_content().split())
+
+
+def test_strip_html_limit():
+    markup = '<p>' + 'word ' * 1000 + '</p>' + '<p>unreached' * 1000
+    summary = text.strip_html(markup, limit=50)
+    assert len(summary) <= 50
+    assert summary == ('word ' * 10).strip()
+    assert text.strip_html('<p>short</p>', limit=50) == 'short'
+
+
+def test_strip_html_uppercase_tags():
+    assert text.strip_html('<P>one</P><P>two<BR>three</P>') == 'one two three'
@@ -1,7 +1,15 @@
+import json
+import time
+
 import pytest
 
+import models
+from persist.caching import ChannelMultiCache, JSONModelEncoder
+from persist.store import ChannelStore
 from ui.models import AggregateFeedModel
+from reader.api import rss
 from reader.api.rss import Channel, Item
+from tests.benchmarks.feeds import generate_feed
 
 
 class MockGUID:
@@ -21,6 +29,10 @@ class MockItem:
         self.order = order
         self.guid = MockGUID(str(order))
 
+    @property
+    def identity_key(self):
+        return None, ('guid', self.guid.value)
+
 
 @pytest.fixture
 def odd_channel() -> Channel:
@@ -61,3 +73,73 @@ def test_dynamic_sorting_succeeds(odd_channel: Channel, even_channel: Channel):
 
     for idx, item in enumerate(model.items):
         assert idx + 1 == item.order
+
+
+
+def _channel(link: str, items: int) -> Channel:
+    channel = Channel(title=link, link=link, description=link, items=[
+        Item(title=f'Item {i}', guid=Item.GUID(value=f'item-{i}'), comments=str(i)) for i in range(items)
+    ])
+    for item in channel.items:
+        item._parent = channel
+
+    return channel
+
+
+def test_duplicate_items_are_skipped(odd_channel: Channel):
+    model = AggregateFeedModel(sort_by=lambda element: element.order, feeds=[odd_channel])
+    model.add(Channel(items=[MockItem(order=5), MockItem(order=6)]))
+    assert [item.order for item in model.items] == [1, 3, 5, 6]
+
+
+def test_add_scales_linearly():
+    first = _channel('https://example.com/a', 50000)
+    second = _channel('https://example.com/b', 50000)
+    model = AggregateFeedModel(sort_by=lambda item: int(item.comments))
+
+    start = time.perf_counter()
+    model.add(first)
+    model.add(second)
+    model.add(_channel('https://example.com/a', 50000))
+    elapsed = time.perf_counter() - start
+
+    assert len(list(model.items)) == 100000
+    assert model.find(('https://example.com/b', ('guid', 'item-7'))) is second.items[7]
+    # with a linear membership test and a key list rebuilt per insert, this took minutes
+    assert elapsed < 10
+
+
+def test_lazy_items_decoded_on_display():
+    source = rss.parse_feed(generate_feed(30)).to_dict()
+    channel = Channel.from_dict(json.loads(json.dumps(source, cls=JSONModelEncoder)))
+    model = AggregateFeedModel(sort_by=lambda item: int(item.link.rsplit('/', 1)[1]), feeds=[channel], fetch_batch_size=5)
+    model.fetchMore()
+
+    assert sum(channel.items.is_decoded(i) for i in range(30)) == 0
+    shown = model.data(model.index(2))
+    assert shown.title == 'Item 2'
+    assert shown.channel is channel
+    assert [i for i in range(30) if channel.items.is_decoded(i)] == [2]
+
+    model.add(channel)
+    assert len(model._items) == 30
+
+
+def test_cached_items_read_state_applied_on_display(tmp_path):
+    # as MainApplication.try_fetch does with cached channels at startup
+    store = ChannelStore(str(tmp_path / 'feeds.db'))
+    channel = rss.parse_feed(generate_feed(30))
+    ChannelMultiCache(store).set('feed', channel)
+    cached = ChannelMultiCache(store).get('feed')
+    meta = models.AppMeta(items=[models.ItemMeta(channel=cached.link, guid='urn:example:item:%d' % n, title=None,
+                                                 read=True) for n in (2, 3)])
+    meta.apply_to(cached.items)
+    model = AggregateFeedModel(sort_by=lambda item: int(item.link.rsplit('/', 1)[1]), feeds=[cached],
+                               fetch_batch_size=5)
+    model.fetchMore()
+
+    assert [i for i in range(30) if cached.items.is_decoded(i)] == []
+    assert model.data(model.index(2)).read
+    assert not model.data(model.index(4)).read
+    assert [i for i in range(30) if cached.items.is_decoded(i)] == [2, 4]
+    store.close()
@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+
+import pytest
+from PyQt5.QtCore import QCoreApplication
+
+from persist.tasks import JSONSaveTask, SaveTask
+from persist.writer import SaveWriter, atomic_write
+
+SAVES = 400
+THREADS = 16
+
+
+@pytest.fixture
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+@pytest.fixture
+def writer():
+    writer = SaveWriter()
+    yield writer
+    writer.close()
+
+
+class FailingSaveTask(SaveTask):
+    def save(self, fp):
+        fp.write(b'{"partial": ')
+        raise OSError("disk full")
+
+
+def _wait(app, condition, timeout=10.0):
+    deadline = threading.Event()
+    timer = threading.Timer(timeout, deadline.set)
+    timer.start()
+    try:
+        while not condition() and not deadline.is_set():
+            app.processEvents()
+    finally:
+        timer.cancel()
+
+    assert condition()
+
+
+def test_atomic_write_replaces(tmp_path):
+    path = tmp_path / 'feeds.json'
+    path.write_bytes(b'old')
+    with atomic_write(str(path)) as fp:
+        fp.write(b'new')
+
+    assert path.read_bytes() == b'new'
+    assert os.listdir(tmp_path) == ['feeds.json']
+
+
+def test_failed_write_keeps_file(app, writer, tmp_path):
+    path = tmp_path / 'feeds.json'
+    path.write_bytes(b'[1, 2, 3]')
+    results = []
+    task = FailingSaveTask(str(path))
+    task.signals.finished.connect(results.append)
+    writer.start(task)
+    _wait(app, lambda: results)
+
+    assert isinstance(results[0].error, OSError)
+    assert path.read_bytes() == b'[1, 2, 3]'
+    assert os.listdir(tmp_path) == ['feeds.json']
+
+
+def test_concurrent_saves_coalesced(app, writer, tmp_path):
+    path = str(tmp_path / 'feeds.json')
+    other = str(tmp_path / 'other.json')
+    finished = []
+    torn = []
+    stop = threading.Event()
+    order = threading.Lock()
+    submitted = []
+
+    def read():
+        # every read sees a complete file, whichever version it is
+        while not stop.is_set():
+            try:
+                with open(path, 'rb') as fp:
+                    json.loads(fp.read())
+            except FileNotFoundError:
+                pass
+            except ValueError as exc:
+                torn.append(exc)
+
+    def save(worker: int):
+        for version, task in batches[worker]:
+            with order:
+                submitted.append(version)
+                writer.start(task)
+            writer.start(JSONSaveTask({'version': version}, other))
+
+    # tasks are created on the thread which receives their results, as by the app
+    batches = []
+    for worker in range(THREADS):
+        batch = []
+        for n in range(SAVES // THREADS):
+            version = worker * SAVES + n
+            task = JSONSaveTask([{'version': version, 'padding': 'x' * 4096}] * 8, path)
+            task.signals.finished.connect(lambda result, version=version: finished.append((version, result)))
+            batch.append((version, task))
+        batches.append(batch)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    threads = [threading.Thread(target=save, args=(worker,)) for worker in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert writer.flush(10)
+    stop.set()
+    reader.join()
+    _wait(app, lambda: len(finished) == SAVES)
+
+    assert not torn
+    assert writer.writes < SAVES * 2
+    assert all(result.error is None for _, result in finished)
+    assert sorted(version for version, _ in finished) == sorted(submitted)
+    with open(path, 'rb') as fp:
+        assert json.load(fp)[0]['version'] == submitted[-1]
+    assert sorted(os.listdir(tmp_path)) == ['feeds.json', 'other.json']
+
+
+def test_close_writes_pending(writer, tmp_path):
+    path = tmp_path / 'feeds.json'
+    for n in range(50):
+        writer.start(JSONSaveTask({'version': n}, str(path)))
+    writer.close()
+
+    assert json.loads(path.read_bytes()) == {'version': 49}
+    with pytest.raises(RuntimeError):
+        writer.start(JSONSaveTask({}, str(path)))
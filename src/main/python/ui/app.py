@@ -1,6 +1,6 @@
 from fbs_runtime import PUBLIC_SETTINGS
 from PyQt5.QtWidgets import QMainWindow, QAction, QListView, QHBoxLayout, QWidget, QMessageBox, QStatusBar, QLabel
-from PyQt5.QtCore import QCoreApplication, QThreadPool, QItemSelection, Qt
+from PyQt5.QtCore import QCoreApplication, QThreadPool, QItemSelection, Qt, QTimer
 
 import datetime
 import functools
@@ -9,15 +9,15 @@ import lxml.etree
 import os
 import pytz
 import time
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 import requests
 import uuid
 
 import config
-from concurrency import tasks
+from concurrency import aio, refresh, sessions, tasks
 import main
 import models
-from persist import app_data, caching, tasks as iotasks
+from persist import app_data, caching, store, tasks as iotasks, writer
 from reader.api import rss, xml
 from reader.api.rss import Channel
 from ui.delegates import FeedItemDelegate
@@ -30,6 +30,7 @@ from .views import ItemView
 class MainApplication(QMainWindow):
 	__ctx: main.MainApplicationContext
 	tasks: QThreadPool
+	fetcher: Union[QThreadPool, aio.FetchEngine]
 	channels: caching.ChannelMultiCache
 	loaded_feeds: Dict[str, models.FeedDefinition]
 
@@ -39,7 +40,10 @@ class MainApplication(QMainWindow):
 		self.__ctx = ctx
 		self.loaded_feeds = ctx.loaded_feeds.copy()
 		self.executor = QThreadPool.globalInstance()
-		self.channels = caching.ChannelMultiCache()
+		sessions.configure(self.executor.maxThreadCount())
+		self.fetcher = aio.engine() if config.ASYNC_FETCH else self.executor
+		self.refresh_scheduler = refresh.RefreshScheduler()
+		self.channels = caching.ChannelMultiCache(store.ChannelStore(), legacy=caching.ChannelFileCache())
 
 		self._setup_ui()
 		self._setup()
@@ -85,6 +89,14 @@ class MainApplication(QMainWindow):
 		self.setStatusBar(self.status_bar)
 
 	def _setup(self):
+		self.refresh_timer = QTimer(self)
+		self.refresh_timer.setSingleShot(True)
+		self.refresh_timer.timeout.connect(self.refresh_due)
+
+		self.retention_timer = QTimer(self)
+		self.retention_timer.timeout.connect(self.run_retention)
+		self.retention_timer.start(60 * 1000)
+
 		self.try_fetch(self.loaded_feeds.values(), autoselect=True)
 
 	def _setup_menubar(self):
@@ -139,22 +151,25 @@ class MainApplication(QMainWindow):
 			item.read = True
 
 			# modify item metadata
-			meta_idx = self.__ctx.app_meta.find_item(
+			meta = self.__ctx.app_meta.get(
 				channel=item.channel.link,
 				guid=item.guid.value if item.guid else None,
 				title=item.title
 			)
-			if meta_idx >= 0:
-				meta = self.__ctx.app_meta.items[meta_idx]
+			if meta:
 				meta.read = True
+				meta.marked = int(time.time())
 			else:
 				meta = models.ItemMeta(
 					channel=item.channel.link,
 					guid=item.guid.value if item.guid else None,
 					title=item.title if not item.guid else None,
 					read=True,
+					marked=int(time.time()),
 				)
-				self.__ctx.app_meta.items.append(meta)
+				self.__ctx.app_meta.add(meta)
+
+			self.__ctx.journal.record(meta)
 
 			self._content.set_item(item)
 		else:
@@ -182,12 +197,78 @@ class MainApplication(QMainWindow):
 	def refresh_feeds(self):
 		self.disable_feed_actions()
 
-		self.set_status("Refetching feeds...")
-		batch = tasks.Batch([tasks.FetchTask(feed_definition.url) for feed_definition in self.loaded_feeds.values()])
-		batch.complete.connect(self.on_fetch_batch)
-		batch.start(self.executor)
+		self._start_fetch(self.loaded_feeds.values(), "Refetching feeds...")
+
+	def refresh_due(self):
+		"""Refresh the feeds which the refresh scheduler finds due, in the background."""
+
+		if not self.refresh_action.isEnabled():
+			# a fetch, removal or save is under way; the feeds due are left in the scheduler until it is done
+			self.refresh_timer.start(config.BUSY_RETRY * 1000)
+			return
+
+		due = set(self.refresh_scheduler.due())
+		feed_definitions = [feed for feed in self.loaded_feeds.values() if feed.url in due]
+		if not feed_definitions:
+			self._schedule_refresh()
+			return
+
+		self.disable_feed_actions()
+		self._start_fetch(feed_definitions, "Refreshing feeds...")
+
+	def _schedule_refresh(self):
+		due = self.refresh_scheduler.next_due()
+		if due is None:
+			self.refresh_timer.stop()
+		else:
+			self.refresh_timer.start(int(max(due - time.time(), 0) * 1000))
+
+	def run_retention(self):
+		"""Drop stale read states and cached channels in the background. See persist.retention."""
+
+		if not self.refresh_action.isEnabled():
+			# feeds may be being added, which the task would take for orphans
+			self.retention_timer.start(config.BUSY_RETRY * 1000)
+			return
+
+		self.retention_timer.start(config.RETENTION_INTERVAL * 1000)
+		if not isinstance(self.channels.persistent, store.ChannelStore):
+			return
+
+		# no feed can be subscribed to or fetched until the task completes
+		self.disable_feed_actions()
+		feeds = list(self.loaded_feeds.values())
+		task = iotasks.RetentionTask(list(self.__ctx.app_meta.items), feeds, self.channels.persistent)
+		task.signals.finished.connect(functools.partial(self.on_retention, channels={feed.channel for feed in feeds}))
+		self.executor.start(task)
+
+	def on_retention(self, result: tasks.TaskResult, channels: Set[str]):
+		"""
+		:param channels: The channels subscribed to when the task started. Read states of any
+						 subscribed to since are kept.
+		"""
+
+		self.enable_feed_actions()
+		if result.error:
+			self._log_failure(result)
+			return
+
+		expired, report = result.data
+		added = {feed.channel for feed in self.loaded_feeds.values()} - channels
+		expired = [entry for entry in expired if entry.channel not in added]
+		if expired:
+			self.__ctx.app_meta.remove(expired)
+			self.__ctx.journal.compact()
+
+		logging.info("retention dropped {} read states ({} bytes), and {} cached channels with {} items ({} bytes)"
+					 .format(report.meta_entries, report.meta_bytes, report.channels, report.cached_items,
+							 report.cache_bytes))
+
+	def _feed_definition(self, channel: Channel) -> Optional[models.FeedDefinition]:
+		return self.loaded_feeds.get(channel.ref) or self.loaded_feeds.get(channel.link)
 
 	def new_feed(self, url):
+		self.disable_feed_actions()
 		self.set_status("Fetching new feed...")
 		task = tasks.FetchTask(url)
 		task.signals.finished.connect(self.on_fetch_new)
@@ -229,14 +310,54 @@ class MainApplication(QMainWindow):
 						else:
 							results[feed_definition.channel] = cached
 
-		# fetch non-cached entries
+		for channel in results.values():
+			logging.info("using cached feed - {}".format(channel.link))
+			self._apply_metadata(channel.items, self.__ctx.app_meta)
+			self.feed_aggregate.add(channel)
+
+			feed_def = self._feed_definition(channel)
+			if feed_def:
+				self.refresh_scheduler.observe(feed_def, refresh.publication_times(channel), changed=False)
+
+		# fetch non-cached entries; retention and background refreshes wait until the batch is saved
 		if to_fetch:
-			self.set_status("Fetching feeds...")
-			batch = tasks.Batch([tasks.FetchTask(feed_definition.url) for feed_definition in to_fetch])
-			batch.complete.connect(functools.partial(self.on_fetch_batch, cached=results, autoselect=autoselect))
-			batch.start(self.executor)
+			self.disable_feed_actions()
+			self._start_fetch(to_fetch, "Fetching feeds...", autoselect=autoselect)
 		elif results:
-			self.on_fetch_batch([], cached=results, autoselect=autoselect)
+			self.on_fetch_batch([], autoselect=autoselect)
+
+	def _start_fetch(self, feed_definitions: Iterable[models.FeedDefinition], status: str, autoselect=False):
+		"""Fetch feeds in a batch, adding each to the timeline as soon as it arrives."""
+
+		self.set_status(status)
+		fetch_tasks, previous = self._fetch_tasks(feed_definitions)
+		batch = tasks.Batch(fetch_tasks)
+		batch.received.connect(functools.partial(self.on_fetch_result, previous=previous,
+												 urls=[task.url for task in fetch_tasks]))
+		batch.progress.connect(lambda done, total: self.set_status("%s (%d/%d)" % (status, done, total)))
+		batch.complete.connect(functools.partial(self.on_fetch_batch, autoselect=autoselect))
+		batch.start(self.fetcher)
+
+	def _fetch_tasks(self, feed_definitions: Iterable[models.FeedDefinition]) -> Tuple[List[tasks.FetchTask], Dict[str, Channel]]:
+		"""
+		Create the tasks fetching the given feeds. Feeds with a cached channel are fetched conditionally
+		and delta parsed against it, so only their new items are decoded; the cached channels are
+		returned by url for on_fetch_result to reuse or merge the unchanged items back in.
+		"""
+
+		fetch_tasks = []
+		previous: Dict[str, Channel] = {}
+		for feed_definition in feed_definitions:
+			cached = self.channels.get(feed_definition.cache_key) if feed_definition.cache_key else None
+			if cached and cached is not Channel.Invalid:
+				previous[feed_definition.url] = cached
+				fetch_tasks.append(tasks.FetchTask(feed_definition.url, known=rss.known_keys(cached),
+												   etag=feed_definition.etag,
+												   last_modified=feed_definition.last_modified))
+			else:
+				fetch_tasks.append(tasks.FetchTask(feed_definition.url))
+
+		return fetch_tasks, previous
 
 	def on_fetch_new(self, result: tasks.TaskResult[Channel]):
 		if result.error:
@@ -247,14 +368,16 @@ class MainApplication(QMainWindow):
 			else:
 				logging.error("%s - %s" % (result.error.__class__.__name__, str(result.error)))
 				self.show_error("An unknown error occurred.")
+			self.enable_feed_actions()
 			return
 
 		channel = result.data
 		if channel.link in [feed.channel for feed in self.loaded_feeds.values()]:
 			self.show_error("A feed for that site already exists!")
+			self.enable_feed_actions()
 			return
 
-		feed_definition = self.loaded_feeds.get(channel.link)
+		feed_definition = self._feed_definition(channel)
 		if feed_definition:
 			if feed_definition.cache_key:
 				cache_key = feed_definition.cache_key
@@ -265,85 +388,111 @@ class MainApplication(QMainWindow):
 			cache_key = str(uuid.uuid4())
 			feed_definition = models.FeedDefinition.from_channel(channel)
 			feed_definition.cache_key = cache_key
-			self.loaded_feeds[channel.link] = feed_definition
+			self.loaded_feeds[feed_definition.url] = feed_definition
 
 		self.set_status("Saving feed list...")
 		save_task = app_data.create_save_feeds_task(self.loaded_feeds.values())
 		save_task.signals.finished.connect(lambda result: self._io_complete([result]))
-		self.executor.start(save_task)
+		writer.writer().start(save_task)
 
 		self.channels.set(cache_key, channel, ex=(60 * 60 * 24 * 7))
 		self.feed_aggregate.add(channel)
 
-	def on_fetch_batch(self, results: List[tasks.TaskResult[Channel]], **kw):
-		cached = kw.get('cached', None)
-		if cached:
-			for channel in cached.values():
-				logging.info("using cached feed - {}".format(channel.link))
-				self._apply_metadata(channel.items, self.__ctx.app_meta)
-				self.feed_aggregate.add(channel)
-
-		io_tasks = []
-		for result in results:
-			if result.error:
-				# TODO: GUI Error Display
-				logging.error("{}: {}".format(result.error.__class__.__name__, str(result.error)))
+		self.refresh_scheduler.observe(feed_definition, refresh.publication_times(channel))
+		self._schedule_refresh()
+
+	def on_fetch_result(self, index: int, result: tasks.TaskResult[Channel], previous: Dict[str, Channel],
+						urls: List[str]):
+		if result.error:
+			# TODO: GUI Error Display
+			logging.error("{}: {}".format(result.error.__class__.__name__, str(result.error)))
+
+			# a feed which has never loaded is not scheduled yet; it is retried on the default ttl
+			if urls[index] not in self.refresh_scheduler:
+				feed_def = next((feed for feed in self.loaded_feeds.values() if feed.url == urls[index]), None)
+				if feed_def:
+					self.refresh_scheduler.observe(feed_def, (), changed=False)
+		elif isinstance(result.data, tasks.NotModified):
+			channel = previous[result.data.url]
+			channel.ref = result.data.url
+			logging.info("feed not modified - {}".format(channel.link))
+			self._apply_metadata(channel.items, self.__ctx.app_meta)
+			feed_def = self._feed_definition(channel)
+			if feed_def:
+				feed_def.last_retrieved = int(time.time())
+				self.refresh_scheduler.observe(feed_def, refresh.publication_times(channel), changed=False)
+
+			self.feed_aggregate.add(channel)
+		else:
+			result = result.data
+			fresh = list(result.items)
+			if result.unchanged is not None:
+				rss.merge_unchanged(result, previous[result.ref])
+			# merged items stay undecoded until shown, and are given their read state then
+			self._apply_metadata(result.items, self.__ctx.app_meta)
+
+			# loaded_feeds is keyed by feed url; the cache key is kept so the stored channel is updated in place
+			feed_def = self._feed_definition(result)
+			if feed_def:
+				feed_def.update(result)
 			else:
-				result = result.data
-				self._apply_metadata(result.items, self.__ctx.app_meta)
+				feed_def = models.FeedDefinition.from_channel(result)
+				self.loaded_feeds[feed_def.url] = feed_def
 
-				if result.link in self.loaded_feeds:
-					feed_def = self.loaded_feeds[result.link]
-					feed_def.update(result)
-				else:
-					feed_def = models.FeedDefinition.from_channel(result)
-					self.loaded_feeds[feed_def.url] = feed_def
+			feed_def.last_retrieved = int(time.time())
+			if not feed_def.cache_key:
+				feed_def.cache_key = str(uuid.uuid4())
 
-				feed_def.last_retrieved = int(time.time())
-				if not feed_def.cache_key:
-					feed_def.cache_key = str(uuid.uuid4())
+			cache_task = iotasks.CacheTask(self.channels, feed_def.cache_key, result)
+			cache_task.signals.finished.connect(self._log_failure)
+			self.executor.start(cache_task)
+			self.refresh_scheduler.observe(feed_def, refresh.publication_times(result), changed=bool(fresh))
 
-				io_tasks.append(iotasks.CacheTask(self.channels, feed_def.cache_key, result))
+			self.feed_aggregate.add(result)
 
-				self.feed_aggregate.add(result)
-		
+	def on_fetch_batch(self, results: List[tasks.TaskResult[Channel]], **kw):
 		if kw.get("autoselect", False):
 			self.items.setCurrentIndex(self.feed_aggregate.index(0, 0))
 
+		self._schedule_refresh()
+
 		self.set_status("Saving feed list...")
-		io_tasks.append(app_data.create_save_feeds_task(self.loaded_feeds.values()))
+		save_task = app_data.create_save_feeds_task(self.loaded_feeds.values())
+		save_task.signals.finished.connect(lambda result: self._io_complete([result]))
+		writer.writer().start(save_task)
 
-		io_batch = tasks.Batch(io_tasks)
-		io_batch.complete.connect(self._io_complete)
-		io_batch.start(self.executor)
-	
-	def _io_complete(self, results: tasks.TaskResult):
+	@staticmethod
+	def _log_failure(result: tasks.TaskResult):
+		if result.error:
+			logging.error("{}: {}".format(result.error.__class__.__name__, str(result.error)))
+
+	def _io_complete(self, results: List[tasks.TaskResult]):
 		for result in results:
-			if result.error:
-				logging.error("{}: {}".format(result.error.__class__.__name__, str(result.error)))
+			self._log_failure(result)
 		
 		self.set_status("Done.")
 		self.enable_feed_actions()
 
 	def _apply_metadata(self, items: List[rss.Item], metadata: models.AppMeta):
-		for item in items:
-			meta_idx = metadata.find_item(channel=item.channel.link, guid=item.guid.value if item.guid else None, title=item.title)
-			if meta_idx >= 0:
-				meta = metadata.items[meta_idx]
-				item.read = meta.read
+		metadata.apply_to(items)
 	
 	def remove_feeds(self, channels: List[str], metadata: models.AppMeta):
 		self.disable_feed_actions()
 
 		self.feed_aggregate.remove_channels(channels)
 		self.items.viewport().repaint()
+		for feed in self.loaded_feeds.values():
+			if feed.channel in channels:
+				self.refresh_scheduler.remove(feed.url)
 		self.loaded_feeds = {key: value for (key, value) in self.loaded_feeds.items() if value.channel not in channels}
-		metadata.items = [item for item in metadata.items if item.channel not in channels]
+		self._schedule_refresh()
+		metadata.remove_channels(channels)
+		self.__ctx.journal.compact()
 
 		self.set_status("Saving feed list...")
 		task = app_data.create_save_feeds_task(self.loaded_feeds.values())
 		task.signals.finished.connect(lambda result: self._io_complete([result]))
-		self.executor.start(task)
+		writer.writer().start(task)
 	
 	def set_status(self, message: str):
 		self.status.setText(message)
@@ -3,15 +3,51 @@ from PyQt5.QtCore import Qt, QModelIndex
 
 import bisect
 
-from reader.api.rss import Channel, Item
-from typing import Optional, Union, List, Iterable, Callable, Generator
-from util.comparable import Comparable, keyed
+from reader.api.rss import Channel, Item, item_key
+from reader.api.xml import LazyEntityList
+from typing import Any, Dict, Hashable, Optional, Union, List, Iterable, Callable, Generator
+from util.comparable import Comparable
+
+
+class _PendingItem:
+	"""
+	Stands in for an item of a lazily loaded channel which has not been decoded yet. Attribute
+	reads are answered by peeking at the single field requested, so sort and identity keys can be
+	computed without decoding the whole item.
+	"""
+
+	__slots__ = ('_items', '_index')
+
+	def __init__(self, items: LazyEntityList, index: int):
+		self._items = items
+		self._index = index
+
+	def __getattr__(self, name: str) -> Any:
+		return self._items.peek(self._index, name)
+
+	@property
+	def channel(self) -> Channel:
+		return self._items.parent
+
+	@property
+	def identity_key(self) -> Optional[tuple]:
+		guid = self.guid
+		local = item_key(guid.value if guid else None, self.link, self.title, self.description)
+		if local is None:
+			return None
+
+		return self._items.parent.link if self._items.parent else None, local
+
+	def resolve(self) -> Item:
+		return self._items[self._index]
 
 
 class AggregateFeedModel(QtCore.QAbstractListModel):
 	"""
 	A QT model that tracks multiple channels and adds individual items into a single list in order.
 	Capable of smoothly and accurately handling the addition and removal of new channels in realtime.
+	Items are deduplicated by their identity keys, and items of lazily loaded channels are only
+	decoded once they are displayed.
 	"""
 
 	DEFAULT_BATCH_SIZE = 10
@@ -21,7 +57,9 @@ class AggregateFeedModel(QtCore.QAbstractListModel):
 	The number of items that should be fetched with each call to fetchMore(qIndex).
 	"""
 
-	_items: List[Item]
+	_items: List[Union[Item, _PendingItem]]
+	_keys: List[Comparable]
+	_index: Dict[Hashable, Union[Item, _PendingItem]]
 	_loaded: int
 	_sorter: Callable[[Item], Comparable]
 
@@ -30,41 +68,73 @@ class AggregateFeedModel(QtCore.QAbstractListModel):
 		self._sorter = sort_by
 		self.fetch_batch_size = fetch_batch_size
 		self._loaded = 0
-		if feeds:
-			self._items = sorted(
-				sum([
-					list(channel.items) for channel in feeds
-				], []), key=lambda item: self._sorter(item)
-			)
+		self._index = {}
+
+		entries = []
+		for channel in feeds or ():
+			entries.extend(self._new_entries(channel))
+
+		entries.sort(key=lambda entry: entry[0])
+		self._keys = [key for key, _ in entries]
+		self._items = [item for _, item in entries]
+
+	@staticmethod
+	def _entries(channel: Channel) -> Iterable[Union[Item, _PendingItem]]:
+		items = channel.items
+		if isinstance(items, LazyEntityList):
+			return [items[i] if items.is_decoded(i) else _PendingItem(items, i) for i in range(len(items))]
 		else:
-			self._items = []
+			return items
+
+	def _new_entries(self, channel: Channel) -> Generator[tuple, None, None]:
+		"""Yield (sort key, item) for each item of the channel not yet in this model, and index it."""
+
+		for item in self._entries(channel):
+			identity = item.identity_key
+			if identity is not None:
+				if identity in self._index:
+					continue
+				self._index[identity] = item
+
+			yield self._sorter(item), item
+
+	def _item(self, row: int) -> Item:
+		item = self._items[row]
+		if isinstance(item, _PendingItem):
+			item = self._items[row] = item.resolve()
+
+		return item
 
 	def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Union[Item, QtCore.QSize, None]:
 		if role == Qt.DisplayRole:
-			return self._items[index.row()]
+			return self._item(index.row())
 		elif role == Qt.ToolTipRole:
-			return self._items[index.row()].title
+			return self._item(index.row()).title
 
 	def add(self, value: Channel):
-		for item in value.items:
-			if item in self._items:
-				continue
-
-			index = bisect.bisect_left(keyed(self._items, key=lambda item_: self._sorter(item_)), self._sorter(item))
+		for key, item in self._new_entries(value):
+			index = bisect.bisect_left(self._keys, key)
 
 			should_insert = index < self._loaded
 			if should_insert:
 				self.beginInsertRows(QModelIndex(), index, index)
 				self._loaded += 1
 
+			self._keys.insert(index, key)
 			self._items.insert(index, item)
 
 			if should_insert:
 				self.endInsertRows()
-		
+
 		if self._loaded < self.fetch_batch_size:
 			self.fetchMore(QModelIndex())
-	
+
+	def find(self, identity: Hashable) -> Optional[Item]:
+		"""Look up an item in this model by its identity key."""
+
+		item = self._index.get(identity)
+		return item.resolve() if isinstance(item, _PendingItem) else item
+
 	def remove_channels(self, channels: List[str]):
 		# first, deal with items that are loaded into the UI
 		for i in range(self._loaded - 1, -1, -1):
@@ -72,11 +142,15 @@ class AggregateFeedModel(QtCore.QAbstractListModel):
 			if item.channel.link in channels:
 				self.beginRemoveRows(QModelIndex(), i, i)
 				self._items.pop(i)
+				self._keys.pop(i)
 				self._loaded -= 1
 				self.endRemoveRows()
-		
+
 		# then, remove the rest in one fell swoop:
-		self._items = [item for item in self._items if item.channel.link not in channels]
+		kept = [i for i, item in enumerate(self._items) if item.channel.link not in channels]
+		self._items = [self._items[i] for i in kept]
+		self._keys = [self._keys[i] for i in kept]
+		self._index = {identity: item for identity, item in self._index.items() if item.channel.link not in channels}
 
 	def has_url(self, url: str) -> bool:
 		return any(map(lambda item: item.channel.link == url or item.channel.ref == url, self._items))
@@ -87,17 +161,17 @@ class AggregateFeedModel(QtCore.QAbstractListModel):
 			total - (parent.row() + 1)
 		else:
 			return total
-	
+
 	def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
 		if parent.isValid():
 			return False
-	
+
 		return self._loaded < len(self._items)
-	
+
 	def fetchMore(self, parent: QModelIndex = QModelIndex()):
 		if parent.isValid():
 			return
-		
+
 		unloaded = len(self._items) - self._loaded
 		to_fetch = min(unloaded, self.fetch_batch_size)
 
@@ -107,4 +181,5 @@ class AggregateFeedModel(QtCore.QAbstractListModel):
 
 	@property
 	def items(self) -> Generator[Item, None, None]:
-		yield from self._items
+		for row in range(len(self._items)):
+			yield self._item(row)
@@ -1,5 +1,8 @@
+import calendar
+import contextlib
+import contextvars
 import datetime
-from typing import Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 import config
 
@@ -13,6 +16,27 @@ WEEKDAYS = {
     "Sunday": 6
 }
 
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12
+}
+
+# UTC offsets, in seconds, of the zone names allowed by RFC 822 and commonly seen in feeds.
+TIMEZONES = {
+    "UT": 0, "UTC": 0, "GMT": 0, "Z": 0,
+    "EST": -5 * 3600, "EDT": -4 * 3600,
+    "CST": -6 * 3600, "CDT": -5 * 3600,
+    "MST": -7 * 3600, "MDT": -6 * 3600,
+    "PST": -8 * 3600, "PDT": -7 * 3600,
+}
+
+_WEEKDAY_ABBREVIATIONS = {day[:3].lower() for day in WEEKDAYS}
+
+# (year, month, day, hour, minute, second, UTC offset in seconds)
+Fields = Tuple[int, int, int, int, int, int, int]
+
+_timezones: Dict[int, datetime.timezone] = {0: datetime.timezone.utc}
+
 
 def now(timezone: Optional[datetime.tzinfo] = None) -> datetime.datetime:
     if not timezone:
@@ -21,14 +45,187 @@ def now(timezone: Optional[datetime.tzinfo] = None) -> datetime.datetime:
     return datetime.datetime.now(timezone)
 
 
-def parse(datetime_str: str) -> datetime.datetime:
-    for dateformat in config.DATETIME_FORMATS:
+def _timezone(offset: int) -> datetime.timezone:
+    timezone = _timezones.get(offset)
+    if timezone is None:
+        timezone = _timezones[offset] = datetime.timezone(datetime.timedelta(seconds=offset))
+
+    return timezone
+
+
+def _offset(zone: str) -> Optional[int]:
+    if zone[0] in '+-':
+        digits = zone[1:].replace(':', '')
+        if len(digits) != 4 or not digits.isdigit():
+            return None
+
+        offset = int(digits[:2]) * 3600 + int(digits[2:]) * 60
+        return -offset if zone[0] == '-' else offset
+    else:
+        return TIMEZONES.get(zone.upper())
+
+
+def rfc822_fields(value: str) -> Optional[Fields]:
+    """
+    Split an RFC 822/1123 date such as 'Tue, 10 Jun 2003 04:00:00 GMT' into its fields without raising.
+    The weekday, seconds and zone are optional and two digit years are expanded as per RFC 2822.
+    Returns None if the string does not have that shape.
+    """
+
+    parts = value.replace(',', ' ').split()
+    if parts and parts[0][:3].lower() in _WEEKDAY_ABBREVIATIONS:
+        del parts[0]
+
+    if len(parts) == 5:
+        day, month, year, time, zone = parts
+        offset = _offset(zone)
+        if offset is None:
+            return None
+    elif len(parts) == 4:
+        day, month, year, time = parts
+        offset = 0
+    else:
+        return None
+
+    month = MONTHS.get(month[:3].lower())
+    if month is None or not day.isdigit() or not year.isdigit():
+        return None
+
+    year = int(year)
+    if len(parts[2]) == 2:
+        year += 2000 if year < 50 else 1900
+    elif len(parts[2]) == 3:
+        year += 1900
+
+    clock = time.split(':')
+    if not 2 <= len(clock) <= 3 or not all(segment.isdigit() for segment in clock):
+        return None
+
+    second = int(clock[2]) if len(clock) == 3 else 0
+    return year, month, int(day), int(clock[0]), int(clock[1]), second, offset
+
+
+def _days_from_civil(year: int, month: int, day: int) -> int:
+    """Days between 1970-01-01 and the given proleptic Gregorian date."""
+
+    if month <= 2:
+        year -= 1
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month - 3 if month > 2 else month + 9) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def _checked(fields: Optional[Fields]) -> Optional[Fields]:
+    """
+    Validate the fields of an RFC 822 date as datetime would, so that parse and epoch accept the
+    same dates. A leap second is clamped to 59, which datetime cannot represent.
+    """
+
+    if fields is None:
+        return None
+
+    year, month, day, hour, minute, second, offset = fields
+    if not datetime.MINYEAR <= year <= datetime.MAXYEAR or hour > 23 or minute > 59 or second > 60 or \
+            abs(offset) >= 86400:
+        return None
+    if not 1 <= day <= 28 and not 1 <= day <= calendar.monthrange(year, month)[1]:
+        return None
+
+    return year, month, day, hour, minute, min(second, 59), offset
+
+
+def _rfc822(value: str) -> Optional[datetime.datetime]:
+    fields = _checked(rfc822_fields(value))
+    if fields is None:
+        return None
+
+    year, month, day, hour, minute, second, offset = fields
+    return datetime.datetime(year, month, day, hour, minute, second, tzinfo=_timezone(offset))
+
+
+def _strptime(dateformat: str) -> Callable[[str], Optional[datetime.datetime]]:
+    def parse_format(value: str) -> Optional[datetime.datetime]:
         try:
-            return datetime.datetime.strptime(datetime_str, dateformat)
+            result = datetime.datetime.strptime(value, dateformat)
         except ValueError:
-            try:
-                return datetime.datetime.fromisoformat(datetime_str)
-            except ValueError:
-                pass
+            return None
+
+        return result if result.tzinfo else result.replace(tzinfo=datetime.timezone.utc)
+
+    return parse_format
+
+
+def _isoformat(value: str) -> Optional[datetime.datetime]:
+    try:
+        result = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+    return result if result.tzinfo else result.replace(tzinfo=datetime.timezone.utc)
+
+
+class DateParser:
+    """
+    Parses the dates of a single feed. Feeds use one date format throughout, so the strategy which
+    parsed the previous date is tried first and the others are only consulted when it fails.
+    """
+
+    strategies: List[Callable[[str], Optional[datetime.datetime]]]
+
+    def __init__(self):
+        self.strategies = [_rfc822] + [_strptime(dateformat) for dateformat in config.DATETIME_FORMATS] + [_isoformat]
+        self._last = None
+
+    def parse(self, datetime_str: str) -> datetime.datetime:
+        last = self._last
+        if last is not None:
+            result = last(datetime_str)
+            if result is not None:
+                return result
+
+        for strategy in self.strategies:
+            if strategy is last:
+                continue
+
+            result = strategy(datetime_str)
+            if result is not None:
+                self._last = strategy
+                return result
+
+        raise ValueError("Could not parse datetime string '%s'" % datetime_str)
+
+    def epoch(self, datetime_str: str) -> int:
+        """Seconds since the UTC epoch, computed without building a datetime for RFC 822 dates."""
+
+        fields = _checked(rfc822_fields(datetime_str))
+        if fields is None:
+            return int(self.parse(datetime_str).timestamp())
+
+        year, month, day, hour, minute, second, offset = fields
+        return _days_from_civil(year, month, day) * 86400 + hour * 3600 + minute * 60 + second - offset
+
+
+_default_parser = DateParser()
+_active_parser = contextvars.ContextVar('date_parser')
+
+
+@contextlib.contextmanager
+def feed_scope() -> Iterator[DateParser]:
+    """Give the dates parsed within this block, normally those of one feed, their own DateParser."""
+
+    parser = DateParser()
+    token = _active_parser.set(parser)
+    try:
+        yield parser
+    finally:
+        _active_parser.reset(token)
+
+
+def parse(datetime_str: str) -> datetime.datetime:
+    return _active_parser.get(_default_parser).parse(datetime_str)
+
 
-    raise ValueError("Could not parse datetime string '%s'" % datetime_str)
+def epoch(datetime_str: str) -> int:
+    return _active_parser.get(_default_parser).epoch(datetime_str)
@@ -0,0 +1,103 @@
+"""
+JSON encoding for every persistence path, through the fastest backend installed.
+
+orjson is preferred, then ujson, falling back to the standard json module. Every backend encodes
+dates with isoformat, as JSONModelEncoder always has, and decodes to the same values as json does.
+Anything a fast backend rejects, such as integers beyond 64 bits or malformed input, is handed to
+json, so that errors are the same json.JSONDecodeError and TypeError whichever backend is in use.
+The one difference left is that orjson encodes NaN and infinity as null, where json writes the
+non-standard NaN and Infinity; nothing persisted holds either.
+
+Encoded JSON is bytes in UTF-8, which may contain non-ASCII characters unescaped.
+"""
+import datetime
+import io
+import json
+from typing import Any, Callable, IO, NamedTuple, Optional, Union
+
+import config
+
+
+def default(obj: Any) -> Any:
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class Backend(NamedTuple):
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[Union[bytes, str]], Any]
+
+
+_encoder = json.JSONEncoder(default=default)
+
+STDLIB = Backend('json', lambda obj: _encoder.encode(obj).encode('utf-8'), json.loads)
+
+
+def _orjson() -> Backend:
+    import orjson
+
+    # dates are passed to default so that they are encoded exactly as by json
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    return Backend('orjson', lambda obj: orjson.dumps(obj, default=default, option=option), orjson.loads)
+
+
+def _ujson() -> Backend:
+    import ujson
+
+    return Backend('ujson', lambda obj: ujson.dumps(obj, default=default, escape_forward_slashes=False,
+                                                    ensure_ascii=False).encode('utf-8'), ujson.loads)
+
+
+_FACTORIES = {'orjson': _orjson, 'ujson': _ujson, 'json': lambda: STDLIB}
+
+
+def select(name: Optional[str] = None) -> Backend:
+    """
+    Use the named backend, or the first installed of orjson, ujson and json. Raises ImportError if
+    the named backend is not installed.
+    """
+
+    global backend
+
+    if name is not None:
+        backend = _FACTORIES[name]()
+        return backend
+
+    for factory in _FACTORIES.values():
+        try:
+            backend = factory()
+            return backend
+        except ImportError:
+            continue
+
+
+backend: Backend = STDLIB
+select(config.JSON_BACKEND)
+
+
+def dumps(obj: Any) -> bytes:
+    try:
+        return backend.dumps(obj)
+    except (TypeError, OverflowError, ValueError):
+        return STDLIB.dumps(obj)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    try:
+        return backend.loads(data)
+    except ValueError:
+        return STDLIB.loads(data)
+
+
+def dump(obj: Any, fp: IO):
+    """Write obj to a binary or a text file."""
+
+    data = dumps(obj)
+    fp.write(data.decode('utf-8') if isinstance(fp, io.TextIOBase) else data)
+
+
+def load(fp: IO) -> Any:
+    return loads(fp.read())
@@ -0,0 +1,52 @@
+import html
+import re
+import typing
+
+
+# Comments, and elements whose content is not text. Either may be left unterminated by a truncated fragment.
+_HIDDEN = re.compile(r'<!--.*?(?:-->|$)|<(script|style|head|title|template)\b.*?(?:</\1\s*>|$)', re.S | re.I)
+
+# Tags of elements which separate words, so that e.g. '<p>a</p><p>b</p>' becomes 'a b' rather than 'ab'.
+# Matching case-insensitively is several times slower, so that is only done for markup with uppercase tags.
+_BREAK_PATTERN = (r'</?(?:address|article|aside|blockquote|br|dd|div|dl|dt|figcaption|figure|footer|h[1-6]|'
+                  r'header|hr|img|li|ol|p|pre|section|table|td|th|tr|ul)\b[^>]*>?')
+_BREAK = re.compile(_BREAK_PATTERN)
+_BREAK_ANY_CASE = re.compile(_BREAK_PATTERN, re.I)
+_UPPERCASE_TAG = re.compile(r'</?[A-Z]')
+
+# Any other tag, declaration or processing instruction.
+_TAG = re.compile(r'</?[a-zA-Z][^>]*>?|<[!?][^>]*>?')
+
+
+def _strip(markup: str) -> str:
+    if '<' in markup:
+        markup = _HIDDEN.sub('', markup)
+        breaks = _BREAK_ANY_CASE if _UPPERCASE_TAG.search(markup) else _BREAK
+        markup = _TAG.sub('', breaks.sub(' ', markup))
+    if '&' in markup:
+        markup = html.unescape(markup)
+
+    return ' '.join(markup.split())
+
+
+def strip_html(markup: str, limit: typing.Optional[int] = None) -> str:
+    """
+    Reduce an HTML fragment to its text, with entities decoded and runs of whitespace collapsed.
+    No tree is built. If limit is given, the text is cut to that many characters, and only as
+    much of the start of the fragment is read as is needed to fill them.
+    """
+
+    if limit is None:
+        return _strip(markup)
+
+    budget = limit * 4
+    while budget < len(markup):
+        # cut after a tag or at whitespace, so that neither a word nor an entity is split
+        cut = max(markup.rfind('>', 0, budget) + 1, markup.rfind(' ', 0, budget))
+        result = _strip(markup[:cut if cut > 0 else budget])
+        if len(result) >= limit:
+            return result[:limit].rstrip()
+
+        budget *= 4
+
+    return _strip(markup)[:limit].rstrip()